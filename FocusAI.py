@@ -0,0 +1,494 @@
+# Description: A computer opponent for the Focus/Domination game. AlphaBetaPlayer searches FocusGame positions in
+# place with make_move/unmake_move, using negamax alpha-beta with iterative deepening inside a wall-clock time
+# budget. Moves are ordered with the transposition table move first, then moves that capture or reserve pieces,
+# then killer moves, then by the history heuristic. best_move(game, player, time_ms) always answers within the
+# budget with the best move of the deepest finished iteration. ParallelSearch spreads the search over a process
+# pool, either by splitting the root moves between workers or by running a full search in every worker (lazy SMP),
+# with the workers sharing a SharedTranspositionTable. Both can be given a FocusBook.OpeningBook, which is probed
+# before any search and answers for the positions it holds. AlphaBetaPlayer can also be given a
+# FocusEndgame.EndgameTable, probed at the inner nodes of late positions, which scores the solved positions it holds
+# exactly, forced wins often deeper than the search reaches.
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from FocusEndgame import MIN_CAPTURED, WIN as SOLVED_WIN
+from FocusGame import FocusGame
+from FocusTable import TranspositionTable, SharedTranspositionTable, EXACT, LOWER, UPPER
+
+
+TIME_MARGIN = 0.95          # fraction of the time budget the search may use, the rest covers unwinding
+WIN = 100000                # score of a won position, less the number of plies it takes to win
+WIN_BOUND = WIN - 1000      # scores past this are wins or losses
+INFINITY = WIN + 1
+
+CAPTURE_WEIGHT = 100        # per captured piece
+RESERVE_WEIGHT = 30         # per piece in reserve
+CONTROL_WEIGHT = 10         # per controlled stack
+HEIGHT_WEIGHT = 2           # per piece in a controlled stack
+BURIED_WEIGHT = 4           # per enemy piece buried under the top piece of a controlled stack
+MOBILITY_WEIGHT = 1         # per stack move
+# weights in the order of FocusGame.get_terms
+TERM_WEIGHTS = (CONTROL_WEIGHT, HEIGHT_WEIGHT, BURIED_WEIGHT, MOBILITY_WEIGHT, RESERVE_WEIGHT, CAPTURE_WEIGHT)
+DIRECTIONS = ((-1, 0), (1, 0), (0, -1), (0, 1))
+
+
+class SearchTimeout(Exception):
+    """
+    Raised inside the search when the time budget runs out, to unwind to the root
+    """
+    pass
+
+
+def evaluate(game, player, weights=TERM_WEIGHTS):
+    """
+    Scores a position for a player from the terms the game keeps up to date as pieces move, so a score costs the
+    same in any position: controlled stacks, pieces in them, enemy pieces buried under their top pieces, stack
+    moves, pieces in reserve and captured pieces, each counted for the player less the same count for the opponent.
+    :param game: A FocusGame
+    :param player: Name of the player the score is for
+    :param weights: Weight of each term, in the order of FocusGame.get_terms
+    :return: The score of the position as an integer, higher is better for the player
+    """
+    control, height, buried, mobility, reserves, captured = game.get_terms()
+    score = (weights[0] * control + weights[1] * height + weights[2] * buried + weights[3] * mobility
+             + weights[4] * reserves + weights[5] * captured)
+    return score if game._players[0].get_name() == player else -score
+
+
+def full_evaluate(game, player, weights=TERM_WEIGHTS):
+    """
+    Scores a position as evaluate does, computing every term from scratch by walking the board
+    :param game: A FocusGame
+    :param player: Name of the player the score is for
+    :param weights: Weight of each term, in the order of FocusGame.get_terms
+    :return: The score of the position as an integer, the same as evaluate's
+    """
+    other = game._players[1] if game._players[0].get_name() == player else game._players[0]
+    color = game.get_player(player).get_color()
+    terms = [0, 0, 0, 0, game.show_reserve(player) - game.show_reserve(other.get_name()),
+             game.show_captured(player) - game.show_captured(other.get_name())]
+    for row in range(6):
+        for column in range(6):
+            stack = game._board[row][column]
+            if stack != None and stack != []:
+                pieces = stack.get_stack_list()
+                sign = 1 if pieces[0] == color else -1
+                moves = 0
+                for num_pieces in range(1, len(pieces) + 1):
+                    for row_step, column_step in DIRECTIONS:
+                        if 0 <= row + row_step * num_pieces <= 5 and 0 <= column + column_step * num_pieces <= 5:
+                            moves += 1
+                terms[0] += sign
+                terms[1] += sign * len(pieces)
+                terms[2] += sign * (len(pieces) - pieces.count(pieces[0]))
+                terms[3] += sign * moves
+    return sum(weight * term for weight, term in zip(weights, terms))
+
+
+def book_stats(began):
+    """
+    :param began: time.perf_counter() when the move was asked for
+    :return: The search statistics of a move played from the book, with no search
+    """
+    seconds = time.perf_counter() - began
+    return {'depth': 0, 'score': 0, 'nodes': 0, 'seconds': seconds, 'nodes_per_sec': 0.0, 'iterations': [],
+            'book': True}
+
+
+def move_gain(game, move):
+    """
+    Returns how many pieces a move trims off the bottom of the destination stack, which are either captured or
+    put in the mover's reserve
+    :param game: A FocusGame
+    :param move: A move tuple from FocusGame.legal_moves
+    :return: The number of pieces trimmed, 0 for a quiet move
+    """
+    end = move[1]
+    dest = game._board[end[0]][end[1]]
+    if dest == None or dest == []:
+        return 0
+    excess = dest.get_size() + move[2] - 5
+    return excess if excess > 0 else 0
+
+
+class AlphaBetaPlayer:
+    """
+    Represents an alpha-beta search player. Keeps a transposition table, killer moves and a history table between
+    searches, halving the history before each search so recent cutoffs lead, and records statistics about the last
+    search.
+    """
+
+    def __init__(self, max_depth=64, table=None, evaluator=evaluate, book=None, endgame=None):
+        """
+        Initializes the player
+        :param max_depth: The deepest iteration the search will start
+        :param table: A TranspositionTable to use, a new one is made if None
+        :param evaluator: Function taking (game, player name) and returning a score for that player
+        :param book: A FocusBook.OpeningBook probed before searching, or None
+        :param endgame: A FocusEndgame.EndgameTable probed at inner nodes once a player has MIN_CAPTURED captures,
+        or None
+        """
+        self._max_depth = max_depth
+        self._table = table if table is not None else TranspositionTable()
+        self._evaluate = evaluator
+        self._book = book
+        self._endgame = endgame
+        self._killers = []
+        self._history = {}
+        self._nodes = 0
+        self._deadline = None
+        self._stats = {}
+
+    def get_stats(self):
+        """
+        Returns statistics about the last search
+        :return: A dictionary with the depth reached, score, nodes searched, seconds taken, nodes per second,
+        the (depth, score, move) result of each finished iteration, the transposition table's counters, and
+        whether the move came from the book
+        """
+        return self._stats
+
+    def best_move(self, game, player, time_ms=1000, root_moves=None, partial=False):
+        """
+        Searches for the best move for a player with iterative deepening until the time budget runs out or
+        max_depth is finished. The game is left as it was found.
+        :param game: A FocusGame, searched in place
+        :param player: Name of the player to move
+        :param time_ms: Time budget for the search in milliseconds
+        :param root_moves: Moves to choose from, all legal moves if None. Parallel searches split or reorder these,
+        and the book is only probed without them
+        :param partial: True if root_moves are only some of the legal moves, so the root's score is stored in the
+        table as a lower bound
+        :return: The best move found, as a move tuple from FocusGame.legal_moves, or None if there is no move
+        """
+        began = time.perf_counter()
+        if self._book is not None and root_moves is None:
+            move = self._book.choose(game, player)
+            if move is not None:
+                self._stats = book_stats(began)
+                return move
+        self._deadline = began + TIME_MARGIN * time_ms / 1000.0
+        self._nodes = 0
+        self._killers = [[None, None] for ply in range(self._max_depth + 1)]
+        self._history = {move: score >> 1 for move, score in self._history.items() if score > 1}  #age old cutoffs
+        undo_depth = len(game._undo)
+
+        if root_moves is None:
+            root_moves = game.legal_moves(player)
+        moves = self.order_moves(game, player, list(root_moves), None, 0)
+        best = moves[0] if moves else None
+        score = 0
+        depth = 0
+        iterations = []
+        while moves and depth < self._max_depth:
+            try:
+                iteration_score, iteration_best = self.search_root(game, player, moves, depth + 1, partial)
+            except SearchTimeout:
+                while len(game._undo) > undo_depth:
+                    game.unmake_move()
+                break
+            depth += 1
+            score, best = iteration_score, iteration_best
+            iterations.append((depth, score, best))
+            moves.remove(best)
+            moves.insert(0, best)
+            if (score >= WIN_BOUND or score <= -WIN_BOUND) and WIN - abs(score) <= depth:
+                break                                                           #no shorter win is left to find
+            if time.perf_counter() - began > (self._deadline - began) / 2:     #next iteration won't finish
+                break
+
+        seconds = time.perf_counter() - began
+        self._stats = {
+            'depth': depth,
+            'score': score,
+            'nodes': self._nodes,
+            'seconds': seconds,
+            'nodes_per_sec': self._nodes / seconds if seconds > 0 else 0.0,
+            'iterations': iterations,
+            'table': self._table.get_stats(),
+            'book': False,
+        }
+        return best
+
+    def search_root(self, game, player, moves, depth, partial=False):
+        """
+        Searches every root move to a depth
+        :param game: A FocusGame
+        :param player: Name of the player to move
+        :param moves: The ordered root moves
+        :param depth: The depth to search to
+        :param partial: True if the moves are only some of the legal moves, as in a root split worker, so the score
+        is stored as a lower bound rather than the exact value of the position
+        :return: A tuple of (score, best move)
+        """
+        alpha = -INFINITY
+        best = moves[0]
+        for move in moves:
+            game.make_move(move, player)
+            score = -self.search(game, depth - 1, -INFINITY, -alpha, 1)
+            game.unmake_move()
+            if score > alpha:
+                alpha = score
+                best = move
+        self._table.store(game.get_hash(), depth, alpha, LOWER if partial else EXACT, best)
+        return alpha, best
+
+    def search(self, game, depth, alpha, beta, ply):
+        """
+        Negamax alpha-beta search of the position for the side to move
+        :param game: A FocusGame
+        :param depth: Plies left to search
+        :param alpha: Lower bound of the search window
+        :param beta: Upper bound of the search window
+        :param ply: Plies from the root
+        :return: The score of the position for the side to move
+        """
+        self._nodes += 1
+        if self._nodes & 31 == 0 and time.perf_counter() > self._deadline:
+            raise SearchTimeout()
+
+        player = game.get_turn()
+        if player == 1:                                                         #the previous move won
+            return ply - WIN
+        if depth == 0:
+            return self._evaluate(game, player)
+        if self._endgame is not None and (len(game._players[0]._captured) >= MIN_CAPTURED
+                                          or len(game._players[1]._captured) >= MIN_CAPTURED):
+            solved = self._endgame.probe(game)                                  #only late positions are stored
+            if solved is not None:
+                return WIN - ply - solved[1] if solved[0] == SOLVED_WIN else ply + solved[1] - WIN
+
+        key = game.get_hash()
+        entry = self._table.probe(key)
+        table_move = None
+        if entry is not None:
+            table_move = entry[4]
+            if entry[1] >= depth:
+                score = entry[2]
+                if score >= WIN_BOUND:
+                    score -= ply
+                elif score <= -WIN_BOUND:
+                    score += ply
+                if entry[3] == EXACT:
+                    return score
+                elif entry[3] == LOWER and score >= beta:
+                    return score
+                elif entry[3] == UPPER and score <= alpha:
+                    return score
+
+        moves = self.order_moves(game, player, list(game.legal_moves(player)), table_move, ply)
+        if moves == []:                                                         #no stack and no reserve
+            return ply - WIN
+
+        original_alpha = alpha
+        best_score = -INFINITY
+        best = None
+        for move in moves:
+            game.make_move(move, player)
+            score = -self.search(game, depth - 1, -beta, -alpha, ply + 1)
+            game.unmake_move()
+            if score > best_score:
+                best_score = score
+                best = move
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        if move_gain(game, move) == 0:
+                            killers = self._killers[ply]
+                            if killers[0] != move:
+                                killers[1] = killers[0]
+                                killers[0] = move
+                            self._history[move] = self._history.get(move, 0) + depth * depth
+                        break
+
+        if best_score <= original_alpha:
+            flag = UPPER
+        elif best_score >= beta:
+            flag = LOWER
+        else:
+            flag = EXACT
+        stored = best_score
+        if stored >= WIN_BOUND:
+            stored += ply
+        elif stored <= -WIN_BOUND:
+            stored -= ply
+        self._table.store(key, depth, stored, flag, best)
+        return best_score
+
+    def order_moves(self, game, player, moves, table_move, ply):
+        """
+        Sorts moves so the ones most likely to cause a cutoff are searched first: the transposition table move,
+        then moves that capture or reserve pieces, then killer moves, then quiet moves by history score.
+        :param game: A FocusGame
+        :param player: Name of the player to move
+        :param moves: List of moves from FocusGame.legal_moves
+        :param table_move: The best move stored for the position, or None
+        :param ply: Plies from the root, used to find the killer moves
+        :return: The same list, sorted in place
+        """
+        killers = self._killers[ply] if ply < len(self._killers) else (None, None)
+        history = self._history
+
+        def priority(move):
+            if move == table_move:
+                return 1 << 40
+            gain = move_gain(game, move)
+            if gain:
+                return (1 << 30) + gain
+            if move == killers[0]:
+                return 1 << 29
+            if move == killers[1]:
+                return (1 << 29) - 1
+            return history.get(move, 0)
+
+        moves.sort(key=priority, reverse=True)
+        return moves
+
+
+def best_move(game, player, time_ms=1000):
+    """
+    Finds a move for a player within a time budget with a new AlphaBetaPlayer
+    :param game: A FocusGame, left as it was found
+    :param player: Name of the player to move
+    :param time_ms: Time budget for the search in milliseconds
+    :return: The best move found as a move tuple, (start, move, num_pieces) or (None, move, 1) for a reserve
+    placement, or None if the player has no move
+    """
+    return AlphaBetaPlayer().best_move(game, player, time_ms)
+
+
+_worker_tables = {}         # shared tables a worker process has attached to, by shared memory name
+
+
+def search_worker(players, position, player, root_moves, partial, max_depth, time_ms, table_name, buckets):
+    """
+    Runs one alpha-beta search in a worker process on a position serialized by FocusGame.to_bytes
+    :param players: The two (name, color) tuples the game was created with
+    :param position: The position as bytes
+    :param player: Name of the player to move
+    :param root_moves: The root moves this worker searches
+    :param partial: True if they are a root split share rather than every legal move in some order
+    :param max_depth: The deepest iteration to start
+    :param time_ms: Time budget in milliseconds
+    :param table_name: Name of the SharedTranspositionTable to use, or None for a private table
+    :param buckets: Number of buckets in the shared table
+    :return: A tuple of (iterations, nodes, seconds), iterations being the (depth, score, move) of each finished
+    iteration
+    """
+    game = FocusGame(players[0], players[1])
+    game.load_bytes(position)
+    if table_name is None:
+        table = TranspositionTable()
+    else:
+        table = _worker_tables.get(table_name)
+        if table is None:
+            table = SharedTranspositionTable(buckets, name=table_name)
+            _worker_tables[table_name] = table
+    searcher = AlphaBetaPlayer(max_depth=max_depth, table=table)
+    searcher.best_move(game, player, time_ms, root_moves, partial)
+    stats = searcher.get_stats()
+    return stats['iterations'], stats['nodes'], stats['seconds']
+
+
+class ParallelSearch:
+    """
+    Represents a search spread over a pool of worker processes. In 'root' mode the root moves are split between
+    the workers and the best move is taken from the deepest iteration every worker finished. In 'smp' mode every
+    worker searches all root moves in a different order and the deepest result found by any worker is used.
+    """
+
+    def __init__(self, workers=None, mode='root', max_depth=64, buckets=1 << 16, shared_table=True, book=None):
+        """
+        Starts the worker pool and creates the shared transposition table
+        :param workers: Number of worker processes, defaults to the number of CPUs
+        :param mode: 'root' for root splitting or 'smp' for lazy SMP
+        :param max_depth: The deepest iteration the workers start
+        :param buckets: Number of buckets in the shared transposition table
+        :param shared_table: False to give every worker search its own private table instead
+        :param book: A FocusBook.OpeningBook probed before searching, or None
+        """
+        self._workers = workers or os.cpu_count() or 1
+        self._book = book
+        self._mode = mode
+        self._max_depth = max_depth
+        self._buckets = buckets
+        self._table = SharedTranspositionTable(buckets) if shared_table else None
+        self._pool = ProcessPoolExecutor(max_workers=self._workers)
+        self._stats = {}
+
+    def get_stats(self):
+        """
+        Returns statistics about the last search
+        :return: A dictionary with the depth reached, score, nodes searched by all workers, wall seconds, nodes
+        per second, the number of workers, and whether the move came from the book
+        """
+        return self._stats
+
+    def get_table(self):
+        """
+        Returns the shared transposition table
+        :return: The SharedTranspositionTable, or None if the workers use private tables
+        """
+        return self._table
+
+    def best_move(self, game, player, time_ms=1000):
+        """
+        Searches for the best move for a player across the worker pool. The game is not changed.
+        :param game: A FocusGame
+        :param player: Name of the player to move
+        :param time_ms: Time budget for the search in milliseconds
+        :return: The best move found as a move tuple, or None if there is no move
+        """
+        began = time.perf_counter()
+        if self._book is not None:
+            move = self._book.choose(game, player)
+            if move is not None:
+                self._stats = dict(book_stats(began), workers=self._workers)
+                return move
+        moves = sorted(game.legal_moves(player), key=lambda move: move_gain(game, move), reverse=True)
+        if moves == []:
+            return None
+        players = ((game._players[0].get_name(), game._players[0].get_color()),
+                   (game._players[1].get_name(), game._players[1].get_color()))
+        position = game.to_bytes()
+        table_name = self._table.get_name() if self._table is not None else None
+
+        if self._mode == 'root':
+            shares = [moves[i::self._workers] for i in range(self._workers) if moves[i::self._workers]]
+        else:
+            shares = [moves[i:] + moves[:i] for i in range(self._workers)]
+        partial = self._mode == 'root' and len(shares) > 1
+        futures = [self._pool.submit(search_worker, players, position, player, share, partial, self._max_depth,
+                                     time_ms, table_name, self._buckets) for share in shares]
+        results = [future.result() for future in futures]
+
+        finished = [iterations for iterations, nodes, seconds in results if iterations]
+        depth, score, best = 0, 0, moves[0]
+        if self._mode == 'root' and finished:                                  #compare at a depth all finished
+            common = min(iterations[-1][0] for iterations in finished)
+            depth, score, best = max((iterations[common - 1] for iterations in finished), key=lambda result: result[1])
+        elif finished:
+            depth, score, best = max((iterations[-1] for iterations in finished), key=lambda result: result[0])
+
+        nodes = sum(result[1] for result in results)
+        seconds = time.perf_counter() - began
+        self._stats = {
+            'depth': depth,
+            'score': score,
+            'nodes': nodes,
+            'seconds': seconds,
+            'nodes_per_sec': nodes / seconds if seconds > 0 else 0.0,
+            'workers': self._workers,
+            'book': False,
+        }
+        return best
+
+    def close(self):
+        """
+        Shuts down the worker pool and frees the shared transposition table
+        """
+        self._pool.shutdown()
+        if self._table is not None:
+            self._table.close()
@@ -0,0 +1,343 @@
+# Description: A game archive for Focus/Domination: one large file of FocusRecord records written back to back, and
+# an index file next to it (<archive>.idx) giving each game's offset, length and players. GameArchive opens both
+# with mmap, so game N or every game between two players is found from the index without reading the archive, and
+# records are handed out as RecordReader objects over zero-copy memoryview slices of the mapped file. Positions are
+# only built, as FocusGame objects, when a reader's seek or replay is called. The index layout, little-endian:
+#     b'FGI1', number of games (4 bytes), number of player names (4 bytes), 4 padding bytes
+#     each player name as a 1 byte length and its UTF-8 bytes, then zero padding to a multiple of 8 bytes
+#     four columns, one entry per game: offsets (8 bytes each), lengths (4 bytes each), then the name numbers of
+#     the first and of the second player (4 bytes each)
+
+import array
+import mmap
+import os
+import struct
+import sys
+
+from FocusRecord import RecordReader, RecordWriter, decode_header, record_end
+
+
+INDEX_MAGIC = b'FGI1'
+INDEX_SUFFIX = '.idx'
+
+
+def index_path(path):
+    """
+    :param path: Path of an archive
+    :return: Path of its index file
+    """
+    return path + INDEX_SUFFIX
+
+
+def native(column):
+    """
+    Converts a little-endian column to the machine's byte order, in place
+    :param column: An array.array
+    :return: The column
+    """
+    if sys.byteorder != 'little':
+        column.byteswap()
+    return column
+
+
+def write_index(path, names, offsets, lengths, first, second):
+    """
+    Writes an index file
+    :param path: Path of the index file
+    :param names: List of the player names, numbered by position
+    :param offsets: array('Q') of record offsets
+    :param lengths: array('I') of record lengths
+    :param first: array('I') of first player name numbers
+    :param second: array('I') of second player name numbers
+    """
+    data = bytearray(INDEX_MAGIC + struct.pack('<III', len(offsets), len(names), 0))
+    for name in names:
+        encoded = name.encode('utf-8')
+        data.append(len(encoded))
+        data += encoded
+    data += bytes(-len(data) % 8)
+    with open(path, 'wb') as stream:
+        stream.write(data)
+        for column in (offsets, lengths, first, second):
+            stream.write(native(array.array(column.typecode, column)).tobytes())
+
+
+def read_index(data):
+    """
+    Reads an index
+    :param data: The index file's bytes, or a memoryview of them
+    :return: A tuple of (names, offsets, lengths, first, second), the columns being memoryviews cast from data
+    when the machine is little-endian and arrays otherwise
+    :raise ValueError: If data is not an index
+    """
+    if bytes(data[:4]) != INDEX_MAGIC:
+        raise ValueError("not a game archive index")
+    games, count = struct.unpack_from('<II', data, 4)
+    names = []
+    i = 16
+    for j in range(count):
+        names.append(bytes(data[i + 1:i + 1 + data[i]]).decode('utf-8'))
+        i += 1 + data[i]
+    i += -i % 8
+    columns = []
+    for code, size in (('Q', 8), ('I', 4), ('I', 4), ('I', 4)):
+        view = memoryview(data)[i:i + games * size]
+        columns.append(view.cast(code) if sys.byteorder == 'little' else native(array.array(code, view.tobytes())))
+        i += games * size
+    return (names,) + tuple(columns)
+
+
+def build_index(path):
+    """
+    Writes the index of an existing archive by stepping through its records
+    :param path: Path of the archive
+    :return: The number of games indexed
+    """
+    names = {}
+    columns = (array.array('Q'), array.array('I'), array.array('I'), array.array('I'))
+    size = os.path.getsize(path)
+    if size:
+        with open(path, 'rb') as stream, mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            offset = 0
+            while offset < size:
+                end = record_end(data, offset)
+                if end is None:                                                 #cut off record at the end
+                    break
+                players = decode_header(data, offset)[0]
+                numbers = [names.setdefault(name, len(names)) for name, color in players]
+                for column, value in zip(columns, (offset, end - offset, numbers[0], numbers[1])):
+                    column.append(value)
+                offset = end
+    write_index(index_path(path), list(names), *columns)
+    return len(columns[0])
+
+
+class ArchiveWriter:
+    """
+    Represents an archive open for appending games. Games are appended as encoded records or recorded as they are
+    played; the index is rewritten when the writer is closed.
+    """
+
+    def __init__(self, path):
+        """
+        Opens an archive for appending, creating it if needed and loading its index, which is built first if the
+        archive has none
+        :param path: Path of the archive
+        """
+        if os.path.exists(path) and not os.path.exists(index_path(path)):
+            build_index(path)
+        self._path = path
+        self._names = []
+        self._numbers = {}
+        self._columns = (array.array('Q'), array.array('I'), array.array('I'), array.array('I'))
+        if os.path.exists(index_path(path)):
+            with open(index_path(path), 'rb') as stream:
+                names, *columns = read_index(stream.read())
+            for name in names:
+                self._numbers[name] = len(self._names)
+                self._names.append(name)
+            for column, values in zip(self._columns, columns):
+                column.extend(values)
+        self._stream = open(path, 'ab')
+        self._recording = None                          #(offset, players, writer, game) of the game being recorded
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def get_size(self):
+        """
+        :return: The number of games in the archive, not counting a game still being recorded
+        """
+        return len(self._columns[0])
+
+    def add_entry(self, offset, players):
+        """
+        Adds the record ending at the current end of the archive to the index
+        :param offset: Offset of the record
+        :param players: The record's two (name, color) tuples
+        """
+        numbers = []
+        for name, color in players:
+            if name not in self._numbers:
+                self._numbers[name] = len(self._names)
+                self._names.append(name)
+            numbers.append(self._numbers[name])
+        for column, value in zip(self._columns, (offset, self._stream.tell() - offset, numbers[0], numbers[1])):
+            column.append(value)
+
+    def add(self, record):
+        """
+        Appends an encoded record
+        :param record: The record as bytes, ending with its end block
+        """
+        self.finish()
+        offset = self._stream.tell()
+        self._stream.write(record)
+        self.add_entry(offset, decode_header(record)[0])
+
+    def record(self, game, interval=None):
+        """
+        Starts recording a game into the archive. The game's moves are appended as move_piece and reserved_move
+        apply them; the record is finished by the next add, record or close.
+        :param game: A FocusGame in its starting position
+        :param interval: Moves between snapshots, defaults to FocusRecord's
+        :return: The RecordWriter, already set as the game's recorder
+        """
+        self.finish()
+        offset = self._stream.tell()
+        writer = RecordWriter(self._stream, game) if interval is None else RecordWriter(self._stream, game, interval)
+        game.set_recorder(writer)
+        players = tuple((user.get_name(), user.get_color()) for user in game._players)
+        self._recording = (offset, players, writer, game)
+        return writer
+
+    def finish(self):
+        """
+        Finishes the game being recorded, if there is one, writing its end block and adding it to the index
+        """
+        if self._recording is not None:
+            offset, players, writer, game = self._recording
+            writer.close(game)
+            game.set_recorder(None)
+            self.add_entry(offset, players)
+            self._recording = None
+
+    def close(self):
+        """
+        Finishes any game being recorded, closes the archive and writes the index
+        """
+        self.finish()
+        self._stream.close()
+        write_index(index_path(self._path), self._names, *self._columns)
+
+
+class GameArchive:
+    """
+    Represents an archive opened for reading. The archive and its index are memory mapped, so opening it and
+    reaching any game costs the same however many games it holds.
+    """
+
+    def __init__(self, path):
+        """
+        Maps an archive and its index, building the index first if it is missing
+        :param path: Path of the archive
+        """
+        if not os.path.exists(index_path(path)):
+            build_index(path)
+        self._files = []
+        self._maps = []
+        self._data = self.map(path)
+        self._names, self._offsets, self._lengths, self._first, self._second = read_index(self.map(index_path(path)))
+        self._numbers = {name: number for number, name in enumerate(self._names)}
+        self._pairs = None
+
+    def map(self, path):
+        """
+        Memory maps a file for reading
+        :param path: Path of the file
+        :return: A memoryview of the mapped file, empty for an empty file
+        """
+        if os.path.getsize(path) == 0:
+            return memoryview(b'')
+        stream = open(path, 'rb')
+        data = mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ)
+        self._files.append(stream)
+        self._maps.append(data)
+        return memoryview(data)
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def get_names(self):
+        """
+        :return: The names of every player in the archive
+        """
+        return list(self._names)
+
+    def get_view(self, number):
+        """
+        Returns a game's record without copying it
+        :param number: Number of the game, from 0
+        :return: A memoryview of the record in the mapped archive
+        """
+        offset = self._offsets[number]
+        return self._data[offset:offset + self._lengths[number]]
+
+    def get_record(self, number):
+        """
+        :param number: Number of the game, from 0
+        :return: A RecordReader over a zero-copy view of the game's record
+        """
+        return RecordReader(self.get_view(number), 0, self._lengths[number])
+
+    def get_moves(self, number):
+        """
+        :param number: Number of the game, from 0
+        :return: A zero-copy memoryview of the game's move codes and snapshot blocks
+        """
+        return self.get_record(number).move_data()
+
+    def get_players(self, number):
+        """
+        :param number: Number of the game, from 0
+        :return: The names of the first and second player, from the index alone
+        """
+        return self._names[self._first[number]], self._names[self._second[number]]
+
+    def position(self, number, moves):
+        """
+        Builds a game's position after a number of moves, from the nearest snapshot
+        :param number: Number of the game, from 0
+        :param moves: The number of moves played
+        :return: A quiet FocusGame in that position
+        """
+        return self.get_record(number).seek(moves)
+
+    def games_between(self, player1, player2):
+        """
+        Finds the games between two players, in either order. The first call groups every game by its players
+        from the index, later calls look the pair up.
+        :param player1: Name of one player
+        :param player2: Name of the other player
+        :return: A list of game numbers in archive order
+        """
+        if player1 not in self._numbers or player2 not in self._numbers:
+            return []
+        if self._pairs is None:
+            self._pairs = {}
+            for number, pair in enumerate(zip(self._first, self._second)):
+                self._pairs.setdefault(pair if pair[0] <= pair[1] else (pair[1], pair[0]), []).append(number)
+        a, b = self._numbers[player1], self._numbers[player2]
+        return list(self._pairs.get((a, b) if a <= b else (b, a), ()))
+
+    def records(self, numbers=None):
+        """
+        Generates records in archive order, or for a list of games
+        :param numbers: Game numbers to read, defaults to every game
+        :return: A generator of RecordReader objects
+        """
+        for number in range(len(self)) if numbers is None else numbers:
+            yield self.get_record(number)
+
+    def close(self):
+        """
+        Unmaps the archive and index. A file with views or readers still handed out stays mapped until they are
+        garbage collected.
+        """
+        self._data = self._offsets = self._lengths = self._first = self._second = None
+        for data in self._maps:
+            try:
+                data.close()
+            except BufferError:
+                pass
+        for stream in self._files:
+            stream.close()
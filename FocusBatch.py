@@ -0,0 +1,278 @@
+# Description: A vectorized NumPy engine that holds many Focus/Domination games at once and advances all of them
+# with one call, for self-play data generation. Board i is stored as piece planes pieces[i, row, column, slot]
+# (0 empty, 1 the first player's color, 2 the second player's color, slot 0 being the bottom of the stack) with
+# the stack heights in height[i, row, column], the reserve and captured counts per player, and the side to move.
+# Moves are action numbers in a fixed action space so legal moves for every board come back as one boolean mask:
+#     action = square * 20 + direction * 5 + num_pieces - 1     stack moves, square = row * 6 + column
+#     action = 720 + square                                     reserve placements
+# with directions up, down, left and right. Alongside the planes every square is also kept as one FocusBoard
+# packed byte, square by square across the boards, and the rules run on those bytes: step() moves, merges and trims
+# stacks with integer arithmetic on one value per board, and legal masks and random moves are looked up in tables
+# indexed by side to move, square and packed byte. The planes are rewritten from the bytes for the two squares each
+# move changes, so boards should only be changed through step and load_bytes. step() follows the same rules as
+# FocusGame.process_move and reserved_move, and to_bytes/load_bytes use the FocusGame.to_bytes layout so boards can
+# be compared and moved between the engines. A player left with no legal move loses, as in the search players.
+
+import numpy as np
+
+from FocusBoard import COLOR_SHIFT, HEIGHT_MASK, MAX_HEIGHT, pack_stack
+
+
+NUM_ACTIONS = 756
+STACK_ACTIONS = 720
+DIRECTIONS = ((-1, 0), (1, 0), (0, -1), (0, 1))
+
+
+def build_action_tables():
+    """
+    Builds the source square, destination square, number of pieces and on-board flag of every stack action
+    :return: A tuple of four arrays of length STACK_ACTIONS
+    """
+    source = np.zeros(STACK_ACTIONS, dtype=np.intp)
+    dest = np.zeros(STACK_ACTIONS, dtype=np.intp)
+    num = np.zeros(STACK_ACTIONS, dtype=np.int8)
+    on_board = np.zeros(STACK_ACTIONS, dtype=bool)
+    for square in range(36):
+        row, column = divmod(square, 6)
+        for direction in range(4):
+            for num_pieces in range(1, 6):
+                action = square * 20 + direction * 5 + num_pieces - 1
+                end_row = row + DIRECTIONS[direction][0] * num_pieces
+                end_column = column + DIRECTIONS[direction][1] * num_pieces
+                source[action] = square
+                num[action] = num_pieces
+                if 0 <= end_row <= 5 and 0 <= end_column <= 5:
+                    dest[action] = end_row * 6 + end_column
+                    on_board[action] = True
+    return source, dest, num, on_board
+
+
+ACTION_SOURCE, ACTION_DEST, ACTION_NUM, ACTION_ON_BOARD = build_action_tables()
+# height a stack needs for each stack action to be legal, out of reach for moves off the board
+ACTION_LIMIT = np.where(ACTION_ON_BOARD, ACTION_NUM, 6).astype(np.int8).reshape(36, 4, 5)
+
+CODES = np.arange(256)
+CODE_HEIGHT = np.minimum(CODES & HEIGHT_MASK, MAX_HEIGHT)
+CODE_TOP = np.where(CODE_HEIGHT > 0, ((CODES >> COLOR_SHIFT) & 1) + 1, 0).astype(np.int8)   # 0 for empty squares
+CODE_PLANES = np.where(np.arange(5) < CODE_HEIGHT[:, None],                 # slot 0 at the bottom, as in pieces
+                       ((CODES[:, None] >> (COLOR_SHIFT + np.maximum(CODE_HEIGHT[:, None] - 1 - np.arange(5), 0)))
+                        & 1) + 1,
+                       0).astype(np.int8)
+POPCOUNT = np.array([bin(bits).count('1') for bits in range(32)], dtype=np.intp)
+FINISHED = 2                # side index of a finished board in the move tables
+
+
+def build_move_tables():
+    """
+    Builds the legal stack actions of a square for every side to move, square and packed byte of the square. Rows
+    are indexed by (side * 36 + square) * 256 + byte, side FINISHED having no legal action.
+    :return: A tuple of (masks, counts, actions): the 20 legal flags of each row as one 20 byte item, the number of
+    legal actions of each row, and each row's legal action numbers in order, at row * 20 + k for the k-th
+    """
+    movable = np.zeros((3, 256), dtype=np.int8)                             # height the side may move from
+    for side in range(2):
+        movable[side] = np.where(CODE_TOP == side + 1, CODE_HEIGHT, 0)
+    legal = movable[:, None, :, None] >= ACTION_LIMIT.reshape(1, 36, 1, 20)
+    masks = np.ascontiguousarray(legal).reshape(-1, 20).view('V20').reshape(-1)
+    counts = legal.sum(axis=3).astype(np.int16).reshape(-1)
+    order = np.argsort(~legal, axis=3, kind='stable')                       # legal slots first, in order
+    actions = (np.arange(36)[None, :, None, None] * 20 + order).astype(np.int16).reshape(-1)
+    return masks, counts, actions
+
+
+MOVE_MASKS, MOVE_COUNTS, MOVE_ACTIONS = build_move_tables()
+SQUARE_ROWS = (np.arange(36) * 256)[:, None]                                # row offset of each square
+
+
+def action_to_move(action):
+    """
+    Converts an action number to the move tuple used by FocusGame.legal_moves and make_move
+    :param action: An action number
+    :return: (start, move, num_pieces), or (None, move, 1) for a reserve placement
+    """
+    action = int(action)
+    if action >= STACK_ACTIONS:
+        return (None, divmod(action - STACK_ACTIONS, 6), 1)
+    return (divmod(int(ACTION_SOURCE[action]), 6), divmod(int(ACTION_DEST[action]), 6), int(ACTION_NUM[action]))
+
+
+def move_to_action(move):
+    """
+    Converts a move tuple to its action number
+    :param move: (start, move, num_pieces), or (None, move, 1) for a reserve placement
+    :return: The action number
+    """
+    start, end, num_pieces = move
+    if start is None:
+        return STACK_ACTIONS + end[0] * 6 + end[1]
+    if end[1] == start[1]:
+        direction = 0 if end[0] < start[0] else 1
+    else:
+        direction = 2 if end[1] < start[1] else 3
+    return (start[0] * 6 + start[1]) * 20 + direction * 5 + num_pieces - 1
+
+
+class BatchFocusGame:
+    """
+    Represents N Focus games in NumPy arrays, all in the fill_board start position with the first player to move.
+    Has methods to build the legal move mask of every board, apply one action per board, pick random legal actions,
+    and convert single boards to and from the FocusGame.to_bytes layout.
+    """
+
+    def __init__(self, size):
+        """
+        Initializes size games in the start position
+        :param size: The number of games, N
+        """
+        self.size = size
+        self.pieces = np.zeros((size, 6, 6, 5), dtype=np.int8)
+        self.height = np.ones((size, 6, 6), dtype=np.int8)
+        self.reserves = np.zeros((size, 2), dtype=np.int16)
+        self.captured = np.zeros((size, 2), dtype=np.int16)
+        self.turn = np.zeros(size, dtype=np.int8)              # index of the side to move, -1 once the game is over
+        self.winner = np.full(size, -1, dtype=np.int8)
+        start = np.array([[1, 1, 2, 2, 1, 1], [2, 2, 1, 1, 2, 2]] * 3, dtype=np.int8)
+        self.pieces[:, :, :, 0] = start
+        self._codes = np.empty((36, size), dtype=np.uint8)     # packed byte of square s of board i at [s, i]
+        self._codes[:] = pack_stack(1, start.reshape(36, 1) - 1)
+        self._rows = np.arange(size)
+
+    def move_rows(self):
+        """
+        Indexes the move tables for every square of every board
+        :return: A (36, N) array of move table rows for each square of each board and its side to move
+        """
+        side = np.where(self.turn < 0, FINISHED, self.turn).astype(np.intp)
+        return self._codes + (SQUARE_ROWS + side * (36 * 256))
+
+    def reserve_ready(self):
+        """
+        :return: Boolean array, True for the unfinished boards whose side to move holds a reserve piece
+        """
+        return (self.reserves[self._rows, np.maximum(self.turn, 0)] > 0) & (self.turn >= 0)
+
+    def top_colors(self):
+        """
+        Returns the color of the top piece of every stack
+        :return: An (N, 36) array, 0 for empty squares
+        """
+        return CODE_TOP[self._codes.T]
+
+    def legal_mask(self):
+        """
+        Builds the legal move mask of every board for its side to move
+        :return: An (N, NUM_ACTIONS) boolean array, all False for finished games
+        """
+        mask = np.empty((self.size, NUM_ACTIONS), dtype=bool)
+        rows = np.ascontiguousarray(self.move_rows().T)
+        mask[:, :STACK_ACTIONS] = MOVE_MASKS[rows].view(bool).reshape(self.size, STACK_ACTIONS)
+        mask[:, STACK_ACTIONS:] = self.reserve_ready()[:, None]
+        return mask
+
+    def step(self, actions):
+        """
+        Applies one action to every board, moving pieces, trimming stacks past five pieces into the mover's
+        reserve or captured count, and changing the turn or ending the game. Actions are not validated.
+        :param actions: Array of N action numbers, -1 to leave a board as it is. Finished games are left alone.
+        """
+        actions = np.asarray(actions)
+        games = np.flatnonzero((actions >= 0) & (self.turn >= 0))
+        if len(games) == 0:
+            return
+        action = actions[games].astype(np.intp)
+        side = self.turn[games].astype(np.intp)
+        codes = self._codes.reshape(-1)
+
+        is_reserve = action >= STACK_ACTIONS
+        stack_action = np.where(is_reserve, 0, action)
+        source = ACTION_SOURCE[stack_action]
+        dest = np.where(is_reserve, action - STACK_ACTIONS, ACTION_DEST[stack_action])
+        num = np.where(is_reserve, 1, ACTION_NUM[stack_action]).astype(np.intp)
+
+        # a reserve placement moves a one piece stack of the mover's color
+        moving = np.where(is_reserve, pack_stack(1, side), codes[source * self.size + games]).astype(np.intp)
+        moving_colors = moving >> COLOR_SHIFT                                   #bit 0 is the top piece
+        left = (moving & HEIGHT_MASK) - num | (moving_colors >> num) << COLOR_SHIFT
+        moved = moving_colors & ((1 << num) - 1)
+
+        # put the moved pieces on top, then trim the pieces past five off the bottom
+        target = codes[dest * self.size + games].astype(np.intp)
+        total = (target & HEIGHT_MASK) + num
+        combined = (target >> COLOR_SHIFT) << num | moved
+        excess = np.maximum(total - MAX_HEIGHT, 0)
+        trimmed = POPCOUNT[combined >> MAX_HEIGHT]                              #second player's pieces trimmed
+        merged = np.minimum(total, MAX_HEIGHT) | (combined & 0b11111) << COLOR_SHIFT
+
+        stack_moves = np.flatnonzero(~is_reserve)
+        self.set_squares(games[stack_moves], source[stack_moves], left[stack_moves])
+        self.set_squares(games, dest, merged)
+
+        own = np.where(side == 1, trimmed, excess - trimmed)
+        self.reserves[games, side] += own - is_reserve
+        self.captured[games, side] += excess - own
+
+        won = self.captured[games, side] >= 6
+        self.turn[games] = np.where(won, -1, 1 - side)
+        self.winner[games[won]] = side[won]
+
+    def set_squares(self, games, squares, codes):
+        """
+        Replaces one square on each of some boards, in the packed bytes and in the planes
+        :param games: Array of board indexes
+        :param squares: Array of the square on each board, row * 6 + column
+        :param codes: Array of the new packed byte of each square
+        """
+        self._codes.reshape(-1)[squares * self.size + games] = codes
+        flat = games * 36 + squares
+        self.pieces.reshape(-1, 5)[flat] = CODE_PLANES[codes]
+        self.height.reshape(-1)[flat] = CODE_HEIGHT[codes]
+
+    def random_actions(self, rng):
+        """
+        Picks a uniformly random legal action for every unfinished board. A board whose side to move has no legal
+        action is finished as a loss for that side.
+        :param rng: A numpy.random.Generator
+        :return: Array of N action numbers, -1 for finished boards
+        """
+        rows = self.move_rows()
+        counts = MOVE_COUNTS[rows]
+        ends = np.cumsum(counts, axis=0, dtype=np.int16)                      # legal actions up to each square
+        stack_total = ends[-1]
+        total = stack_total + 36 * self.reserve_ready()
+        stuck = (self.turn >= 0) & (total == 0)
+        self.winner[stuck] = 1 - self.turn[stuck]
+        self.turn[stuck] = -1
+
+        pick = (rng.random(self.size) * total).astype(np.int16)                 # the pick-th legal action
+        square = np.minimum((ends <= pick).sum(axis=0, dtype=np.intp), 35)
+        offset = np.clip(pick - ends[square, self._rows] + counts[square, self._rows], 0, 19)
+        actions = MOVE_ACTIONS[rows[square, self._rows] * 20 + offset].astype(np.intp)
+        actions = np.where(pick >= stack_total, STACK_ACTIONS + pick - stack_total, actions)
+        return np.where(self.turn >= 0, actions, -1)
+
+    def to_bytes(self, index):
+        """
+        Serializes one board in the FocusGame.to_bytes layout
+        :param index: Index of the board
+        :return: The position as 41 bytes
+        """
+        data = bytearray(self._codes[:, index].tobytes())
+        data += bytes((int(self.reserves[index, 0]), int(self.reserves[index, 1]),
+                       int(self.captured[index, 0]), int(self.captured[index, 1]),
+                       3 if self.turn[index] < 0 else int(self.turn[index]) + 1))
+        return bytes(data)
+
+    def load_bytes(self, index, data):
+        """
+        Replaces one board with a position in the FocusGame.to_bytes layout. A position before the first move is
+        loaded with the first player to move.
+        :param index: Index of the board
+        :param data: The position as bytes
+        """
+        self.set_squares(np.full(36, index), np.arange(36), np.frombuffer(bytes(data[:36]), dtype=np.uint8))
+        self.reserves[index] = (data[36], data[37])
+        self.captured[index] = (data[38], data[39])
+        self.turn[index] = (0, 0, 1, -1)[data[40]]
+        self.winner[index] = -1
+        if data[40] == 3:
+            self.winner[index] = 0 if data[38] >= 6 else 1
@@ -0,0 +1,1245 @@
+# Description: Benchmarks for the Focus/Domination engines. Each benchmark is a function that prints its results
+# and returns them as a dictionary, and can be run from the command line by name, e.g.
+#     python FocusBenchmark.py packed
+# Output printed by the engines while a benchmark runs is discarded so only the engine work is timed.
+
+import contextlib
+import copy
+import io
+import os
+import pickle
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from FocusAI import WIN, WIN_BOUND, AlphaBetaPlayer, ParallelSearch, evaluate, full_evaluate
+from FocusArchive import ArchiveWriter, GameArchive
+from FocusBatch import BatchFocusGame, action_to_move, move_to_action
+from FocusBoard import PackedFocusGame, pack_stack
+from FocusBook import OpeningBook, build_book
+from FocusEndgame import MIN_CAPTURED, EndgameTable, build_table
+from FocusMCTS import MCTSPlayer
+from FocusPerft import run_suite
+from FocusProfile import Profiler
+from FocusRecord import RecordReader, RecordWriter, decode_header, encode_header, iter_records
+from FocusTournament import run_tournament
+from FocusTune import OPENING_PLIES, WeightTuner, extract, extract_games, load_rows
+from FocusGame import FocusGame, FocusResult
+
+
+PLAYER1 = ('PlayerA', 'R')
+PLAYER2 = ('PlayerB', 'G')
+BLACK = (0, 0, 0)
+WHITE = (255, 255, 255)
+RED = (255, 0, 0)
+GREEN = (0, 255, 0)
+BLUE = (0, 0, 255)
+
+
+@contextlib.contextmanager
+def quiet():
+    """
+    Context manager that sends anything printed by the engines to os.devnull
+    """
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+def deep_size(obj, seen=None):
+    """
+    Returns the total number of bytes used by an object and every object reachable from it through containers
+    and instance dictionaries. Each object is counted once.
+    :param obj: The object to measure
+    :param seen: Set of object ids already counted, used by the recursion
+    :return: The size of the object graph in bytes
+    """
+    if seen is None:
+        seen = set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        for key, value in obj.items():
+            size += deep_size(key, seen) + deep_size(value, seen)
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        for item in obj:
+            size += deep_size(item, seen)
+    elif hasattr(obj, '__dict__'):
+        size += deep_size(obj.__dict__, seen)
+    return size
+
+
+def packed_size(game):
+    """
+    Returns the bytes used by the position held in a PackedFocusGame: the board array plus the reserve and
+    captured counts. The player names and colors are shared by every position and are not counted.
+    :param game: A PackedFocusGame
+    :return: The size of the position in bytes
+    """
+    return deep_size((game._board, game._reserves, game._captured))
+
+
+def random_script(num_moves, seed=0):
+    """
+    Plays random legal games on a PackedFocusGame and records every move, starting a new game whenever one is
+    won, so the same move list can be replayed on each engine.
+    :param num_moves: The number of moves to record
+    :param seed: Seed for the random number generator
+    :return: A list of games, each a list of moves. A move is (player, start, move, num_pieces) for a stack
+    move or (player, None, move, 1) for a reserved move
+    """
+    rng = random.Random(seed)
+    games = []
+    recorded = 0
+    while recorded < num_moves:
+        game = PackedFocusGame(PLAYER1, PLAYER2)
+        names = [PLAYER1[0], PLAYER2[0]]
+        player = 0
+        moves = []
+        result = None
+        while recorded < num_moves and result != names[player] + " wins":
+            candidates = []
+            for row in range(6):
+                for column in range(6):
+                    value = game._board[row * 6 + column]
+                    height = value & 7
+                    if height and (value >> 3) & 1 == player:
+                        for num in range(1, height + 1):
+                            for end in ((row - num, column), (row + num, column),
+                                        (row, column - num), (row, column + num)):
+                                if 0 <= end[0] < 6 and 0 <= end[1] < 6:
+                                    candidates.append((names[player], (row, column), end, num))
+                    if game._reserves[player]:
+                        candidates.append((names[player], None, (row, column), 1))
+            move = rng.choice(candidates)
+            with quiet():
+                result = replay_move(game, move)
+            moves.append(move)
+            recorded += 1
+            if result != names[player] + " wins":
+                player = 1 - player
+        games.append(moves)
+    return games
+
+
+def replay_move(game, move):
+    """
+    Applies one recorded move to a game through its public move methods
+    :param game: A FocusGame or PackedFocusGame
+    :param move: A move as recorded by random_script
+    :return: The result of move_piece or reserved_move
+    """
+    if move[1] is None:
+        return game.reserved_move(move[0], move[2])
+    return game.move_piece(move[0], move[1], move[2], move[3])
+
+
+def play_second_first(game, max_moves=400, seed=0):
+    """
+    Plays random moves on a game in its starting position with the second player opening, as the rules allow,
+    through move_piece and reserved_move so a recorder set on the game sees every move
+    :param game: A FocusGame between PLAYER1 and PLAYER2 with no turn yet
+    :param max_moves: Most moves to play, fewer if the game is won
+    :param seed: Seed for the random moves
+    :return: The list of positions as bytes after each move
+    """
+    rng = random.Random(seed)
+    player = PLAYER2[0]
+    positions = []
+    while len(positions) < max_moves and player != 1:
+        moves = list(game.legal_moves(player))
+        if not moves:
+            break
+        start, end, num_pieces = rng.choice(moves)
+        if start is None:
+            game.reserved_move(player, end)
+        else:
+            game.move_piece(player, start, end, num_pieces)
+        positions.append(game.to_bytes())
+        player = game.get_turn()
+    return positions
+
+
+def time_engine(engine, games):
+    """
+    Replays every recorded game on a fresh instance of an engine
+    :param engine: FocusGame, PackedFocusGame, or any function taking the two player tuples and returning a game
+    :param games: The games recorded by random_script
+    :return: The number of seconds spent replaying
+    """
+    with quiet():
+        began = time.perf_counter()
+        for moves in games:
+            game = engine(PLAYER1, PLAYER2)
+            for move in moves:
+                replay_move(game, move)
+        return time.perf_counter() - began
+
+
+def bench_packed(num_moves=20000, seed=0):
+    """
+    Compares moves/sec and bytes per position of the Stack based FocusGame against PackedFocusGame, after
+    checking that both engines reach the same results on the same moves.
+    :param num_moves: The number of moves to replay on each engine
+    :param seed: Seed used to record the random games
+    :return: A dictionary of the measured results
+    """
+    games = random_script(num_moves, seed)
+    with quiet():
+        for moves in games:
+            stack_game = FocusGame(PLAYER1, PLAYER2)
+            packed_game = PackedFocusGame(PLAYER1, PLAYER2)
+            for move in moves:
+                if replay_move(stack_game, move) != replay_move(packed_game, move):
+                    raise AssertionError("engines disagree on move %r" % (move,))
+            for row in range(6):
+                for column in range(6):
+                    expected = stack_game._board[row][column]
+                    expected = expected.get_stack_list()[::-1] if expected else False
+                    if packed_game.show_pieces((row, column)) != expected:
+                        raise AssertionError("engines disagree at square %r" % ((row, column),))
+
+    stack_seconds = time_engine(FocusGame, games)
+    packed_seconds = time_engine(PackedFocusGame, games)
+    results = {
+        'moves': num_moves,
+        'stack_moves_per_sec': num_moves / stack_seconds,
+        'packed_moves_per_sec': num_moves / packed_seconds,
+        'stack_bytes_per_position': deep_size(FocusGame(PLAYER1, PLAYER2)),
+        'packed_bytes_per_position': packed_size(PackedFocusGame(PLAYER1, PLAYER2)),
+    }
+    print("Stack board:  %10.0f moves/sec  %6d bytes per position"
+          % (results['stack_moves_per_sec'], results['stack_bytes_per_position']))
+    print("Packed board: %10.0f moves/sec  %6d bytes per position"
+          % (results['packed_moves_per_sec'], results['packed_bytes_per_position']))
+    return results
+
+
+def bench_evaluate(num_moves=2000, seed=0, repeats=20):
+    """
+    Compares evaluations per second of full_evaluate, which walks the board, against evaluate, which reads the
+    terms the game keeps up to date, on the positions of random games. Also times scoring every leaf one ply
+    below each position with make_move, an evaluation and unmake_move, as the search does.
+    :param num_moves: The number of positions, one after each recorded move
+    :param seed: Seed used to record the random games
+    :param repeats: Evaluations of each position and player
+    :return: A dictionary of the measured results
+    :raise AssertionError: If the two evaluations disagree
+    """
+    positions = []
+    for moves in random_script(num_moves, seed):
+        game = quiet_game(PLAYER1, PLAYER2)
+        for move in moves:
+            replay_move(game, move)
+            if game.get_turn() != 1:
+                positions.append(game.to_bytes())
+    game = quiet_game(PLAYER1, PLAYER2)
+    names = (PLAYER1[0], PLAYER2[0])
+    rates = {}
+    for name, evaluator in (('full', full_evaluate), ('incremental', evaluate)):
+        seconds = 0.0
+        for position in positions:
+            game.load_bytes(position)
+            began = time.perf_counter()
+            for i in range(repeats):
+                evaluator(game, names[0])
+                evaluator(game, names[1])
+            seconds += time.perf_counter() - began
+        rates[name] = 2 * repeats * len(positions) / seconds
+    leaves = 0
+    leaf_seconds = {'full': 0.0, 'incremental': 0.0}
+    for position in positions[::10]:
+        game.load_bytes(position)
+        player = game.get_turn()
+        moves = list(game.legal_moves(player))
+        for name, evaluator in (('full', full_evaluate), ('incremental', evaluate)):
+            began = time.perf_counter()
+            for move in moves:
+                game.make_move(move, player)
+                evaluator(game, player)
+                game.unmake_move()
+            leaf_seconds[name] += time.perf_counter() - began
+        for move in moves:
+            game.make_move(move, player)
+            assert evaluate(game, player) == full_evaluate(game, player), move
+            game.unmake_move()
+        leaves += len(moves)
+    results = {
+        'full_evals_per_sec': rates['full'],
+        'incremental_evals_per_sec': rates['incremental'],
+        'full_leaves_per_sec': leaves / leaf_seconds['full'],
+        'incremental_leaves_per_sec': leaves / leaf_seconds['incremental'],
+    }
+    print("Evaluations: full %9.0f/sec, incremental %9.0f/sec (%.1fx)"
+          % (rates['full'], rates['incremental'], rates['incremental'] / rates['full']))
+    print("Leaves (make, evaluate, unmake): full %8.0f/sec, incremental %8.0f/sec (%.1fx)"
+          % (results['full_leaves_per_sec'], results['incremental_leaves_per_sec'],
+             results['incremental_leaves_per_sec'] / results['full_leaves_per_sec']))
+    return results
+
+
+def bench_book(games=400, probes=20000, seed=0, depth=3):
+    """
+    Builds an opening book from random against greedy self-play games, then times probing it through mmap for a
+    position in the book and one that is not, against an alpha-beta search of the start position
+    :param games: Games played to build the book from
+    :param probes: Probes timed for each position
+    :param seed: Seed for the agents
+    :param depth: Depth of the search compared against
+    :return: A dictionary of the measured results
+    """
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, 'games.fga')
+    out = os.path.join(directory, 'opening.fgb')
+    try:
+        with quiet():
+            run_tournament(['random', 'greedy'], games, workers=1, seed=seed, archive=path)
+        began = time.perf_counter()
+        entries = build_book([path], out)
+        build_seconds = time.perf_counter() - began
+        book = OpeningBook(out)
+        start = quiet_game(PLAYER1, PLAYER2)
+        late = quiet_game(PLAYER1, PLAYER2)
+        for moves in random_script(40, seed):
+            for move in moves:
+                replay_move(late, move)
+        timings = {}
+        for name, game in (('hit', start), ('miss', late)):
+            player = game.get_turn() or PLAYER1[0]
+            began = time.perf_counter()
+            for i in range(probes):
+                book.probe(game, player)
+            timings[name] = 1e6 * (time.perf_counter() - began) / probes
+        began = time.perf_counter()
+        for i in range(probes // 10):
+            book.choose(start, PLAYER1[0])
+        choose_us = 1e6 * (time.perf_counter() - began) / (probes // 10)
+        player = AlphaBetaPlayer(max_depth=depth)
+        player.best_move(start, PLAYER1[0], time_ms=10 ** 9)
+        search_us = 1e6 * player.get_stats()['seconds']
+        results = {
+            'entries': entries,
+            'bytes': os.path.getsize(out),
+            'build_seconds': build_seconds,
+            'hit_probe_us': timings['hit'],
+            'miss_probe_us': timings['miss'],
+            'choose_us': choose_us,
+            'search_us': search_us,
+        }
+        book.close()
+    finally:
+        shutil.rmtree(directory)
+    print("Book: %d entries, %d bytes, built from %d games in %.2f s"
+          % (entries, results['bytes'], games, build_seconds))
+    print("Probe: %.1f us in the book, %.1f us not in it; book move %.1f us against %.0f us for a depth %d search"
+          % (timings['hit'], timings['miss'], choose_us, search_us, depth))
+    return results
+
+
+def timed_search(game, depth, endgame=None):
+    """
+    Runs a fixed depth alpha-beta search
+    :param game: A FocusGame with a player to move
+    :param depth: The depth to search to
+    :param endgame: A FocusEndgame.EndgameTable for the search to probe, or None
+    :return: A tuple of (score, nodes, seconds)
+    """
+    player = AlphaBetaPlayer(max_depth=depth, endgame=endgame)
+    player.best_move(game, game.get_turn(), time_ms=10 ** 9)
+    stats = player.get_stats()
+    return stats['score'], stats['nodes'], stats['seconds']
+
+
+def bench_endgame(games=20, positions=200, probes=20000, seed=0, depth=2):
+    """
+    Builds an endgame table from random against greedy self-play games, proving wins deeper than the searches
+    look, then times probing it and searches late positions of those games with and without it. Every win or loss
+    the plain search finds must be scored the same with the table. For the positions only the table decides, a
+    plain search is run deep enough to see the result, which must agree, and the table must decide them in less
+    time than that search takes.
+    :param games: Games played to build the table from
+    :param positions: Late positions searched
+    :param probes: Probes timed
+    :param seed: Seed for the agents
+    :param depth: Depth of the searches, the default depth of FocusTournament's alphabeta agent
+    :return: A dictionary of the measured results
+    """
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, 'games.fga')
+    out = os.path.join(directory, 'endgame.fge')
+    try:
+        with quiet():
+            run_tournament(['random', 'greedy'], games, workers=1, seed=seed, archive=path)
+        began = time.perf_counter()
+        entries, tried = build_table([path], out, workers=1)
+        build_seconds = time.perf_counter() - began
+        table = EndgameTable(out)
+        late = []
+        with GameArchive(path) as archive:
+            for record in archive.records(range(len(archive))):
+                for move, game in record.replay():
+                    if len(late) < positions and game.get_turn() != 1 and \
+                            max(len(user.get_captured()) for user in game._players) >= MIN_CAPTURED:
+                        late.append(game.clone())
+                del record
+        began = time.perf_counter()
+        for i in range(probes):
+            table.probe(late[i % len(late)])
+        probe_us = 1e6 * (time.perf_counter() - began) / probes
+        nodes = {'plain': 0, 'table': 0}
+        seconds = {'plain': 0.0, 'table': 0.0}
+        decided = {'plain': 0, 'table': 0}
+        mismatches = 0
+        found = []                                                  #(game, score, seconds) the table alone decides
+        for game in late:
+            plain = timed_search(game, depth)
+            solved = timed_search(game, depth, table)
+            for name, (score, count, elapsed) in (('plain', plain), ('table', solved)):
+                nodes[name] += count
+                seconds[name] += elapsed
+                decided[name] += abs(score) >= WIN_BOUND
+            if abs(plain[0]) >= WIN_BOUND:
+                mismatches += plain[0] != solved[0]
+            elif abs(solved[0]) >= WIN_BOUND:
+                found.append((game, solved[0], solved[2]))
+        deep_seconds = 0.0
+        for game, score, elapsed in found:
+            deep = timed_search(game, WIN - abs(score) + 1)         #a ply more shows a side left with no move
+            deep_seconds += deep[2]
+            mismatches += not (deep[0] >= WIN_BOUND if score > 0 else deep[0] <= -WIN_BOUND)
+        found_seconds = sum(elapsed for game, score, elapsed in found)
+        results = {
+            'entries': entries,
+            'positions_tried': tried,
+            'bytes': os.path.getsize(out),
+            'build_seconds': build_seconds,
+            'solved_per_sec': tried / build_seconds if build_seconds > 0 else 0.0,
+            'probe_us': probe_us,
+            'plain_nodes': nodes['plain'],
+            'table_nodes': nodes['table'],
+            'plain_seconds': seconds['plain'],
+            'table_seconds': seconds['table'],
+            'decided_plain': decided['plain'],
+            'decided_table': decided['table'],
+            'table_only': len(found),
+            'table_only_seconds': found_seconds,
+            'deep_search_seconds': deep_seconds,
+            'mismatches': mismatches,
+        }
+        table.close()
+    finally:
+        shutil.rmtree(directory)
+    print("Table: %d positions proved of %d tried from %d games in %.2f s, %.0f positions/sec, %d bytes"
+          % (entries, tried, games, build_seconds, results['solved_per_sec'], results['bytes']))
+    print("Probe: %.1f us" % probe_us)
+    print("Depth %d on %d late positions: %d nodes in %.2f s without the table, %d nodes in %.2f s with it"
+          % (depth, len(late), nodes['plain'], seconds['plain'], nodes['table'], seconds['table']))
+    print("Decided: %d without the table, %d with it, %d mismatched scores"
+          % (decided['plain'], decided['table'], mismatches))
+    print("Decided only with the table: %d positions in %.3f s, a plain search deep enough takes %.3f s (%.1fx)"
+          % (len(found), found_seconds, deep_seconds, deep_seconds / found_seconds if found_seconds else 0.0))
+    assert mismatches == 0, "the table and the search disagree"
+    assert found and found_seconds < deep_seconds, "the table decides nothing sooner than a deeper search"
+    return results
+
+
+def bench_search(depth=3, num_moves=6):
+    """
+    Measures alpha-beta search throughput at a fixed depth from the start position and from the positions reached
+    by playing the first few searched moves.
+    :param depth: The depth each position is searched to
+    :param num_moves: The number of positions searched
+    :return: A dictionary of the measured results
+    """
+    game = FocusGame(PLAYER1, PLAYER2)
+    player = AlphaBetaPlayer(max_depth=depth)
+    name = PLAYER1[0]
+    nodes = 0
+    seconds = 0.0
+    for i in range(num_moves):
+        move = player.best_move(game, name, time_ms=10 ** 9)
+        stats = player.get_stats()
+        nodes += stats['nodes']
+        seconds += stats['seconds']
+        game.make_move(move, name)
+        name = game.get_turn()
+        if name == 1:
+            break
+    results = {'depth': depth, 'nodes': nodes, 'nodes_per_sec': nodes / seconds}
+    print("Alpha-beta depth %d: %d nodes, %10.0f nodes/sec" % (depth, nodes, results['nodes_per_sec']))
+    return results
+
+
+def bench_parallel(depth=3, workers=None, num_moves=4):
+    """
+    Measures the speedup of ParallelSearch over a single worker at a fixed depth, for root splitting and lazy SMP.
+    The shared transposition table is cleared before each position so every run does the same work.
+    :param depth: The depth each position is searched to
+    :param workers: Number of workers to compare against one, defaults to the number of CPUs
+    :param num_moves: The number of positions searched
+    :return: A dictionary of the measured results
+    """
+    workers = workers or os.cpu_count() or 1
+    results = {}
+    for mode in ('root', 'smp'):
+        seconds = {}
+        for count in sorted({1, workers}):
+            search = ParallelSearch(workers=count, mode=mode, max_depth=depth)
+            search.best_move(FocusGame(PLAYER1, PLAYER2), PLAYER1[0], time_ms=10 ** 9)     #start the workers
+            game = FocusGame(PLAYER1, PLAYER2)
+            name = PLAYER1[0]
+            seconds[count] = 0.0
+            for i in range(num_moves):
+                search.get_table().clear()
+                began = time.perf_counter()
+                move = search.best_move(game, name, time_ms=10 ** 9)
+                seconds[count] += time.perf_counter() - began
+                game.make_move(move, name)
+                name = game.get_turn()
+            search.close()
+        results[mode] = seconds[1] / seconds[workers]
+        print("%-4s depth %d: 1 worker %.2fs, %d workers %.2fs, speedup %.2fx"
+              % (mode, depth, seconds[1], workers, seconds[workers], results[mode]))
+    return results
+
+
+def bench_mcts(playouts=500, num_moves=4, seed=0):
+    """
+    Measures MCTS playouts/sec over the first few moves of a game, for comparison with the alpha-beta nodes/sec
+    from bench_search.
+    :param playouts: Playouts per move
+    :param num_moves: The number of moves searched
+    :param seed: Seed for the MCTS random number generator
+    :return: A dictionary of the measured results
+    """
+    game = FocusGame(PLAYER1, PLAYER2)
+    player = MCTSPlayer(playouts=playouts, seed=seed)
+    name = PLAYER1[0]
+    count = 0
+    seconds = 0.0
+    for i in range(num_moves):
+        move = player.best_move(game, name)
+        stats = player.get_stats()
+        count += stats['playouts']
+        seconds += stats['seconds']
+        game.make_move(move, name)
+        name = game.get_turn()
+        if name == 1:
+            break
+    results = {'playouts': count, 'playouts_per_sec': count / seconds}
+    print("MCTS: %d playouts, %10.0f playouts/sec" % (count, results['playouts_per_sec']))
+    return results
+
+
+def quiet_game(player1, player2):
+    """
+    Makes a FocusGame in quiet mode
+    :param player1: Tuple of (name, color) for the first player
+    :param player2: Tuple of (name, color) for the second player
+    :return: A FocusGame that returns FocusResult codes and never prints
+    """
+    return FocusGame(player1, player2, quiet=True)
+
+
+def bench_quiet(num_moves=20000, seed=0, repeats=5):
+    """
+    Compares FocusGame moves/sec with printing (sent to os.devnull, the cheapest place it can go) against quiet
+    mode, after checking quiet mode reaches the same results, and checks that quiet mode is the faster
+    :param num_moves: The number of moves to replay on each engine
+    :param seed: Seed used to record the random games
+    :param repeats: Runs of each mode, the fastest is kept
+    :return: A dictionary of the measured results
+    """
+    games = random_script(num_moves, seed)
+    with quiet():
+        for moves in games:
+            printing_game = FocusGame(PLAYER1, PLAYER2)
+            quiet_one = quiet_game(PLAYER1, PLAYER2)
+            for move in moves:
+                expected = replay_move(printing_game, move)
+                result = replay_move(quiet_one, move)
+                if result is FocusResult.WIN:
+                    result = move[0] + " wins"
+                elif result is FocusResult.MOVED:
+                    result = 'successfully moved'
+                if result != expected:
+                    raise AssertionError("quiet mode disagrees on move %r" % (move,))
+
+    printing_seconds = quiet_seconds = None
+    for i in range(repeats):                                                    #interleaved so both see the same load
+        seconds = time_engine(FocusGame, games)
+        printing_seconds = seconds if printing_seconds is None else min(printing_seconds, seconds)
+        seconds = time_engine(quiet_game, games)
+        quiet_seconds = seconds if quiet_seconds is None else min(quiet_seconds, seconds)
+    results = {
+        'moves': num_moves,
+        'printing_moves_per_sec': num_moves / printing_seconds,
+        'quiet_moves_per_sec': num_moves / quiet_seconds,
+    }
+    print("Printing:   %10.0f moves/sec" % results['printing_moves_per_sec'])
+    print("Quiet mode: %10.0f moves/sec (%.2fx)"
+          % (results['quiet_moves_per_sec'], printing_seconds / quiet_seconds))
+    assert quiet_seconds < printing_seconds, "quiet mode is slower than printing"
+    return results
+
+
+def bench_batch(size=4096, plies=100, num_moves=20000, seed=0):
+    """
+    Compares moves/sec of BatchFocusGame advancing many random games at once against replaying moves one at a
+    time on quiet FocusGame instances, after checking a smaller batch has the same legal moves and reaches the same
+    positions as FocusGame. Building legal move masks for the whole batch is timed separately.
+    :param size: The number of boards in the timed batch
+    :param plies: The number of steps the timed batch takes
+    :param num_moves: The number of moves to replay on FocusGame
+    :param seed: Seed for the random number generators
+    :return: A dictionary of the measured results
+    """
+    rng = np.random.default_rng(seed)
+    batch = BatchFocusGame(64)
+    games = [quiet_game(PLAYER1, PLAYER2) for i in range(batch.size)]
+    for ply in range(plies):
+        mask = batch.legal_mask()
+        actions = batch.random_actions(rng)
+        for i in range(batch.size):
+            if actions[i] >= 0:
+                player = games[i].get_turn() or PLAYER1[0]
+                legal = {move_to_action(move) for move in games[i].legal_moves(player)}
+                if set(np.flatnonzero(mask[i])) != legal or actions[i] not in legal:
+                    raise AssertionError("batch engine disagrees on legal moves of board %d at ply %d" % (i, ply))
+                start, end, num = action_to_move(actions[i])
+                replay_move(games[i], (player, start, end, num))
+        batch.step(actions)
+        for i in range(batch.size):
+            if actions[i] >= 0 and batch.to_bytes(i)[:40] != games[i].to_bytes()[:40]:
+                raise AssertionError("batch engine disagrees on board %d at ply %d" % (i, ply))
+
+    batch = BatchFocusGame(size)
+    moves = 0
+    began = time.perf_counter()
+    for ply in range(plies):
+        actions = batch.random_actions(rng)
+        moves += int((actions >= 0).sum())
+        batch.step(actions)
+    batch_seconds = time.perf_counter() - began
+    began = time.perf_counter()
+    for ply in range(plies):
+        batch.legal_mask()
+    mask_seconds = time.perf_counter() - began
+    object_seconds = time_engine(quiet_game, random_script(num_moves, seed))
+    results = {
+        'boards': size,
+        'moves': moves,
+        'finished': int((batch.turn < 0).sum()),
+        'batch_moves_per_sec': moves / batch_seconds,
+        'object_moves_per_sec': num_moves / object_seconds,
+        'masks_per_sec': plies * size / mask_seconds,
+    }
+    print("FocusGame:      %10.0f moves/sec" % results['object_moves_per_sec'])
+    print("BatchFocusGame: %10.0f moves/sec (%.1fx), %d boards, %d finished"
+          % (results['batch_moves_per_sec'], results['batch_moves_per_sec'] / results['object_moves_per_sec'],
+             size, results['finished']))
+    print("Legal masks:    %10.0f boards/sec" % results['masks_per_sec'])
+    return results
+
+
+def bench_archive(num_games=100000, max_moves=60, lookups=10000, seed=0):
+    """
+    Builds a GameArchive of num_games records in a temporary directory, then times random access to single games
+    and positions, a query for the games between two players, and a sequential scan decoding every move. The
+    records are made from a smaller set of recorded random games, cut to max_moves and given players from a pool
+    of names.
+    :param num_games: The number of games in the archive
+    :param max_moves: The most moves kept of each recorded game
+    :param lookups: The number of random games looked up
+    :param seed: Seed for the games and lookups
+    :return: A dictionary of the measured results
+    """
+    rng = random.Random(seed)
+    bodies = []
+    for moves in random_script(20000, seed):
+        stream = io.BytesIO()
+        game = quiet_game(PLAYER1, PLAYER2)
+        writer = RecordWriter(stream, game)
+        game.set_recorder(writer)
+        for move in moves[:max_moves]:
+            replay_move(game, move)
+        writer.close(game)
+        record = stream.getvalue()
+        players, interval, start, first = decode_header(record)
+        bodies.append((start, interval, record[first:], min(len(moves), max_moves)))
+    names = ["Player%02d" % i for i in range(40)]
+
+    directory = tempfile.mkdtemp()
+    try:
+        path = os.path.join(directory, 'games.fga')
+        began = time.perf_counter()
+        lengths = []
+        with ArchiveWriter(path) as archive:
+            for i in range(num_games):
+                first, second = rng.sample(names, 2)
+                start, interval, body, length = bodies[i % len(bodies)]
+                archive.add(encode_header(((first, 'R'), (second, 'G')), start, interval) + body)
+                lengths.append(length)
+            opened = quiet_game(PLAYER1, PLAYER2)
+            archive.record(opened)
+            positions = play_second_first(opened, seed=seed)
+        build_seconds = time.perf_counter() - began
+        size = os.path.getsize(path)
+
+        began = time.perf_counter()
+        archive = GameArchive(path)
+        open_seconds = time.perf_counter() - began
+        targets = [rng.randrange(num_games) for i in range(lookups)]
+        latencies = []
+        for number in targets:
+            began = time.perf_counter()
+            archive.get_moves(number)
+            latencies.append(time.perf_counter() - began)
+        latencies.sort()
+        position_latencies = []
+        for number in targets:
+            began = time.perf_counter()
+            archive.position(number, rng.randint(0, lengths[number]))
+            position_latencies.append(time.perf_counter() - began)
+        position_latencies.sort()
+        for k in range(1, len(positions) + 1):
+            assert archive.position(num_games, k).to_bytes() == positions[k - 1]
+        began = time.perf_counter()
+        between = archive.games_between(names[0], names[1])
+        first_query_seconds = time.perf_counter() - began
+        began = time.perf_counter()
+        archive.games_between(names[2], names[3])
+        query_seconds = time.perf_counter() - began
+
+        began = time.perf_counter()
+        scanned = 0
+        for record in archive.records():
+            for move in record.moves():
+                scanned += 1
+        scan_seconds = time.perf_counter() - began
+        archive.close()
+    finally:
+        shutil.rmtree(directory)
+
+    results = {
+        'games': num_games,
+        'archive_bytes': size,
+        'build_seconds': build_seconds,
+        'open_seconds': open_seconds,
+        'game_p50_us': 1e6 * latencies[len(latencies) // 2],
+        'game_p99_us': 1e6 * latencies[int(len(latencies) * 0.99)],
+        'position_p50_us': 1e6 * position_latencies[len(latencies) // 2],
+        'position_p99_us': 1e6 * position_latencies[int(len(latencies) * 0.99)],
+        'pair_games': len(between),
+        'first_pair_query_seconds': first_query_seconds,
+        'pair_query_seconds': query_seconds,
+        'scan_games_per_sec': num_games / scan_seconds,
+        'scan_moves_per_sec': scanned / scan_seconds,
+        'scan_mb_per_sec': size / scan_seconds / 1e6,
+    }
+    print("%d games, %.1f MB, built in %.2f s, opened in %.2f ms"
+          % (num_games, size / 1e6, build_seconds, 1000 * open_seconds))
+    print("Game N moves view:    p50 %6.1f us  p99 %6.1f us" % (results['game_p50_us'], results['game_p99_us']))
+    print("Game N position at K: p50 %6.1f us  p99 %6.1f us, every position of a second player first game matches"
+          % (results['position_p50_us'], results['position_p99_us']))
+    print("Games between two players: %d games, first query %.1f ms, later queries %.3f ms"
+          % (len(between), 1000 * first_query_seconds, 1000 * query_seconds))
+    print("Sequential scan: %.0f games/sec, %.0f moves/sec, %.1f MB/sec"
+          % (results['scan_games_per_sec'], results['scan_moves_per_sec'], results['scan_mb_per_sec']))
+    return results
+
+
+def bench_record(num_moves=50000, seed=0):
+    """
+    Records random games with RecordWriter and compares their size with pickling each finished FocusGame with the
+    moves that led to it, which is what a record holds, and with the finished FocusGame alone, then times scanning
+    every record's moves, replaying every record, and seeking to random moves
+    :param num_moves: The number of moves to record
+    :param seed: Seed used to record the random games
+    :return: A dictionary of the measured results
+    """
+    games = random_script(num_moves, seed)
+    stream = io.BytesIO()
+    pickled = 0
+    pickled_final = 0
+    with quiet():
+        for moves in games:
+            game = quiet_game(PLAYER1, PLAYER2)
+            writer = RecordWriter(stream, game)
+            game.set_recorder(writer)
+            for move in moves:
+                replay_move(game, move)
+            writer.close(game)
+            game.set_recorder(None)
+            pickled += len(pickle.dumps((game, moves)))
+            pickled_final += len(pickle.dumps(game))
+    data = stream.getvalue()
+    assert len(data) < pickled_final, "records take more space than pickling the final positions alone"
+
+    began = time.perf_counter()
+    records = 0
+    for record in iter_records(io.BytesIO(data)):
+        for move in record.moves():
+            pass
+        records += 1
+    scan_seconds = time.perf_counter() - began
+    readers = list(iter_records(io.BytesIO(data)))
+    began = time.perf_counter()
+    for record in readers:
+        for move, game in record.replay():
+            pass
+    replay_seconds = time.perf_counter() - began
+    rng = random.Random(seed)
+    targets = [(record, rng.randint(0, len(moves))) for record, moves in zip(readers, games)]
+    began = time.perf_counter()
+    for record, number in targets:
+        record.seek(number)
+    seek_seconds = time.perf_counter() - began
+    results = {
+        'games': len(games),
+        'record_bytes': len(data),
+        'pickle_bytes': pickled,
+        'pickle_final_bytes': pickled_final,
+        'bytes_per_move': len(data) / num_moves,
+        'scan_games_per_sec': records / scan_seconds,
+        'scan_moves_per_sec': num_moves / scan_seconds,
+        'replay_moves_per_sec': num_moves / replay_seconds,
+        'seeks_per_sec': len(targets) / seek_seconds,
+    }
+    print("%d games, %d moves: records %d bytes (%.1f bytes/move)"
+          % (len(games), num_moves, len(data), results['bytes_per_move']))
+    print("Pickled FocusGame and moves %d bytes (%.2fx larger), final FocusGame alone %d bytes (%.2fx larger)"
+          % (pickled, pickled / len(data), pickled_final, pickled_final / len(data)))
+    print("Scan:   %10.0f games/sec %10.0f moves/sec" % (results['scan_games_per_sec'], results['scan_moves_per_sec']))
+    print("Replay: %10.0f moves/sec" % results['replay_moves_per_sec'])
+    print("Seek:   %10.0f seeks/sec" % results['seeks_per_sec'])
+
+    stream = io.BytesIO()
+    game = quiet_game(PLAYER1, PLAYER2)
+    writer = RecordWriter(stream, game)
+    game.set_recorder(writer)
+    positions = play_second_first(game, seed=seed)
+    writer.close(game)
+    record = RecordReader(stream.getvalue())
+    assert record.get_first_mover() == PLAYER2[0]
+    assert [game.to_bytes() for move, game in record.replay()] == positions
+    assert all(record.seek(k).to_bytes() == positions[k - 1] for k in range(1, len(positions) + 1))
+    print("Second player first: %d moves replayed and sought to the recorded positions" % len(positions))
+    return results
+
+
+def bench_snapshot(positions=200, repeat=20, seed=0):
+    """
+    Compares copying FocusGame positions with copy.deepcopy against clone(), snapshot() and restore(), and against
+    to_bytes() and load_bytes(), on positions from random games, after checking each copy matches the original
+    :param positions: The number of positions
+    :param repeat: Times each position is copied with each method
+    :param seed: Seed used to record the random games
+    :return: A dictionary of copies per second for each method
+    """
+    games = []
+    with quiet():
+        for moves in random_script(positions * 10, seed):
+            game = quiet_game(PLAYER1, PLAYER2)
+            for i, move in enumerate(moves):
+                replay_move(game, move)
+                if i % 10 == 9 and len(games) < positions:
+                    games.append(game.clone())
+    spare = quiet_game(PLAYER1, PLAYER2)
+    for game in games:
+        spare.restore(game.snapshot())
+        for other in (copy.deepcopy(game), game.clone(), spare):
+            if other.to_bytes() != game.to_bytes() or other.get_hash() != game.get_hash():
+                raise AssertionError("copied position differs from the original")
+
+    snapshots = [game.snapshot() for game in games]
+    data = [game.to_bytes() for game in games]
+    methods = (
+        ('deepcopy', lambda: [copy.deepcopy(game) for game in games]),
+        ('clone', lambda: [game.clone() for game in games]),
+        ('snapshot', lambda: [game.snapshot() for game in games]),
+        ('restore', lambda: [spare.restore(position) for position in snapshots]),
+        ('to_bytes', lambda: [game.to_bytes() for game in games]),
+        ('load_bytes', lambda: [spare.load_bytes(position) for position in data]),
+    )
+    results = {}
+    for name, run in methods:
+        began = time.perf_counter()
+        for i in range(repeat):
+            run()
+        results[name + '_per_sec'] = len(games) * repeat / (time.perf_counter() - began)
+    for name, run in methods:
+        rate = results[name + '_per_sec']
+        print("%-10s %10.0f per sec (%5.1fx deepcopy)" % (name, rate, rate / results['deepcopy_per_sec']))
+    return results
+
+
+def headless_display(**options):
+    """
+    Sets up a FocusDisplay on the SDL dummy video driver, so benchmarks draw without opening a window
+    :param options: Keyword arguments for FocusDisplay
+    :return: A tuple of (FocusDisplay, screen Surface)
+    """
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    from FocusDisplay import FocusDisplay
+    display = FocusDisplay(run=False, **options)
+    return display, display.setup_screen(BLACK, WHITE, BLUE)
+
+
+def bench_sprites(frames=500, seed=0):
+    """
+    Compares full frame times of FocusDisplay drawing every piece with its own rectangle against blitting one
+    cached sprite per square, on the start position (36 single pieces) and on a board of 36 random 5 piece stacks
+    :param frames: Frames drawn for each position and renderer
+    :param seed: Seed for the tall stacks
+    :return: A dictionary of milliseconds per frame
+    """
+    import pygame
+    rng = random.Random(seed)
+    tall = quiet_game(PLAYER1, PLAYER2)
+    tall.load_bytes(bytes(pack_stack(5, rng.randrange(32)) for i in range(36)) + bytes([0, 0, 0, 0, 1]))
+    positions = (('full board', quiet_game(PLAYER1, PLAYER2)), ('tall stacks', tall))
+    results = {}
+    for name, game in positions:
+        times = {}
+        for renderer, cache in (('rects', 0), ('sprites', 64)):
+            display, screen = headless_display(sprite_cache=cache)
+            display.fill_pieces(screen, RED, GREEN, game)                       #warm the sprite cache
+            began = time.perf_counter()
+            for i in range(frames):
+                display.fill_pieces(screen, RED, GREEN, game)
+                pygame.display.flip()
+            times[renderer] = 1000 * (time.perf_counter() - began) / frames
+            results[name.replace(' ', '_') + '_' + renderer + '_ms'] = times[renderer]
+        print("%-12s per piece rects %6.3f ms/frame, sprites %6.3f ms/frame (%.1fx)"
+              % (name, times['rects'], times['sprites'], times['rects'] / times['sprites']))
+    pygame.quit()
+    return results
+
+
+def bench_export(num_positions=1000, seed=0, workers=None):
+    """
+    Draws positions from random games to thumbnails with FocusExport on the SDL dummy video driver, as RGB arrays
+    and as PNG files, in one process and across a process pool
+    :param num_positions: The number of positions to draw
+    :param seed: Seed used to record the random games
+    :param workers: Worker processes for the pool, defaults to the number of CPUs and at least two
+    :return: A dictionary of images per second
+    """
+    from FocusExport import THUMBNAIL_SIZE, export_arrays, export_png, game_job
+    workers = workers or max(os.cpu_count(), 2)
+    positions = []
+    for moves in random_script(num_positions, seed):
+        game = quiet_game(PLAYER1, PLAYER2)
+        for move in moves:
+            replay_move(game, move)
+            positions.append(game_job(game))
+    directory = tempfile.mkdtemp()
+    results = {}
+    try:
+        for name, pool in (('single', 1), ('pool', workers)):
+            began = time.perf_counter()
+            images = export_arrays(positions, workers=pool)
+            results[name + '_arrays_per_s'] = len(images) / (time.perf_counter() - began)
+            began = time.perf_counter()
+            paths = export_png(positions, os.path.join(directory, name), workers=pool)
+            results[name + '_png_per_s'] = len(paths) / (time.perf_counter() - began)
+            print("%-6s (%d workers) arrays %7.0f images/s, PNG files %7.0f images/s"
+                  % (name, pool, results[name + '_arrays_per_s'], results[name + '_png_per_s']))
+        assert images.shape == (len(positions), THUMBNAIL_SIZE, THUMBNAIL_SIZE, 3)
+    finally:
+        shutil.rmtree(directory)
+    return results
+
+
+def bench_tune(games=200, passes=20, seed=0, workers=None):
+    """
+    Records random against greedy self-play games into an archive, extracts their labeled features to part
+    files, then tunes the evaluation weights on them, in one process and across a process pool. Chunks are kept
+    small so the pool has several tasks per pass.
+    :param games: Games played
+    :param passes: Tuning passes for each worker count
+    :param seed: Seed for the agents
+    :param workers: Worker processes for the pool, defaults to the number of CPUs and at least two
+    :return: A dictionary of the measured results
+    """
+    workers = workers or max(os.cpu_count(), 2)
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, 'games.fga')
+    results = {}
+    try:
+        with quiet():
+            run_tournament(['random', 'greedy'], games, workers=1, seed=seed, archive=path)
+        game = quiet_game(PLAYER1, PLAYER2)
+        with ArchiveWriter(path) as archive:
+            archive.record(game)
+            positions = play_second_first(game, seed=seed)
+        if game.get_turn() == 1:
+            label = 2 if len(game.get_player(PLAYER1[0]).get_captured()) >= 6 else 0
+        else:
+            player = game.get_turn()
+            label = 1 if next(iter(game.legal_moves(player)), None) is not None else 0 if player == PLAYER1[0] else 2
+        expected = []
+        for position in positions[OPENING_PLIES:]:
+            game.load_bytes(position)
+            expected.append(game.get_terms() + (label,))
+        out = os.path.join(directory, 'opened.ftr')
+        extract_games(path, games, games + 1, out)
+        assert load_rows(out).tolist() == [list(row) for row in expected]
+        print("Second player first game: %d rows match the positions played" % len(expected))
+        for name, pool in (('single', 1), ('pool', workers)):
+            began = time.perf_counter()
+            parts, rows = extract([path], os.path.join(directory, name), pool, games_per_job=16)
+            results[name + '_extract_per_sec'] = rows / (time.perf_counter() - began)
+            tuner = WeightTuner(parts, os.path.join(directory, name + '.json'), workers=pool, chunk_rows=4096)
+            first = tuner.run(1)
+            last = tuner.run(passes - 1)
+            stats = tuner.get_stats()
+            results[name + '_rows_per_sec'] = stats['rows_per_sec']
+            print("%-6s (%d workers) extract %7.0f positions/s, tune %9.0f rows/s, %d rows, loss %.4f -> %.4f"
+                  % (name, pool, results[name + '_extract_per_sec'], stats['rows_per_sec'], rows, first, last))
+        print("Tuned weights:", tuner.get_weights())
+        assert last <= first
+    finally:
+        shutil.rmtree(directory)
+    return results
+
+
+def bench_render(num_moves=2000, seed=0):
+    """
+    Compares the display work per move of redrawing the whole window, as the display did before, against
+    redrawing and updating only the squares a move changed, on the SDL dummy video driver
+    :param num_moves: The number of moves to replay
+    :param seed: Seed used to record the random games
+    :return: A dictionary of the measured results
+    """
+    import pygame
+    display, screen = headless_display()
+    games = random_script(num_moves, seed)
+
+    def replay(redraw):
+        began = time.perf_counter()
+        for moves in games:
+            game = quiet_game(PLAYER1, PLAYER2)
+            position = game.snapshot()
+            display.fill_pieces(screen, RED, GREEN, game)
+            for move in moves:
+                replay_move(game, move)
+                position = redraw(game, position)
+        return time.perf_counter() - began
+
+    def full(game, position):
+        display.setup_screen(BLACK, WHITE, BLUE)
+        display.fill_pieces(screen, RED, GREEN, game)
+        pygame.display.flip()
+        return position
+
+    def incremental(game, position):
+        return display.update_squares(screen, game, position, RED, GREEN)
+
+    engine_seconds = replay(lambda game, position: position)
+    full_seconds = replay(full) - engine_seconds
+    incremental_seconds = replay(incremental) - engine_seconds
+    game = quiet_game(PLAYER1, PLAYER2)
+    began = time.perf_counter()
+    for i in range(200):
+        display.fill_pieces(screen, RED, GREEN, game)
+        pygame.display.flip()
+    idle_frame = (time.perf_counter() - began) / 200
+    pygame.quit()
+    results = {
+        'full_ms_per_move': 1000 * full_seconds / num_moves,
+        'incremental_ms_per_move': 1000 * incremental_seconds / num_moves,
+        'old_idle_frame_ms': 1000 * idle_frame,
+    }
+    print("Full redraw per move:  %7.3f ms" % results['full_ms_per_move'])
+    print("Dirty squares per move: %7.3f ms (%.0fx less)"
+          % (results['incremental_ms_per_move'], full_seconds / max(incremental_seconds, 1e-9)))
+    print("Idle: %.3f ms of drawing per loop before, none now" % results['old_idle_frame_ms'])
+    return results
+
+
+def bench_soak(num_moves=5000, batch=50, seed=0):
+    """
+    Plays thousands of scripted moves through FocusDisplay.run_game on the SDL dummy video driver, posting the
+    mouse clicks for a batch of moves and a QUIT event, then running the event loop, over and over. Checks every
+    move reached the game and that traced memory stays flat once the first batch has warmed up.
+    :param num_moves: The number of moves to play
+    :param batch: Moves posted before each run of the event loop
+    :param seed: Seed for choosing the moves
+    :return: A dictionary of the measured results
+    :raise AssertionError: If a move was lost or memory grew by more than 256 KB
+    """
+    import pygame
+    rng = random.Random(seed)
+    with quiet():
+        display, screen = headless_display()
+        tracemalloc.start()
+        baseline = None
+        peak = 0
+        played = 0
+        began = time.perf_counter()
+        while played < num_moves:
+            game = display._game
+            if game is None or game.get_turn() == 1:
+                game = display._game = FocusGame(PLAYER1, PLAYER2)
+                display.fill_pieces(screen, RED, GREEN, game)
+            shadow = game.clone()
+            for i in range(batch):
+                player = shadow.get_turn() or PLAYER1[0]
+                moves = [move for move in shadow.legal_moves(player) if move[0] is not None and move[2] == 1]
+                if player == 1 or moves == []:
+                    break
+                start, end, num = rng.choice(moves)
+                for row, column in (start, end):
+                    pygame.event.post(pygame.event.Event(pygame.MOUSEBUTTONUP, pos=(87 + 75 * column, 57 + 75 * row),
+                                                         button=1))
+                shadow.move_piece(player, start, end, num)
+                played += 1
+            else:
+                i = batch
+            if i == 0:
+                display._game = None
+                continue
+            pygame.event.post(pygame.event.Event(pygame.QUIT))
+            display.run_game(screen, RED, GREEN)
+            if game.to_bytes() != shadow.to_bytes():
+                raise AssertionError("the display lost a move")
+            current = tracemalloc.get_traced_memory()[0]
+            if baseline is None:
+                baseline = current
+            peak = max(peak, current)
+        seconds = time.perf_counter() - began
+        growth = tracemalloc.get_traced_memory()[0] - baseline
+        tracemalloc.stop()
+    pygame.quit()
+    results = {
+        'moves': played,
+        'moves_per_sec': played / seconds,
+        'baseline_bytes': baseline,
+        'peak_bytes': peak,
+        'growth_bytes': growth,
+    }
+    print("%d moves through the event loop, %.0f moves/sec" % (played, results['moves_per_sec']))
+    print("Traced memory after warm up %d bytes, peak %d bytes, growth %d bytes" % (baseline, peak, growth))
+    if growth > 256 * 1024:
+        raise AssertionError("memory grew by %d bytes" % growth)
+    return results
+
+
+STARTUP_SCRIPT = """
+import sys, time
+began = time.perf_counter()
+import %s
+from FocusGame import FocusGame
+imported = time.perf_counter()
+game = FocusGame(('PlayerA', 'R'), ('PlayerB', 'G'), quiet=True)
+game.move_piece('PlayerA', (0, 0), (1, 0), 1)
+moved = time.perf_counter()
+print(imported - began, moved - imported, 'pygame' in sys.modules)
+"""
+
+
+def bench_profile(num_moves=20000, seed=0, repeats=3):
+    """
+    Times quiet FocusGame moves with no Profiler, with one enabled, and after it is disabled, checking that
+    disabling puts the engine's own methods back and that every move was counted
+    :param num_moves: The number of moves to replay on each run
+    :param seed: Seed used to record the random games
+    :param repeats: Runs of each kind, the fastest is kept
+    :return: A dictionary of the measured results
+    """
+    games = random_script(num_moves, seed)
+    originals = dict(vars(FocusGame))
+    before = min(time_engine(quiet_game, games) for i in range(repeats))
+    profiler = Profiler()
+    with profiler:
+        enabled = min(time_engine(quiet_game, games) for i in range(repeats))
+    after = min(time_engine(quiet_game, games) for i in range(repeats))
+    restored = all(vars(FocusGame)[name] is function for name, function in originals.items())
+    snapshot = profiler.snapshot()
+    counted = sum(snapshot['moves'].values())
+    results = {
+        'disabled_moves_per_sec': num_moves / before,
+        'enabled_moves_per_sec': num_moves / enabled,
+        'after_moves_per_sec': num_moves / after,
+        'enabled_overhead': enabled / before - 1,
+        'after_overhead': after / before - 1,
+        'restored': restored,
+        'moves_counted': counted,
+        'methods': len(snapshot['methods']),
+    }
+    print("No profiler: %9.0f moves/sec" % results['disabled_moves_per_sec'])
+    print("Enabled:     %9.0f moves/sec (%+.1f%%)"
+          % (results['enabled_moves_per_sec'], 100 * results['enabled_overhead']))
+    print("Disabled:    %9.0f moves/sec (%+.1f%%), original methods restored: %s"
+          % (results['after_moves_per_sec'], 100 * results['after_overhead'], restored))
+    print("Counted %d moves (%d played) in %d methods" % (counted, repeats * num_moves, len(snapshot['methods'])))
+    return results
+
+
+def bench_startup(runs=10):
+    """
+    Times importing the rules engine and playing the first move in fresh processes, against importing the display
+    module as well, which loads pygame as importing FocusGame used to
+    :param runs: Fresh processes started for each module, the median is reported
+    :return: A dictionary of the measured results
+    :raise AssertionError: If importing FocusGame loads pygame
+    """
+    results = {}
+    for name, module in (('engine', 'FocusGame'), ('display', 'FocusDisplay')):
+        imports, moves, totals = [], [], []
+        for i in range(runs):
+            began = time.perf_counter()
+            output = subprocess.run([sys.executable, '-c', STARTUP_SCRIPT % module], capture_output=True, text=True,
+                                    cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout
+            totals.append(time.perf_counter() - began)
+            imported, moved, loaded = output.split()[-3:]
+            imports.append(float(imported))
+            moves.append(float(moved))
+            assert (loaded == 'True') == (module == 'FocusDisplay'), "pygame loaded: %s" % loaded
+        results[name + '_import_ms'] = 1000 * sorted(imports)[runs // 2]
+        results[name + '_first_move_ms'] = 1000 * sorted(moves)[runs // 2]
+        results[name + '_process_ms'] = 1000 * sorted(totals)[runs // 2]
+        print("import %-12s %7.1f ms, first move %5.2f ms, whole process %7.1f ms"
+              % (module, results[name + '_import_ms'], results[name + '_first_move_ms'],
+                 results[name + '_process_ms']))
+    return results
+
+
+BENCHMARKS = {
+    'archive': bench_archive,
+    'batch': bench_batch,
+    'book': bench_book,
+    'endgame': bench_endgame,
+    'evaluate': bench_evaluate,
+    'export': bench_export,
+    'mcts': bench_mcts,
+    'parallel': bench_parallel,
+    'perft': run_suite,
+    'profile': bench_profile,
+    'quiet': bench_quiet,
+    'record': bench_record,
+    'render': bench_render,
+    'packed': bench_packed,
+    'search': bench_search,
+    'snapshot': bench_snapshot,
+    'soak': bench_soak,
+    'sprites': bench_sprites,
+    'startup': bench_startup,
+    'tune': bench_tune,
+}
+
+
+if __name__ == '__main__':
+    names = sys.argv[1:] or sorted(BENCHMARKS)
+    for name in names:
+        print("== %s ==" % name)
+        BENCHMARKS[name]()
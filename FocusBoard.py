@@ -0,0 +1,452 @@
+# Description: A compact alternate engine state for the Focus/Domination game. Every stack on the 6x6 board is
+# packed into a single byte of a flat array: the low 3 bits hold the height of the stack (0 - 5) and the upper 5
+# bits hold one color bit per piece, with bit 3 being the top piece. A color bit of 0 is the first player's color
+# and a color bit of 1 is the second player's color. Reserves and captured pieces are stored as counts, because a
+# player's reserve pieces are always their own color and their captured pieces are always the opponent's color.
+# PackedFocusGame follows the same rules and returns the same results as FocusGame. The move tables shared by both
+# engines' legal move generators are built here.
+
+from array import array
+
+
+HEIGHT_MASK = 0b111         # low bits of a packed square holding the stack height
+COLOR_SHIFT = 3             # color bits start above the height bits
+MAX_HEIGHT = 5              # pieces past this height are captured or reserved
+
+
+def build_move_table():
+    """
+    Builds every stack move that can start from each square of the board for each stack height. A stack move is a
+    tuple of (start, move, num_pieces), the same arguments move_piece takes, so the tuples can be handed out
+    without being rebuilt.
+    :return: A 6x6 list of lists where table[row][column][height] is a tuple of the moves a stack of that height
+    on that square can make
+    """
+    table = []
+    for row in range(6):
+        table_row = []
+        for column in range(6):
+            by_height = [()]
+            moves = []
+            for num_pieces in range(1, 6):
+                for end in ((row - num_pieces, column), (row + num_pieces, column),
+                            (row, column - num_pieces), (row, column + num_pieces)):
+                    if 0 <= end[0] <= 5 and 0 <= end[1] <= 5:
+                        moves.append(((row, column), end, num_pieces))
+                by_height.append(tuple(moves))
+            table_row.append(by_height)
+        table.append(table_row)
+    return table
+
+
+MOVE_TABLE = build_move_table()
+
+# Reserve placements are (None, move, 1): no starting square, and one piece placed at move
+RESERVE_MOVES = tuple((None, (row, column), 1) for row in range(6) for column in range(6))
+
+# Stack moves by square index (row * 6 + column) and height, for the flat packed board
+SQUARE_MOVES = [MOVE_TABLE[square // 6][square % 6] for square in range(36)]
+
+
+def pack_stack(height, colors):
+    """
+    Packs a stack height and its color bits into a single byte
+    :param height: The number of pieces in the stack, 0 - 5
+    :param colors: Integer with one bit per piece, bit 0 being the top piece
+    :return: The packed byte for the square
+    """
+    return height | (colors << COLOR_SHIFT)
+
+
+def unpack_stack(value):
+    """
+    Unpacks a byte from the packed board into its height and color bits
+    :param value: The packed byte for a square
+    :return: A tuple of (height, colors) where bit 0 of colors is the top piece
+    """
+    return value & HEIGHT_MASK, value >> COLOR_SHIFT
+
+
+class PackedFocusGame:
+    """
+    Alternate engine state for FocusGame that keeps the whole board in one 36 byte array. Has the same public
+    methods as FocusGame (move_piece, reserved_move, show_pieces, show_reserve, show_captured, print_board and the
+    check methods) and gives the same results, without allocating a Stack or a list per square.
+    """
+
+    def __init__(self, player1, player2):
+        """
+        Takes as its parameters two tuples, each containing player name and color of the piece that player is
+        playing, and fills the packed board with the starting position.
+        :param player1: Tuple of (name, color) for the first player, whose pieces use color bit 0
+        :param player2: Tuple of (name, color) for the second player, whose pieces use color bit 1
+        """
+        if player1[1] == player2[1]:
+            print("Players must be on different teams")
+        else:
+            self._names = (player1[0], player2[0])
+            self._colors = (player1[1], player2[1])
+            self._index = {player1[0]: 0, player2[0]: 1}
+            self._reserves = [0, 0]
+            self._captured = [0, 0]
+            self._turn = None
+            self._board = array('B', bytes(36))
+            self.fill_board()
+
+    def fill_board(self):
+        """
+        Initializes the packed board with the same starting position FocusGame.fill_board uses
+        """
+        first = pack_stack(1, 0)
+        second = pack_stack(1, 1)
+        row_a = (first, first, second, second, first, first)
+        row_b = (second, second, first, first, second, second)
+        for row in range(6):
+            pattern = row_a if row % 2 == 0 else row_b
+            for column in range(6):
+                self._board[row * 6 + column] = pattern[column]
+
+    def get_player_index(self, player):
+        """
+        Returns the index (0 or 1) of a player, which is also the color bit of that player's pieces
+        :param player: Name of the player to be found
+        :return: 0 or 1, or None if the player is not found
+        """
+        index = self._index.get(player)
+        if index is None:
+            print("Player not found")
+        return index
+
+    def move_piece(self, player, start, move, num_pieces):
+        """
+        Validates and makes a move for a player, with the same return values as FocusGame.move_piece.
+        :param player: The name of the player making the move
+        :param start: The tuple coordinates (row, column) the player wants to start from
+        :param move: The tuple coordinates (row, column) the player wants to end at
+        :param num_pieces: The number of pieces the player wants to move
+        :return: False if the move is invalid, 'successfully moved', or <player name> wins
+        """
+        if self.check_turn(player) == False:
+            return False
+        elif self.check_move(player, start, move, num_pieces) == False:
+            return False
+        else:
+            self.process_move(start, move, num_pieces, player)
+
+            if self.check_win(player) == False:
+                self.change_turn(player)
+                return 'successfully moved'
+            else:
+                self._turn = 1
+                return player + " wins"
+
+    def process_move(self, start, move, num_pieces, player):
+        """
+        Moves the top num_pieces pieces of the stack at start onto the stack at move, then captures or reserves any
+        pieces past the fifth as FocusGame.process_move does. Does no validation.
+        :param start: Tuple of the coordinates on the board where the move is starting
+        :param move: Tuple of the coordinates on the board where the move will end
+        :param num_pieces: The number of pieces being moved
+        :param player: String identifying the player making the move
+        """
+        board = self._board
+        source = start[0] * 6 + start[1]
+        dest = move[0] * 6 + move[1]
+
+        height, colors = unpack_stack(board[source])
+        moved = colors & ((1 << num_pieces) - 1)
+        board[source] = pack_stack(height - num_pieces, colors >> num_pieces)
+
+        height, colors = unpack_stack(board[dest])
+        self.place_pieces(dest, height + num_pieces, (colors << num_pieces) | moved, self._index[player])
+
+    def place_pieces(self, square, height, colors, index):
+        """
+        Stores a combined stack on a square, trimming pieces off the bottom past the fifth. Trimmed pieces of the
+        player's own color go to their reserve, the others are captured.
+        :param square: Index of the square in the flat board, row * 6 + column
+        :param height: Height of the combined stack, up to 10
+        :param colors: Color bits of the combined stack, bit 0 being the top piece
+        :param index: Index of the player making the move
+        """
+        if height > MAX_HEIGHT:
+            trimmed = colors >> MAX_HEIGHT
+            second = bin(trimmed).count('1')             # trimmed pieces of the second player's color
+            first = height - MAX_HEIGHT - second
+            if index == 1:
+                self._reserves[1] += second
+                self._captured[1] += first
+            else:
+                self._reserves[0] += first
+                self._captured[0] += second
+            height = MAX_HEIGHT
+            colors &= (1 << MAX_HEIGHT) - 1
+        self._board[square] = pack_stack(height, colors)
+
+    def legal_moves(self, player):
+        """
+        Generates every legal move for a player without printing anything, in the same format as
+        FocusGame.legal_moves. Turn order is not checked.
+        :param player: Name of the player whose moves are generated
+        :return: A generator of move tuples, empty if the game is over or the player is not found
+        """
+        index = self._index.get(player)
+        if self._turn == 1 or index is None:
+            return
+        board = self._board
+        square = 0
+        while square < 36:
+            value = board[square]
+            if value & HEIGHT_MASK and (value >> COLOR_SHIFT) & 1 == index:
+                yield from SQUARE_MOVES[square][value & HEIGHT_MASK]
+            square += 1
+        if self._reserves[index]:
+            yield from RESERVE_MOVES
+
+    def make_move(self, move, player=None):
+        """
+        Makes a move from legal_moves without validating or printing, as FocusGame.make_move does. No undo record
+        is kept; copy the game first to branch.
+        :param move: A move tuple, (start, move, num_pieces) or (None, move, 1) for a reserve placement
+        :param player: Name of the player making the move, defaults to the player whose turn it is
+        :return: False if there is no player to move, otherwise 'successfully moved' or <player name> wins
+        """
+        if player is None:
+            player = self._turn
+        index = self._index.get(player)
+        if index is None:
+            return False
+        start, end = move[0], move[1]
+        if start is None:
+            square = end[0] * 6 + end[1]
+            height, colors = unpack_stack(self._board[square])
+            self._reserves[index] -= 1
+            self.place_pieces(square, height + 1, (colors << 1) | index, index)
+        else:
+            self.process_move(start, end, move[2], player)
+        if self._captured[index] >= 6:
+            self._turn = 1
+            return player + " wins"
+        self._turn = self._names[1 - index]
+        return 'successfully moved'
+
+    def copy(self):
+        """
+        Returns an independent copy of the game, sharing only the immutable player names and colors
+        :return: A new PackedFocusGame in the same position
+        """
+        game = PackedFocusGame.__new__(PackedFocusGame)
+        game._names = self._names
+        game._colors = self._colors
+        game._index = self._index
+        game._reserves = self._reserves[:]
+        game._captured = self._captured[:]
+        game._turn = self._turn
+        game._board = array('B', self._board)
+        return game
+
+    def to_bytes(self):
+        """
+        Serializes the position in the same 41 byte layout as FocusGame.to_bytes
+        :return: The position as bytes
+        """
+        if self._turn == None:
+            turn = 0
+        elif self._turn == 1:
+            turn = 3
+        else:
+            turn = self._index[self._turn] + 1
+        return bytes(self._board) + bytes(self._reserves + self._captured + [turn])
+
+    def load_bytes(self, data):
+        """
+        Replaces the position with one serialized by to_bytes, from either engine, for a game between the same
+        players
+        :param data: The position as bytes
+        """
+        self._board = array('B', data[:36])
+        self._reserves = [data[36], data[37]]
+        self._captured = [data[38], data[39]]
+        self._turn = (None, self._names[0], self._names[1], 1)[data[40]]
+
+    def show_pieces(self, location):
+        """
+        Takes a position on the board and returns a list showing the pieces that are present at that location with
+        the bottom-most piece at the 0th index.
+        :param location: The coordinates at which to show the pieces, as a tuple
+        :return: False if there are no pieces at the location, otherwise a list of pieces with the bottommost piece
+        at the 0th index
+        """
+        height, colors = unpack_stack(self._board[location[0] * 6 + location[1]])
+        if height == 0:
+            print("No pieces")
+            return False
+        pieces = []
+        i = height - 1
+        while i >= 0:
+            pieces.append(self._colors[(colors >> i) & 1])
+            i -= 1
+        return pieces
+
+    def show_reserve(self, player_name):
+        """
+        Shows the count of pieces that are in reserve for the player
+        :param player_name: The name of the player whose reserve count is to be shown
+        :return: The number of reserve pieces the player has
+        """
+        return self._reserves[self._index[player_name]]
+
+    def show_captured(self, player_name):
+        """
+        Shows the number of pieces captured by that player
+        :param player_name: The name of the player whose captured pieces are to be shown
+        :return: The number of pieces captured by the player
+        """
+        return self._captured[self._index[player_name]]
+
+    def reserved_move(self, player, move):
+        """
+        Places a piece from the player's reserve on top of the stack at move, with the same return values as
+        FocusGame.reserved_move.
+        :param player: Name of the player making the move
+        :param move: Tuple coordinates denoting where the player would like to place a reserve piece
+        :return: False if the move cannot be made, 'successfully moved', or <player name> wins
+        """
+        if self.check_reserved_move(player, move) == False:
+            return False
+        index = self._index[player]
+        square = move[0] * 6 + move[1]
+        height, colors = unpack_stack(self._board[square])
+        self._reserves[index] -= 1
+        self.change_turn(player)
+        self.place_pieces(square, height + 1, (colors << 1) | index, index)
+
+        if self.check_win(player) == False:
+            return 'successfully moved'
+        else:
+            self._turn = 1
+            return player + " wins"
+
+    def print_board(self):
+        """
+        Displays the game board in the same format as FocusGame.print_board
+        """
+        for row in range(6):
+            for column in range(6):
+                height, colors = unpack_stack(self._board[row * 6 + column])
+                if height == 0:
+                    print("X", end='      ')
+                else:
+                    print(self._colors[colors & 1] + str(height), end='      ')
+            print("\n")
+
+    def check_win(self, player):
+        """
+        Returns True if the player has captured 6 or more pieces, otherwise returns False
+        :param player: Player whose win condition is to be checked
+        :return: True if the player has won, False if not
+        """
+        index = self._index.get(player)
+        return index is not None and self._captured[index] >= 6
+
+    def check_turn(self, player):
+        """
+        Checks that it is the player's turn, setting the turn to the player if this is the first move.
+        :param player: Name of the player to be checked
+        :return: True if it is the first turn or it is the turn of the player, False otherwise
+        """
+        if self._turn == None:
+            self._turn = player
+            return True
+        elif self._turn == 1:
+            print("Game is over")
+            return False
+        elif self._turn != player:
+            print("not your turn")
+            return False
+        else:
+            return True
+
+    def check_move(self, player, start, move, num_pieces):
+        """
+        Checks that the player's move is valid, in the same order and with the same messages as
+        FocusGame.check_move
+        :param player: Name of the player trying to make the move
+        :param start: Tuple coordinates of the space the user would like to start from
+        :param move: Tuple coordinates of the space the user would like to finish at
+        :param num_pieces: The number of pieces the user would like to move
+        :return: False if move is invalid, along with a printed message, True if the move is valid.
+        """
+        if self.check_coords(start, move) == False:
+            return False
+        index = self.get_player_index(player)
+        if index is None:
+            return False
+        height, colors = unpack_stack(self._board[start[0] * 6 + start[1]])
+        if height == 0 or colors & 1 != index:
+            print("invalid location(not your piece)")
+            return False
+        elif num_pieces > height or num_pieces < 1:
+            print("invalid number of pieces")
+            return False
+        elif start[1] == move[1] and abs(start[0] - move[0]) == num_pieces:
+            return True
+        elif start[0] == move[0] and abs(start[1] - move[1]) == num_pieces:
+            return True
+        else:
+            print("invalid location(move not possible)")
+            return False
+
+    def check_reserved_move(self, player, move):
+        """
+        Checks that the player's reserved move is valid, in the same order as FocusGame.check_reserved_move
+        :param player: A string of a player's name
+        :param move: A tuple of coordinates between 0 and 5 where the player is trying to place a piece
+        :return: False if the move is invalid, True if it is valid
+        """
+        index = self.get_player_index(player)
+        if index is None:
+            return False
+        elif self._reserves[index] == 0:
+            print("No pieces in reserve")
+            return False
+        elif self.check_turn(player) == False:
+            return False
+        elif move[0] < 0 or move[0] > 5 or move[1] < 0 or move[1] > 5:
+            print("Move coordinates invalid")
+            return False
+        else:
+            return True
+
+    def check_coords(self, start, destination):
+        """
+        Checks that the user input coordinates fall inside of the game board.
+        :param start: Tuple coordinates the user would like to start at
+        :param destination: Tuple coordinates the user would like to finish at
+        :return: False if the move is invalid, True if the move is valid
+        """
+        if start[0] < 0 or start[0] > 5 or start[1] < 0 or start[1] > 5:
+            print("Source coordinates invalid")
+            return False
+        elif destination[0] < 0 or destination[0] > 5 or destination[1] < 0 or destination[1] > 5:
+            print("Destination coordinates invalid")
+            return False
+        else:
+            return True
+
+    def change_turn(self, player):
+        """
+        Switches the turn to the other player.
+        :param player: Player making the move, whose turn it will no longer be
+        """
+        if self._names[0] == player:
+            self._turn = self._names[1]
+        else:
+            self._turn = self._names[0]
+
+    def get_turn(self):
+        """
+        gets the current player whose turn it is
+        :return: the player whose turn it is as a string
+        """
+        return self._turn
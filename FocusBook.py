@@ -0,0 +1,262 @@
+# Description: An opening book for Focus/Domination built from the games in FocusArchive archives. Every game starts
+# from the same fill_board position, so the moves played in the first plies of many self-play games, and how those
+# games ended for the mover, are gathered by position hash (FocusGame.get_hash, with the mover's turn key added
+# before the first move) and move. The book file holds the entries sorted by hash then move, in columns, so
+# OpeningBook memory maps it and finds a position's moves with a binary search over the hash column without reading
+# the rest of the file. The layout, little-endian:
+#     b'FGB1', number of entries (4 bytes), plies gathered (4 bytes), 4 padding bytes
+#     four columns, one value per entry: position hashes (8 bytes each), move codes from FocusTable.encode_move
+#     (2 bytes each, padded to a multiple of 8 bytes), games played (4 bytes each), then the mover's points in
+#     half points (4 bytes each, 2 for a win and 1 for a draw)
+#     python FocusBook.py build games.fga --out opening.fgb --plies 12 --min-games 2
+#     python FocusBook.py show opening.fgb
+
+import argparse
+import array
+import bisect
+import mmap
+import os
+import struct
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from FocusArchive import GameArchive, native
+from FocusGame import ZOBRIST_TURN, FocusGame
+from FocusRecord import MOVES
+from FocusTable import encode_move
+
+
+BOOK_MAGIC = b'FGB1'
+BOOK_PLIES = 12             # plies of each game gathered into the book
+MIN_GAMES = 2               # games a move needs to be played from the book
+GAMES_PER_JOB = 256         # games each worker task reads
+
+
+def position_key(game, player):
+    """
+    Returns the hash a position is kept under in the book. Before the first move the game has no turn, so the
+    player's turn key is added as if it were set.
+    :param game: A FocusGame
+    :param player: Name of the player to move
+    :return: A 64 bit integer
+    """
+    if game.get_turn() is None:
+        return game.get_hash() ^ ZOBRIST_TURN[0 if game._players[0].get_name() == player else 1]
+    return game.get_hash()
+
+
+def gather_games(path, first, last, plies=BOOK_PLIES):
+    """
+    Gathers the opening moves of a range of an archive's games, in a worker
+    :param path: Path of the archive
+    :param first: Number of the first game
+    :param last: Number of the game after the last one
+    :param plies: Plies of each game to gather
+    :return: A dictionary of (position hash, move code) to [games, mover's half points]
+    """
+    stats = {}
+    with GameArchive(path) as archive:
+        for number in range(first, last):
+            record = archive.get_record(number)
+            result = record.get_result()
+            if result is not None:
+                listed = record.get_players()[0][0]                           #the player get_result scores
+                game = record.new_game()
+                for ply, move in enumerate(record.moves()):
+                    if ply == plies:
+                        break
+                    player = game.get_turn()
+                    entry = stats.setdefault((position_key(game, player), encode_move(move)), [0, 0])
+                    entry[0] += 1
+                    entry[1] += result if player == listed else 2 - result
+                    game.make_move(move, player)
+            del record
+    return stats
+
+
+def build_book(paths, out, plies=BOOK_PLIES, min_games=MIN_GAMES, workers=None, games_per_job=GAMES_PER_JOB):
+    """
+    Builds a book file from the games of one or more archives, gathering them across a process pool
+    :param paths: Paths of the archives
+    :param out: Path of the book file, replaced if it exists
+    :param plies: Plies of each game to gather
+    :param min_games: Games a move needs to be kept
+    :param workers: Worker processes, defaults to the number of CPUs
+    :param games_per_job: Games each task reads
+    :return: The number of entries written
+    """
+    jobs = []
+    for path in paths:
+        with GameArchive(path) as archive:
+            games = len(archive)
+        jobs.extend((path, first, min(first + games_per_job, games)) for first in range(0, games, games_per_job))
+    if (workers or os.cpu_count()) == 1:
+        parts = [gather_games(path, first, last, plies) for path, first, last in jobs]
+    else:
+        with ProcessPoolExecutor(workers) as pool:
+            parts = [pool.submit(gather_games, path, first, last, plies) for path, first, last in jobs]
+            parts = [part.result() for part in parts]
+    stats = {}
+    for part in parts:
+        for key, (games, points) in part.items():
+            entry = stats.get(key)
+            if entry is None:
+                stats[key] = [games, points]
+            else:
+                entry[0] += games
+                entry[1] += points
+    columns = (array.array('Q'), array.array('H'), array.array('I'), array.array('I'))
+    for key in sorted(stats):
+        games, points = stats[key]
+        if games >= min_games:
+            for column, value in zip(columns, (key[0], key[1], games, points)):
+                column.append(value)
+    write_book(out, plies, *columns)
+    return len(columns[0])
+
+
+def write_book(path, plies, keys, moves, games, points):
+    """
+    Writes a book file
+    :param path: Path of the book file
+    :param plies: Plies gathered into the book
+    :param keys: array('Q') of position hashes, sorted
+    :param moves: array('H') of move codes, sorted within each hash
+    :param games: array('I') of games played
+    :param points: array('I') of the mover's half points
+    """
+    with open(path, 'wb') as stream:
+        stream.write(BOOK_MAGIC + struct.pack('<III', len(keys), plies, 0))
+        for column in (keys, moves, games, points):
+            data = native(array.array(column.typecode, column)).tobytes()
+            stream.write(data + bytes(-len(data) % 8))
+
+
+class OpeningBook:
+    """
+    Represents a book file opened for probing. The file is memory mapped and its columns are read in place, so a
+    probe touches only the pages its binary search visits.
+    """
+
+    def __init__(self, path):
+        """
+        Maps a book file
+        :param path: Path of the book file
+        :raise ValueError: If the file is not a book
+        """
+        self._stream = open(path, 'rb')
+        self._map = mmap.mmap(self._stream.fileno(), 0, access=mmap.ACCESS_READ)
+        data = memoryview(self._map)
+        if bytes(data[:4]) != BOOK_MAGIC:
+            raise ValueError("not an opening book")
+        entries, self._plies = struct.unpack_from('<II', data, 4)
+        columns = []
+        i = 16
+        for code, size in (('Q', 8), ('H', 2), ('I', 4), ('I', 4)):
+            view = data[i:i + entries * size]
+            columns.append(view.cast(code) if sys.byteorder == 'little' else native(array.array(code, view.tobytes())))
+            i += entries * size + (-(entries * size) % 8)
+        self._keys, self._moves, self._games, self._points = columns
+        self._stats = {'probes': 0, 'hits': 0}
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def get_plies(self):
+        """
+        :return: The number of plies of each game gathered into the book
+        """
+        return self._plies
+
+    def get_stats(self):
+        """
+        :return: A dictionary with the number of probes and of probes that found the position
+        """
+        return dict(self._stats)
+
+    def probe(self, game, player):
+        """
+        Looks a position up
+        :param game: A FocusGame
+        :param player: Name of the player to move
+        :return: A list of (move tuple, games, mover's half points) for the position, empty if it is not in the book
+        """
+        key = position_key(game, player)
+        keys = self._keys
+        i = bisect.bisect_left(keys, key)
+        entries = []
+        while i < len(keys) and keys[i] == key:
+            entries.append((MOVES[self._moves[i]], self._games[i], self._points[i]))
+            i += 1
+        self._stats['probes'] += 1
+        if entries:
+            self._stats['hits'] += 1
+        return entries
+
+    def choose(self, game, player, min_games=MIN_GAMES):
+        """
+        Picks the book move with the best score for a player, the mover's points with one win and one loss added
+        so rarely played moves are not trusted too far. Moves that are not legal for the player, as after a hash
+        collision, are passed over.
+        :param game: A FocusGame
+        :param player: Name of the player to move
+        :param min_games: Games a move needs to be played
+        :return: A move tuple, or None if the book has no move for the position
+        """
+        entries = [entry for entry in self.probe(game, player) if entry[1] >= min_games]
+        if not entries:
+            return None
+        legal = set(game.legal_moves(player))
+        best = None
+        best_score = None
+        for move, games, points in entries:
+            score = (points + 2) / (2 * games + 4)
+            if move in legal and (best_score is None or score > best_score):
+                best, best_score = move, score
+        return best
+
+    def close(self):
+        """
+        Unmaps the book
+        """
+        self._keys = self._moves = self._games = self._points = None
+        try:
+            self._map.close()
+        except BufferError:
+            pass
+        self._stream.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or show an opening book")
+    commands = parser.add_subparsers(dest='command', required=True)
+    command = commands.add_parser('build', help="gather the opening moves of archived games into a book")
+    command.add_argument('archives', nargs='+')
+    command.add_argument('--out', required=True, help="path of the book file")
+    command.add_argument('--plies', type=int, default=BOOK_PLIES)
+    command.add_argument('--min-games', type=int, default=MIN_GAMES)
+    command.add_argument('--workers', type=int, default=None)
+    command = commands.add_parser('show', help="list the book moves of the start position")
+    command.add_argument('book')
+    args = parser.parse_args()
+    if args.command == 'build':
+        began = time.perf_counter()
+        entries = build_book(args.archives, args.out, args.plies, args.min_games, args.workers)
+        print("%d entries, %d bytes, %.2f s" % (entries, os.path.getsize(args.out), time.perf_counter() - began))
+    else:
+        with OpeningBook(args.book) as book:
+            game = FocusGame(('PlayerA', 'R'), ('PlayerB', 'G'), quiet=True)
+            print("%d entries, %d plies" % (len(book), book.get_plies()))
+            for move, games, points in sorted(book.probe(game, 'PlayerA'), key=lambda entry: -entry[1]):
+                print("%-24s %6d games %5.1f%%" % (move, games, 50 * points / games))
+
+
+if __name__ == '__main__':
+    main()
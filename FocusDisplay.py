@@ -1,40 +1,103 @@
-#Focus the game!
+# Author: Patrick Moore
+# Date: 12/2/2020
+# Description: The pygame window for Focus/Domination. FocusDisplay draws a FocusGame on a 6x6 grid, turns mouse
+# clicks on squares into moves, and redraws only the squares a move changed. It also draws positions onto offscreen
+# Surfaces for FocusExport. pygame is only imported with this module, so the rules engine in FocusGame and the
+# players, servers and workers built on it never load it. Run this module to play.
+
+from collections import OrderedDict
 
-import FocusGame
 import pygame
 from pygame.locals import *
 
+from FocusGame import FocusGame
 
-class FocusDisplay():
 
-    def __init__(self):
-        """
+FRAME_RATE = 60             # most times a second FocusDisplay.run_game redraws
+SPRITE_CACHE_SIZE = 64      # stack sprites FocusDisplay keeps, enough for every stack of up to 5 pieces
+BOARD_RECT = (48, 18, 454, 454)     # the board and its grid lines in the window
+
 
+class FocusDisplay:
+
+    def __init__(self, game=None, run=True, sprite_cache=SPRITE_CACHE_SIZE):
+        """
+        Initializes pygame and, unless run is False, opens the window, runs the game until the user quits, and
+        shuts pygame down
+        :param game: The FocusGame to show, needed to run the window. Offscreen drawing takes its game per call.
+        :param run: False to only initialize pygame, for drawing on a screen set up with setup_screen
+        :param sprite_cache: Most stack sprites to keep, 0 to draw every piece with its own rectangle instead
+        :raise ValueError: If run is True and no game is given
         """
+        if run and game is None:
+            raise ValueError("FocusDisplay needs a game to run the window")
+
         # initialize
         pygame.init()
-        self.create_board()
 
-    def run_game(self, screen):
-        #Run unitl user quits
-        running = True
+        # define colors
+        BLACK = (0, 0, 0)
+        GRAY = (127, 127, 127)
+        WHITE = (255, 255, 255)
+        RED = (255, 0, 0)
+        GREEN = (0, 255, 0)
+        BLUE = (0, 0, 255)
 
+        self._game = game
+        self._colors = (BLACK, WHITE, BLUE, RED, GREEN)
+        self._background = None
+        self._sprites = OrderedDict()                       #least recently used first
+        self._sprite_limit = sprite_cache
+        self._sprite_stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+        if run:
+            screen = self.create_board(BLACK, WHITE, BLUE, RED, GREEN)
+            self.run_game(screen, RED, GREEN)
+            pygame.quit()
 
-        while running:
+    def run_game(self, screen, RED, GREEN):
+        """
+        Runs the game until the user closes the window, in a single loop: it sleeps in pygame.event.wait while
+        nothing happens, handles every pending event when woken, then redraws only the squares that changed, at
+        most FRAME_RATE times a second
+        :param screen: The screen Surface, already showing the game
+        """
+        game = self._game
+        clock = pygame.time.Clock()
+        running = True
+        move = (None, None)
+        pieces = 1
+        position = game.snapshot()
 
-            #update board:
+        while running:
+            events = [pygame.event.wait()] + pygame.event.get()
 
             #Did the user click close?
-            for event in pygame.event.get():
+            for event in events:
                 if event.type == pygame.QUIT:
                     running = False
                 elif event.type == MOUSEBUTTONDOWN:
                     print(event)
+                #MOUSEBUTTONUP represents the user selecting a space
                 elif event.type == MOUSEBUTTONUP:
-                    print(event)
-
+                    if move == (None, None):
+                        print(event)
+                        mpos_x, mpos_y = event.pos
+                        move = self.translate_click(mpos_x, mpos_y)
+                        print(move)
+                        print("start")
+                    else:
+                        print(event)
+                        mpos_x, mpos_y = event.pos
+                        end = self.translate_click(mpos_x, mpos_y)
+                        turn = game.get_turn()
+                        print(turn)
+                        if turn == None:
+                            turn = "PlayerA"
+                        game.move_piece(turn, move, end, pieces)
+                        move = (None, None)
 
-        pygame.quit()
+            position = self.update_squares(screen, game, position, RED, GREEN)
+            clock.tick(FRAME_RATE)
 
     def draw_grid_vert(self, start_pos, end_pos, width, screen, color):
         """
@@ -83,44 +146,238 @@ class FocusDisplay():
 
         return
 
-    def create_board(self):
+    def create_background(self, BLACK, WHITE, BLUE):
+        """
+        Renders the parts of the window that never change, the board and its grid, once
+        :return: A Surface the size of the window
         """
+        background = pygame.Surface((950, 500))
+        background.fill(WHITE)
 
-        :return:
+        #make the board
+        pygame.draw.rect(background, BLACK, (50, 20, 450, 450))
+
+        #draw vertical lines
+        self.draw_grid_vert((50, 20), (50, 470), 2, background, BLUE)
+
+        #draw horizontal lines
+        self.draw_grid_horizontal((50, 20), (500, 20), 2, background, BLUE)
+        return background
+
+    def setup_screen(self, BLACK, WHITE, BLUE):
+        """
+        Opens the window and copies the cached background onto it
+        :return: The screen Surface
         """
-        # define colors
-        BLACK = (0, 0, 0)
-        GRAY = (127, 127, 127)
-        WHITE = (255, 255, 255)
-        RED = (255, 0, 0)
-        GREEN = (0, 255, 0)
-        BLUE = (0, 0, 255)
 
         # make a window
-        screen = pygame.display.set_mode((550, 500))
-        screen.fill(WHITE)
+        screen = pygame.display.set_mode((950, 500))
 
         #window caption
         pygame.display.set_caption("Focus the game!")
 
-        #make the board
-        pygame.draw.rect(screen, BLACK, (50, 20, 450, 450))
-
-        #draw vertical lines
-        self.draw_grid_vert((50, 20), (50, 470), 2, screen, BLUE)
+        if self._background is None:
+            self._background = self.create_background(BLACK, WHITE, BLUE)
+        screen.blit(self._background, (0, 0))
+        return screen
 
-        #draw horizontal lines
-        self.draw_grid_horizontal((50, 20), (500, 20), 2, screen, BLUE)
+    def create_board(self, BLACK, WHITE, BLUE, RED, GREEN):
+        """
+        Opens the window and draws the board and pieces
+        :return: The screen Surface
+        """
+        screen = self.setup_screen(BLACK, WHITE, BLUE)
+        self.fill_pieces(screen, RED, GREEN, self._game)
 
         #display
         pygame.display.flip()
-        self.run_game(screen)
+        return screen
+
+    def render(self, game, surface=None):
+        """
+        Draws the whole window for a game onto an offscreen Surface, so positions can be drawn with no window open,
+        such as on the SDL dummy video driver
+        :param game: The FocusGame to draw
+        :param surface: A Surface the size of the window to draw on, defaults to a new one
+        :return: The Surface
+        """
+        BLACK, WHITE, BLUE, RED, GREEN = self._colors
+        if self._background is None:
+            self._background = self.create_background(BLACK, WHITE, BLUE)
+        if surface is None:
+            surface = pygame.Surface((950, 500))
+        surface.blit(self._background, (0, 0))
+        self.fill_pieces(surface, RED, GREEN, game)
+        return surface
+
+    def board_image(self, game, size=None):
+        """
+        Draws a game offscreen and cuts out the board and its grid
+        :param game: The FocusGame to draw
+        :param size: Width and height in pixels to scale the image to, defaults to the board's 454 pixels
+        :return: A new Surface
+        """
+        board = self.render(game).subsurface(BOARD_RECT).copy()
+        if size is not None and size != BOARD_RECT[2]:
+            board = pygame.transform.smoothscale(board, (size, size))
+        return board
+
+    def square_rect(self, location):
+        """
+        Returns the area of the screen the pieces of a square are drawn in, room for six pieces
+        :param location: Tuple coordinates (row, column) of the square
+        :return: A pygame.Rect
+        """
+        return pygame.Rect(80 + 75 * location[1], 29 + 75 * location[0], 20, 66)
+
+    def get_sprite(self, pieces, RED, GREEN):
+        """
+        Returns the picture of a square holding a stack, rendered once per pattern of pieces and kept in a least
+        recently used cache. Every square's area of the background looks the same, so one picture fits any square.
+        :param pieces: Tuple of the stack's pieces, top piece first, empty for an empty square
+        :return: A Surface the size of square_rect
+        """
+        sprite = self._sprites.get(pieces)
+        if sprite is not None:
+            self._sprites.move_to_end(pieces)
+            self._sprite_stats['hits'] += 1
+            return sprite
+        self._sprite_stats['misses'] += 1
+        rect = self.square_rect((0, 0))
+        sprite = self._background.subsurface(rect).copy()
+        top_coord = rect.height - 11
+        for piece in reversed(pieces):
+            pygame.draw.rect(sprite, RED if piece == "R" else GREEN, (0, top_coord, 20, 10))
+            top_coord -= 11
+        self._sprites[pieces] = sprite
+        if len(self._sprites) > self._sprite_limit:
+            self._sprites.popitem(last=False)
+            self._sprite_stats['evictions'] += 1
+        return sprite
+
+    def get_sprite_stats(self):
+        """
+        :return: A dictionary of the sprite cache's hits, misses and evictions, and the sprites it holds
+        """
+        return dict(self._sprite_stats, size=len(self._sprites))
+
+    def draw_square(self, screen, location, RED, GREEN, game):
+        """
+        Redraws one square with a single blit of its stack's sprite, or, with the sprite cache turned off, its
+        area of the cached background and then its pieces from the bottom up. The stack is only read.
+        :param location: Tuple coordinates (row, column) of the square
+        :return: The pygame.Rect that was redrawn
+        """
+        rect = self.square_rect(location)
+        stack = game._board[location[0]][location[1]]
+        if self._sprite_limit:
+            screen.blit(self.get_sprite(tuple(stack.get_stack_list()) if stack else (), RED, GREEN), rect)
+            return rect
+        screen.blit(self._background, rect, rect)
+        if stack:
+            top_coord = rect.bottom - 11
+            for piece in reversed(stack.get_stack_list()):
+                pygame.draw.rect(screen, RED if piece == "R" else GREEN, (rect.left, top_coord, 20, 10))
+                top_coord -= 11
+        return rect
+
+    def fill_pieces(self, screen, RED, GREEN, game):
+        """
+        Draws the pieces of every square
+        :param screen: The screen Surface
+        :param RED: Color of the "R" pieces
+        :param GREEN: Color of the other pieces
+        :param game: The FocusGame to draw
+        """
+        for row in range(6):
+            for column in range(6):
+                self.draw_square(screen, (row, column), RED, GREEN, game)
+
+    def update_squares(self, screen, game, position, RED, GREEN):
+        """
+        Redraws only the squares that changed since an earlier position and pushes just their rects to the
+        display, so a move costs two small updates instead of a full frame
+        :param position: The FocusPosition the screen currently shows
+        :return: The game's current FocusPosition
+        """
+        current = game.snapshot()
+        rects = []
+        for i in range(36):
+            if current.board[i] != position.board[i]:
+                rects.append(self.draw_square(screen, divmod(i, 6), RED, GREEN, game))
+        if rects:
+            pygame.display.update(rects)
+        return current
 
-    def fill_pieces(self, screen, RED, GREEN):
+    def translate_click(self, mpos_x, mpos_y):
         """
+        Determines the column and row of the board selected by the user with a MOUSEBUTTONUP event
+        :param mpos_x: X-axis position of the mouse at the time of the event
+        :param mpos_y: Y-axis position of the mouse at the time of the event
+        :return: A tuple of coordinates on the board, able to be understood by the game
         """
-        pass
 
+        row = None
+        column = None
+
+        if mpos_x < 50 or mpos_x > 500:
+            print("Please select a valid square")
+            return False
+        else:
+            if mpos_x >= 50 and mpos_x <= 125:
+                column = 0
+                row = self.translate_click_y(mpos_y)
+                return (row, column)
+            elif mpos_x > 125 and mpos_x <= 200:
+                column = 1
+                row = self.translate_click_y(mpos_y)
+                return (row, column)
+            elif mpos_x > 200 and mpos_x <= 275:
+                column = 2
+                row = self.translate_click_y(mpos_y)
+                return (row, column)
+            elif mpos_x > 275 and mpos_x <= 350:
+                column = 3
+                row = self.translate_click_y(mpos_y)
+                return (row, column)
+            elif mpos_x > 350 and mpos_x <= 425:
+                column = 4
+                row = self.translate_click_y(mpos_y)
+                return (row, column)
+            elif mpos_x > 425 and mpos_x <= 500:
+                column = 5
+                row = self.translate_click_y(mpos_y)
+                return (row, column)
+
+    def translate_click_y(self, mpos_y):
+        """
+        Determines the row of the board selected by the user with a MOUSEBUTTONUP
+        :param mpos_y: Position of the mouse at the time of the MOUSEBUTTONUP event
+        :return:integer representing with row the user selected
+        """
+
+        if mpos_y < 20 or mpos_y > 470:
+            return False
+        else:
+            if mpos_y >= 20 and mpos_y < 95:
+                return 0
+            elif mpos_y >= 95 and mpos_y < 170:
+                return 1
+            elif mpos_y >= 170 and mpos_y < 245:
+                return 2
+            elif mpos_y >= 245 and mpos_y < 320:
+                return 3
+            elif mpos_y >= 320 and mpos_y < 395:
+                return 4
+            elif mpos_y >= 395 and mpos_y <= 470:
+                return 5
 
 if __name__ == '__main__':
-    game = FocusDisplay()
+    p1 = ('PlayerA', 'R')
+    p2 = ('PlayerB', 'G')
+    game = FocusGame(p1, p2)
+    game_screen = FocusDisplay(game)
+
+
+
+
@@ -0,0 +1,347 @@
+# Description: An endgame solver and solved-position table for Focus/Domination. Material never runs low in Focus:
+# pieces only leave play when captured and the game ends at six, so at least 26 of the 36 pieces stay on the board
+# or in reserve and no table can be indexed by the few pieces left. The endgame is instead the part of the game
+# where a player is close to six captures. ProofNumberSolver proves forced wins there with depth-limited
+# proof-number search on FocusGame make_move/unmake_move, deepening the limit one ply at a time so the distance
+# found is the shortest. build_table solves the late positions of archived games across a process pool and writes
+# the positions it proves, keyed by FocusGame.get_hash, to a table file that EndgameTable memory maps and probes by
+# binary search. AlphaBetaPlayer probes the table to end lines early, and the solver probes it to cut its own
+# trees. Positions are stored as won or lost for the side to move; no draws are stored, since the solver only
+# proves forced wins and Focus has no drawn ending besides a ply limit. The layout, little-endian:
+#     b'FGE1', number of positions (4 bytes), deepest limit solved to (4 bytes), 4 padding bytes
+#     two columns: the position hashes, sorted (8 bytes each), then one byte per position, 0x80 set for a win by
+#     the side to move and the low 7 bits holding the plies to the end, padded to a multiple of 8 bytes
+#     python FocusEndgame.py build games.fga --out endgame.fge --plies 5 --workers 4
+
+import argparse
+import array
+import bisect
+import mmap
+import os
+import struct
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from FocusArchive import GameArchive, native
+
+
+TABLE_MAGIC = b'FGE1'
+WIN_FLAG = 0x80
+WIN = 2
+LOSS = 0
+MAX_PLIES = 5               # deepest limit the solver proves to, past the horizon of the usual searches
+MAX_NODES = 5000            # moves the solver may make for each limit
+MIN_CAPTURED = 4            # captures a player needs before its positions are solved
+GAMES_PER_JOB = 16          # games each worker task solves
+INFINITY = 1 << 30
+
+
+class ProofNumberSolver:
+    """
+    Represents a depth-limited proof-number search. Each node of the search tree is a list of [proof number,
+    disproof number, move, children], children being None until the node is expanded. Positions in an
+    EndgameTable are taken as solved without searching them.
+    """
+
+    def __init__(self, max_plies=MAX_PLIES, max_nodes=MAX_NODES, table=None):
+        """
+        Initializes the solver
+        :param max_plies: Deepest limit proved to
+        :param max_nodes: Moves the search may make for each limit before giving up
+        :param table: An EndgameTable to probe, or None
+        """
+        self._max_plies = max_plies
+        self._max_nodes = max_nodes
+        self._table = table
+        self._nodes = 0
+
+    def get_nodes(self):
+        """
+        :return: The nodes made by the last solve
+        """
+        return self._nodes
+
+    def solve(self, game, player):
+        """
+        Solves a position, trying each limit from one ply up to max_plies. A win by the side to move ends on an odd
+        ply and a loss on an even ply, so each limit only has to prove one of them. Deepening stops at the first
+        limit the node budget runs out on, as a win found past it might not be the shortest.
+        :param game: A FocusGame, searched in place and left as it was found
+        :param player: Name of the player to move
+        :return: A tuple of (WIN or LOSS for the player, plies to the end), or None if it was not proved
+        """
+        self._nodes = 0
+        if self._table is not None:
+            found = self._table.probe(game)
+            if found is not None and found[1] <= self._max_plies:
+                return found
+        opponent = game._players[1].get_name() if game._players[0].get_name() == player else \
+            game._players[0].get_name()
+        for limit in range(1, self._max_plies + 1):
+            attacker = player if limit % 2 else opponent
+            proved = self.prove(game, player, attacker, limit)
+            if proved:
+                return (WIN if attacker == player else LOSS), limit
+            if proved is None:
+                return None
+        return None
+
+    def prove(self, game, player, attacker, limit):
+        """
+        Runs proof-number search to prove the attacker wins within a number of plies
+        :param game: A FocusGame
+        :param player: Name of the player to move
+        :param attacker: Name of the player the win is proved for
+        :param limit: Plies the win must come within
+        :return: True if the win was proved, False if it was disproved, None if the node budget ran out
+        """
+        root = [1, 1, None, None]
+        budget = self._nodes + self._max_nodes
+        while root[0] and root[1] and self._nodes < budget:
+            path = [root]
+            node = root
+            mover = player
+            while node[3] is not None:                                          #descend to the most proving node
+                index = 0 if mover == attacker else 1
+                node = min(node[3], key=lambda child: child[index])
+                game.make_move(node[2], mover)
+                mover = game.get_turn()
+                path.append(node)
+            self.expand(game, node, mover, attacker, len(path) - 1, limit)
+            for depth in range(len(path) - 1, -1, -1):
+                node = path[depth]
+                if node[3]:
+                    proof = [child[0] for child in node[3]]
+                    disproof = [child[1] for child in node[3]]
+                    if depth % 2 == (0 if player == attacker else 1):           #the attacker moves here
+                        node[0], node[1] = min(proof), min(sum(disproof), INFINITY)
+                    else:
+                        node[0], node[1] = min(sum(proof), INFINITY), min(disproof)
+                if depth:
+                    game.unmake_move()
+        if root[0] == 0:
+            return True
+        return False if root[1] == 0 else None
+
+    def expand(self, game, node, mover, attacker, depth, limit):
+        """
+        Makes the children of a node, setting the proof and disproof numbers of those that end the game, are in
+        the table, or reach the limit. A side with no legal move loses, as in the search. The attacker makes the
+        last move before the limit, so there only moves that trim pieces are tried, unless the defender has no
+        reserve and any move might leave it with no move at all.
+        :param game: A FocusGame in the node's position
+        :param node: The node, expanded in place
+        :param mover: Name of the player to move at the node
+        :param attacker: Name of the player the win is proved for
+        :param depth: Plies from the root to the node
+        :param limit: Plies the win must come within
+        """
+        children = []
+        moves = list(game.legal_moves(mover))
+        if not moves:
+            node[0], node[1] = (INFINITY, 0) if mover == attacker else (0, INFINITY)
+            node[3] = children
+            return
+        last = depth + 1 >= limit
+        board = game._board
+        stranded = last and not [user for user in game._players if user.get_name() != mover][0].get_reserves()
+        for move in moves:
+            if last and not stranded:                                           #only a move that trims can win
+                dest = board[move[1][0]][move[1][1]]
+                if dest == None or dest == [] or dest.get_size() + move[2] <= 5:
+                    children.append([INFINITY, 0, move, None])
+                    continue
+            self._nodes += 1
+            game.make_move(move, mover)
+            if game.get_turn() == 1:
+                numbers = (0, INFINITY) if mover == attacker else (INFINITY, 0)
+            else:
+                numbers = (INFINITY, 0) if last else (1, 1)
+                if stranded and next(iter(game.legal_moves(game.get_turn())), None) is None:
+                    numbers = (0, INFINITY)                                     #the defender has no move and loses
+                if self._table is not None:
+                    found = self._table.probe(game)
+                    if found is not None and depth + 1 + found[1] <= limit:
+                        won = (found[0] == WIN) == (game.get_turn() == attacker)
+                        numbers = (0, INFINITY) if won else (INFINITY, 0)
+            game.unmake_move()
+            children.append([numbers[0], numbers[1], move, None])
+            if numbers[mover != attacker] == 0:                                 #the mover proved its side already
+                break
+        node[3] = children
+
+
+class EndgameTable:
+    """
+    Represents a table file opened for probing. The file is memory mapped and searched in place.
+    """
+
+    def __init__(self, path):
+        """
+        Maps a table file
+        :param path: Path of the table file
+        :raise ValueError: If the file is not an endgame table
+        """
+        self._stream = open(path, 'rb')
+        self._map = mmap.mmap(self._stream.fileno(), 0, access=mmap.ACCESS_READ)
+        data = memoryview(self._map)
+        if bytes(data[:4]) != TABLE_MAGIC:
+            raise ValueError("not an endgame table")
+        entries, self._max_plies = struct.unpack_from('<II', data, 4)
+        view = data[16:16 + 8 * entries]
+        self._keys = view.cast('Q') if sys.byteorder == 'little' else native(array.array('Q', view.tobytes()))
+        self._values = data[16 + 8 * entries:16 + 9 * entries]
+        self._stats = {'probes': 0, 'hits': 0}
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def get_max_plies(self):
+        """
+        :return: The deepest limit the table was solved to
+        """
+        return self._max_plies
+
+    def get_stats(self):
+        """
+        :return: A dictionary with the number of probes and of probes that found the position
+        """
+        return dict(self._stats)
+
+    def probe(self, game):
+        """
+        Looks a position up
+        :param game: A FocusGame with a player to move
+        :return: A tuple of (WIN or LOSS for the side to move, plies to the end), or None if it is not stored
+        """
+        self._stats['probes'] += 1
+        key = game.get_hash()
+        keys = self._keys
+        i = bisect.bisect_left(keys, key)
+        if i == len(keys) or keys[i] != key:
+            return None
+        self._stats['hits'] += 1
+        value = self._values[i]
+        return (WIN if value & WIN_FLAG else LOSS), value & ~WIN_FLAG
+
+    def close(self):
+        """
+        Unmaps the table
+        """
+        self._keys = self._values = None
+        try:
+            self._map.close()
+        except BufferError:
+            pass
+        self._stream.close()
+
+
+def encode_result(result, plies):
+    """
+    :param result: WIN or LOSS for the side to move
+    :param plies: Plies to the end
+    :return: The table byte
+    """
+    return (WIN_FLAG if result == WIN else 0) | plies
+
+
+def solve_games(path, first, last, max_plies=MAX_PLIES, max_nodes=MAX_NODES, min_captured=MIN_CAPTURED):
+    """
+    Solves the late positions of a range of an archive's games, in a worker. A position is late once either
+    player has min_captured captures.
+    :param path: Path of the archive
+    :param first: Number of the first game
+    :param last: Number of the game after the last one
+    :param max_plies: Deepest limit proved to
+    :param max_nodes: Node budget for each limit
+    :param min_captured: Captures a player needs before its positions are solved
+    :return: A tuple of (dictionary of position hash to table byte for the positions proved, positions tried)
+    """
+    solver = ProofNumberSolver(max_plies, max_nodes)
+    solved = {}
+    tried = set()
+    with GameArchive(path) as archive:
+        for number in range(first, last):
+            record = archive.get_record(number)
+            for move, game in record.replay():
+                player = game.get_turn()
+                if player == 1:
+                    break
+                if max(len(user.get_captured()) for user in game._players) < min_captured:
+                    continue
+                key = game.get_hash()
+                if key in tried:
+                    continue
+                tried.add(key)
+                found = solver.solve(game, player)
+                if found is not None:
+                    solved[key] = encode_result(*found)
+            del record
+    return solved, len(tried)
+
+
+def build_table(paths, out, max_plies=MAX_PLIES, max_nodes=MAX_NODES, min_captured=MIN_CAPTURED, workers=None,
+                games_per_job=GAMES_PER_JOB):
+    """
+    Builds a table file from the late positions of the games of one or more archives, solving them across a
+    process pool
+    :param paths: Paths of the archives
+    :param out: Path of the table file, replaced if it exists
+    :param max_plies: Deepest limit proved to
+    :param max_nodes: Node budget for each limit
+    :param min_captured: Captures a player needs before its positions are solved
+    :param workers: Worker processes, defaults to the number of CPUs
+    :param games_per_job: Games each task solves
+    :return: A tuple of (positions written, positions tried)
+    """
+    jobs = []
+    for path in paths:
+        with GameArchive(path) as archive:
+            games = len(archive)
+        jobs.extend((path, first, min(first + games_per_job, games)) for first in range(0, games, games_per_job))
+    options = (max_plies, max_nodes, min_captured)
+    if (workers or os.cpu_count()) == 1:
+        parts = [solve_games(*job, *options) for job in jobs]
+    else:
+        with ProcessPoolExecutor(workers) as pool:
+            parts = [pool.submit(solve_games, *job, *options) for job in jobs]
+            parts = [part.result() for part in parts]
+    solved = {}
+    for part, tried in parts:
+        solved.update(part)
+    keys = array.array('Q', sorted(solved))
+    values = bytes(solved[key] for key in keys)
+    with open(out, 'wb') as stream:
+        stream.write(TABLE_MAGIC + struct.pack('<III', len(keys), max_plies, 0))
+        stream.write(native(keys).tobytes())
+        stream.write(values + bytes(-len(values) % 8))
+    return len(keys), sum(tried for part, tried in parts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Solve the late positions of archived games into an endgame table")
+    commands = parser.add_subparsers(dest='command', required=True)
+    command = commands.add_parser('build', help="solve the late positions of archived games")
+    command.add_argument('archives', nargs='+')
+    command.add_argument('--out', required=True, help="path of the table file")
+    command.add_argument('--plies', type=int, default=MAX_PLIES, help="deepest limit proved to")
+    command.add_argument('--nodes', type=int, default=MAX_NODES, help="node budget for each limit")
+    command.add_argument('--min-captured', type=int, default=MIN_CAPTURED)
+    command.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+    began = time.perf_counter()
+    written, tried = build_table(args.archives, args.out, args.plies, args.nodes, args.min_captured, args.workers)
+    seconds = time.perf_counter() - began
+    print("%d of %d positions solved, %d bytes, %.2f s, %.0f positions/sec"
+          % (written, tried, os.path.getsize(args.out), seconds, tried / max(seconds, 1e-9)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,199 @@
+# Description: Draws Focus/Domination positions to images with no window, for thumbnails and datasets. Positions are
+# drawn by FocusDisplay.board_image on offscreen Surfaces with SDL's dummy video driver, chosen only when a process
+# makes its FocusDisplay so importing this module leaves other windows alone, and written as PNG files or
+# returned as NumPy RGB arrays (rows, columns, 3) through pygame.surfarray. Batches are split into chunks drawn by a
+# pool of worker processes, each keeping one FocusDisplay so the background and stack sprites are drawn once per
+# worker. Positions are passed to the workers as (players, FocusGame.to_bytes) pairs.
+#     python FocusExport.py <archive> <directory> [--size N] [--workers N] [--games N]
+# draws the final position of each game in a FocusArchive archive.
+
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pygame
+
+from FocusArchive import GameArchive
+from FocusDisplay import BOARD_RECT, FocusDisplay
+from FocusGame import FocusGame
+
+
+CHUNK_SIZE = 64             # positions a worker draws per task
+THUMBNAIL_SIZE = 128
+
+_display = None             # each process's FocusDisplay, made on first use
+_games = {}                 # each process's quiet FocusGame per pair of players
+
+
+def get_display():
+    """
+    :return: This process's FocusDisplay for offscreen drawing, made on first use with the dummy video driver
+    """
+    global _display
+    if _display is None:
+        os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+        _display = FocusDisplay(run=False)
+    return _display
+
+
+def load_position(players, position):
+    """
+    Loads a position into this process's FocusGame for its players
+    :param players: The two (name, color) tuples
+    :param position: The position as bytes, from FocusGame.to_bytes
+    :return: The FocusGame
+    """
+    game = _games.get(players)
+    if game is None:
+        game = _games[players] = FocusGame(players[0], players[1], quiet=True)
+    game.load_bytes(position)
+    return game
+
+
+def game_job(game):
+    """
+    :param game: A FocusGame
+    :return: The (players, position) pair the workers draw
+    """
+    return tuple((user.get_name(), user.get_color()) for user in game._players), game.to_bytes()
+
+
+def render_position(players, position, size=THUMBNAIL_SIZE):
+    """
+    Draws a position
+    :param players: The two (name, color) tuples
+    :param position: The position as bytes
+    :param size: Width and height of the image in pixels, None for the board's own size
+    :return: A Surface
+    """
+    return get_display().board_image(load_position(players, position), size)
+
+
+def to_array(surface):
+    """
+    :param surface: A Surface
+    :return: Its pixels as a (rows, columns, 3) uint8 array
+    """
+    return pygame.surfarray.array3d(surface).transpose(1, 0, 2)
+
+
+def save_chunk(jobs, size):
+    """
+    Draws a chunk of positions to PNG files, in a worker
+    :param jobs: List of (path, players, position)
+    :param size: Image size in pixels
+    :return: The number of images written
+    """
+    for path, players, position in jobs:
+        pygame.image.save(render_position(players, position, size), path)
+    return len(jobs)
+
+
+def array_chunk(jobs, size):
+    """
+    Draws a chunk of positions to RGB arrays, in a worker
+    :param jobs: List of (players, position)
+    :param size: Image size in pixels
+    :return: A (len(jobs), rows, columns, 3) uint8 array
+    """
+    return np.stack([to_array(render_position(players, position, size)) for players, position in jobs])
+
+
+def chunks(items, chunk_size):
+    """
+    :param items: A list
+    :param chunk_size: Items per chunk
+    :return: A list of consecutive slices of items
+    """
+    return [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+
+
+def run_chunks(function, jobs, size, workers, chunk_size):
+    """
+    Runs a chunk function over jobs in worker processes, or in this process for one worker
+    :param function: save_chunk or array_chunk
+    :param jobs: List of jobs for the function
+    :param size: Image size in pixels
+    :param workers: Worker processes
+    :param chunk_size: Jobs per task
+    :return: The results of each chunk, in order
+    """
+    parts = chunks(jobs, chunk_size)
+    if workers == 1:
+        return [function(part, size) for part in parts]
+    with ProcessPoolExecutor(workers) as pool:
+        return list(pool.map(function, parts, [size] * len(parts)))
+
+
+def export_png(positions, directory, size=THUMBNAIL_SIZE, workers=None, chunk_size=CHUNK_SIZE):
+    """
+    Draws positions to numbered PNG files, 000000.png onwards
+    :param positions: List of FocusGame objects or (players, position) pairs
+    :param directory: Directory for the images, created if needed
+    :param size: Image size in pixels, None for the board's own size
+    :param workers: Worker processes, defaults to the number of CPUs
+    :param chunk_size: Positions per task
+    :return: The list of image paths
+    """
+    os.makedirs(directory, exist_ok=True)
+    jobs = []
+    for number, position in enumerate(positions):
+        players, data = game_job(position) if isinstance(position, FocusGame) else position
+        jobs.append((os.path.join(directory, "%06d.png" % number), players, data))
+    run_chunks(save_chunk, jobs, size, workers or os.cpu_count(), chunk_size)
+    return [path for path, players, data in jobs]
+
+
+def export_arrays(positions, size=THUMBNAIL_SIZE, workers=None, chunk_size=CHUNK_SIZE):
+    """
+    Draws positions to RGB arrays
+    :param positions: List of FocusGame objects or (players, position) pairs
+    :param size: Image size in pixels, None for the board's own size
+    :param workers: Worker processes, defaults to the number of CPUs
+    :param chunk_size: Positions per task
+    :return: An (N, rows, columns, 3) uint8 array
+    """
+    jobs = [game_job(position) if isinstance(position, FocusGame) else position for position in positions]
+    if not jobs:
+        width = size or BOARD_RECT[2]
+        return np.zeros((0, width, width, 3), dtype=np.uint8)
+    return np.concatenate(run_chunks(array_chunk, jobs, size, workers or os.cpu_count(), chunk_size))
+
+
+def archive_positions(path, games=None):
+    """
+    Reads the final position of each game in an archive
+    :param path: Path of a FocusArchive archive
+    :param games: Number of games to read, defaults to every game
+    :return: List of (players, position) pairs
+    """
+    with GameArchive(path) as archive:
+        count = len(archive) if games is None else min(games, len(archive))
+        positions = []
+        for record in archive.records(range(count)):
+            final = record.final_position()
+            if final is not None:
+                positions.append((record.get_players(), final))
+            del record
+        return positions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Draw the final position of each game in an archive to PNG files")
+    parser.add_argument('archive')
+    parser.add_argument('directory')
+    parser.add_argument('--size', type=int, default=THUMBNAIL_SIZE)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--games', type=int, default=None)
+    args = parser.parse_args()
+    positions = archive_positions(args.archive, args.games)
+    start = time.perf_counter()
+    export_png(positions, args.directory, args.size, args.workers)
+    elapsed = time.perf_counter() - start
+    print("%d images in %.2f s, %.0f images/s" % (len(positions), elapsed, len(positions) / max(elapsed, 1e-9)))
+
+
+if __name__ == '__main__':
+    main()
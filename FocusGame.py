@@ -5,11 +5,102 @@
 # class.Either Player can start then game, then turns alternate. Players can only move a piece or stack that they
 # control. (The top piece of the stack is their color) The goal of the game is to capture 6 of the enemies pieces.
 # Pieces are captured or placed in reserve when a stack is larger than 5 pieces tall as a result of a move. If a move
-# is illegal, the game will print an error message and return False.
+# is illegal, the game will print an error message and return False. In quiet mode the game prints nothing: moves
+# and checks return FocusResult codes, and messages go to the "FocusGame" logger at debug level. The pygame window is
+# in FocusDisplay, so the rules engine imports no graphics. Whether the logger takes debug messages is read once
+# when the game is made, so a quiet game with debug logging off skips its diagnostics without calling the logger.
 
-import pygame
-from pygame.locals import *
+import logging
+import random
+from enum import Enum
+from typing import NamedTuple
 
+from FocusBoard import MOVE_TABLE, RESERVE_MOVES, pack_stack, unpack_stack
+
+
+logger = logging.getLogger("FocusGame")
+
+
+class FocusResult(Enum):
+    """
+    Result codes returned by the move and check methods of a FocusGame in quiet mode. OK, MOVED and WIN are true
+    and every error is false, so "if not game.check_move(...)" works in both modes. The value of each code is the
+    message printed for it outside quiet mode. FocusGame itself tests results by identity, as __bool__ is a Python
+    call on every test.
+    """
+    OK = "ok"
+    MOVED = "successfully moved"
+    WIN = "wins"
+    GAME_OVER = "Game is over"
+    NOT_YOUR_TURN = "not your turn"
+    NOT_YOUR_PIECE = "invalid location(not your piece)"
+    INVALID_NUMBER = "invalid number of pieces"
+    MOVE_NOT_POSSIBLE = "invalid location(move not possible)"
+    NO_RESERVES = "No pieces in reserve"
+    INVALID_MOVE_COORDINATES = "Move coordinates invalid"
+    INVALID_SOURCE = "Source coordinates invalid"
+    INVALID_DESTINATION = "Destination coordinates invalid"
+    PLAYER_NOT_FOUND = "Player not found"
+
+    def __bool__(self):
+        """
+        :return: True for OK, MOVED and WIN, False for the errors
+        """
+        return self is FocusResult.OK or self is FocusResult.MOVED or self is FocusResult.WIN
+
+
+PASSED = FocusResult.OK     # the check methods' success code in quiet mode, True outside it
+
+# Zobrist keys, from a fixed seed so hashes are the same in every process. Pieces are keyed by square
+# (row * 6 + column), height above the bottom of the stack (0 - 4) and color index (0 for the first player's color,
+# 1 for the second). Reserve and captured counts are keyed by player index and count.
+_zobrist_random = random.Random(0x466f637573)
+ZOBRIST_PIECES = [[[_zobrist_random.getrandbits(64) for color in range(2)] for height in range(5)]
+                  for square in range(36)]
+ZOBRIST_RESERVES = [[_zobrist_random.getrandbits(64) for count in range(37)] for player in range(2)]
+ZOBRIST_CAPTURED = [[_zobrist_random.getrandbits(64) for count in range(37)] for player in range(2)]
+ZOBRIST_TURN = [_zobrist_random.getrandbits(64) for player in range(2)]
+ZOBRIST_GAME_OVER = _zobrist_random.getrandbits(64)
+
+# stack moves a stack of each height has from each square, for the mobility term
+MOBILITY = [[[len(moves) for moves in MOVE_TABLE[row][column]] for column in range(6)] for row in range(6)]
+NO_TERMS = (0, 0, 0, 0)
+
+
+def build_packed_terms():
+    """
+    Builds the evaluation terms of every packed stack byte on every square, as FocusGame.square_terms returns them
+    :return: A list per square index of 256 tuples, NO_TERMS for empty squares and unused bytes
+    """
+    table = []
+    for square in range(36):
+        terms = [NO_TERMS] * 256
+        for height in range(1, 6):
+            for colors in range(1 << height):
+                top = colors & 1
+                buried = bin(colors).count('1') if top == 0 else height - bin(colors).count('1')
+                sign = -1 if top else 1
+                terms[pack_stack(height, colors)] = (sign, sign * height, sign * buried,
+                                                     sign * MOBILITY[square // 6][square % 6][height])
+        table.append(terms)
+    return table
+
+
+PACKED_TERMS = build_packed_terms()
+
+
+class FocusPosition(NamedTuple):
+    """
+    An immutable, hashable position of a FocusGame, made by FocusGame.snapshot. Holds one packed byte per square
+    as in FocusBoard (row by row, 0 for an empty square), both players' reserve and captured counts, the turn code
+    used by to_bytes (0 before the first move, 1 or 2 for the first or second player, 3 once the game is over) and
+    the Zobrist hash of the stacks and counts, so restoring never walks the pieces.
+    """
+    board: bytes
+    reserves: tuple
+    captured: tuple
+    turn: int
+    key: int
 
 
 class Player:
@@ -78,6 +169,12 @@ class Player:
         """
         self._captured.append(piece)
 
+    def sub_captured(self):
+        """
+        Removes the most recently captured piece from the captured list, used when a move is taken back
+        """
+        del self._captured[-1]
+
 
 class Stack:
     """
@@ -128,6 +225,13 @@ class Stack:
         self._pieces = self._pieces[:-1]
         self._size -= 1
 
+    def sub_top_piece(self):
+        """
+        Removes the top piece of the stack, the 0th piece in the list
+        """
+        del self._pieces[0]
+        self._size -= 1
+
     def add_piece_to_top(self, piece):
         """
         Adds a piece to the top controlling position of the stack
@@ -143,15 +247,29 @@ class Stack:
         """
         return self._pieces
 
-    def get_bottom_piece(self):
+    def copy(self):
+        """
+        Makes an independent copy of the stack
+        :return: A new Stack with the same pieces
+        """
+        stack = Stack(self._color)
+        stack._pieces = self._pieces[:]
+        stack._size = self._size
+        return stack
+
+    def get_bottom_piece(self, quiet=False):
         """
         Returns the color of the piece at the bottom of the stack of pieces. Returns None if there are no pieces
         in the stack
+        :param quiet: True to log the empty stack message instead of printing it
         :return: None if the stack has no pieces, the last piece of the pieces list if not.
         """
 
         if self._pieces == []:
-            print("no pieces")
+            if quiet:
+                logger.debug("no pieces")
+            else:
+                print("no pieces")
             return None
         else:
             return self._pieces[(len(self._pieces) - 1)]
@@ -166,17 +284,23 @@ class FocusGame:
     process_move method assists the make move function, and the class also has methods to show captured and reserved
      pieces, pieces at a given location, as well as a method to print the game board. Has methods to validate the users
      move, whose turn it is, whether or not a player has won, and to place a reserved piece. Has a method to change
-     turns, a method to get a player object when given a player name.
+     turns, a method to get a player object when given a player name. A game made with quiet=True never prints.
     """
 
-    def __init__(self, player1, player2):
+    def __init__(self, player1, player2, quiet=False):
         """
         Takes as its parameters two tuples, each containing player name and color of the piece that player is
         playing  and it initializes the board  and then calls the fill_board function to fill the board
         with the pieces placed in the correct positions.
+        :param quiet: True to return FocusResult codes and log messages instead of printing them
         """
+        self._quiet = quiet
+        self._verbose = not quiet or logger.isEnabledFor(logging.DEBUG)     #diagnostics are printed or logged
         if player1[1] == player2[1]:
-            print("Players must be on different teams")
+            if quiet:
+                logger.warning("Players must be on different teams")
+            else:
+                print("Players must be on different teams")
         else:
             self._players = []
             self._players.append(Player(player1[0], player1[1]))
@@ -192,6 +316,28 @@ class FocusGame:
 
             self.fill_board(self._board)                            #fill the board
 
+            # legal move cache: (top color, moves) per square, refreshed only for squares touched since last use. The
+            # touched squares are a set so games that never list moves, like the display's, do not grow it
+            self._move_cache = [[None] * 6 for row in range(6)]
+            self._dirty_squares = {(row, column) for row in range(6) for column in range(6)}
+
+            # undo records for make_move/unmake_move: (move, player, trimmed pieces, turn before the move)
+            self._undo = []
+
+            # Zobrist hash of the stacks and the reserve/captured counts, the side to move is added by get_hash
+            self._color_index = {player1[1]: 0, player2[1]: 1}
+            self._hash = self.compute_hash()
+
+            # evaluation terms of every square and their totals, kept up to date like the hash, see get_terms
+            self.reset_terms()
+
+            # optional FocusRecord.RecordWriter that move_piece and reserved_move append each applied move to
+            self._recorder = None
+
+            # packed byte of every stack pattern seen by snapshot, and a Stack for every packed byte seen by restore
+            self._packed = {(): 0}
+            self._stacks = {}
+
 
     def fill_board(self, board):
         """
@@ -226,23 +372,28 @@ class FocusGame:
         :param start: The tuple coordinates (row, column) the player wants to start from
         :param move: The tuple coordinates (row, column) the player wants to end at
         :param num_pieces:The number of pieces the player wants to move
-        :return: returns 0 and prints an error message
-        """
-        if self.check_turn(player) == False:
-            return False
-        elif self.check_move(player, start, move, num_pieces) == False:
-            return False
+        :return: returns 0 and prints an error message. In quiet mode returns FocusResult.MOVED, FocusResult.WIN
+        or the error code
+        """
+        result = self.check_turn(player)
+        if result is not True and result is not PASSED:
+            return result
+        result = self.check_move(player, start, move, num_pieces)
+        if result is not True and result is not PASSED:
+            return result
         else:
             self.process_move(start,move,num_pieces, player)
 
             if self.check_win(player) == False:               #check win, update turn, and return
                 self.change_turn(player)
-                print("Changed turn to")
-                print(self.get_turn())
-                return 'successfully moved'
+                if self._verbose:
+                    self.debug("Changed turn to\n%s", self.get_turn())
+                result = FocusResult.MOVED if self._quiet else 'successfully moved'
+                return self.record_move((start, move, num_pieces), result, player)
             else:
                 self._turn = 1
-                return player + " wins"
+                result = FocusResult.WIN if self._quiet else player + " wins"
+                return self.record_move((start, move, num_pieces), result, player)
 
     def process_move(self, start, move, num_pieces, player):
         """
@@ -255,6 +406,11 @@ class FocusGame:
         :param num_pieces: The number of pieces the user wishes to move from the start coordinates
         :param player: String identifying the player making the move.
         """
+        self._dirty_squares.add(start)
+        self._dirty_squares.add(move)
+        user = self.get_player(player)
+        old_key = self.square_key(start) ^ self.square_key(move) ^ self.count_key(user)
+
         temp_list  = [None] * num_pieces
         i = 0
         while i < num_pieces:
@@ -266,14 +422,15 @@ class FocusGame:
         else:
             i = 0
             while i < num_pieces:
-                del self._board[start[0]][start[1]].get_stack_list()[0]
+                self._board[start[0]][start[1]].sub_top_piece()
                 i+=1
 
         i = len(temp_list)                                                      #combine stacks
         while i >= 1:
             temp_piece = temp_list[i-1]
             if self._board[move[0]][move[1]] == None or self._board[move[0]][move[1]] == []:
-                print("HEYOOOOOOO")
+                if self._verbose:
+                    self.debug("HEYOOOOOOO")
                 self._board[move[0]][move[1]] = Stack(temp_piece)
                 i -= 1
             else:
@@ -281,13 +438,16 @@ class FocusGame:
                 i -= 1
 
         while len(self._board[move[0]][move[1]].get_stack_list()) > 5:         #capture or reserve pieces
-            captured_piece = self._board[move[0]][move[1]].get_bottom_piece()
+            captured_piece = self._board[move[0]][move[1]].get_bottom_piece(self._quiet)
             self._board[move[0]][move[1]].sub_bottom_piece()
-            if captured_piece == self.get_player(player).get_color():
-                self.get_player(player).add_reserve(captured_piece)
+            if captured_piece == user.get_color():
+                user.add_reserve(captured_piece)
             else:
-                self.get_player(player).add_captured(captured_piece)
+                user.add_captured(captured_piece)
 
+        self._hash ^= old_key ^ self.square_key(start) ^ self.square_key(move) ^ self.count_key(user)
+        self.update_terms(start)
+        self.update_terms(move)
 
     def show_pieces(self, location):
         """
@@ -298,12 +458,10 @@ class FocusGame:
         piece at the 0th index.
         """
         if self._board[location[0]][location[1]] == None:
-            print("No pieces")
+            self.debug("No pieces")
             return False
         else:
-            list = self._board[location[0]][location[1]].get_stack_list()
-            list.reverse()
-            return list
+            return self._board[location[0]][location[1]].get_stack_list()[::-1]
 
     def show_reserve(self, player_name):
         """
@@ -339,36 +497,515 @@ class FocusGame:
         pieces at the location. If there are no pieces in reserve, returns 'no pieces in reserve'
         :param player: Name of the player making the move
         :param move: Tuple coordinates denoting where the play would like to place a reserve piece
-        :return: 0 and an error message if the move cannot be made, otherwise just returns
+        :return: 0 and an error message if the move cannot be made, otherwise just returns. In quiet mode returns
+        FocusResult.MOVED, FocusResult.WIN or the error code
         """
-        if self.check_reserved_move(player, move) == False:
-            return False
+        result = self.check_reserved_move(player, move)
+        if result is not True and result is not PASSED:
+            return result
         else:
             piece = self.get_player(player).get_color()
+            self._dirty_squares.add(move)
+            user = self.get_player(player)
+            old_key = self.square_key(move) ^ self.count_key(user)
 
             if self._board[move[0]][move[1]] == None:                                   # empty space
                 self._board[move[0]][move[1]] = Stack(piece)
                 self.get_player(player).sub_reserve()                                   #remove piece from reserved list
+                self._hash ^= old_key ^ self.square_key(move) ^ self.count_key(user)
+                self.update_terms(move)
                 self.change_turn(player)
-                return "successfully moved"
+                result = FocusResult.MOVED if self._quiet else "successfully moved"
+                return self.record_move((None, move, 1), result, player)
             else:                                                                       #space has an existing stack on it
                 self._board[move[0]][move[1]].add_piece_to_top(piece)
                 self.get_player(player).sub_reserve()
                 self.change_turn(player)
 
                 while len(self._board[move[0]][move[1]].get_stack_list()) > 5:          #capture and check win conditions
-                    captured_piece = self._board[move[0]][move[1]].get_bottom_piece()
+                    captured_piece = self._board[move[0]][move[1]].get_bottom_piece(self._quiet)
                     self._board[move[0]][move[1]].sub_bottom_piece()
-                    if captured_piece == self.get_player(player).get_color():
-                        self.get_player(player).add_reserve(captured_piece)
+                    if captured_piece == user.get_color():
+                        user.add_reserve(captured_piece)
                     else:
-                        self.get_player(player).add_captured(captured_piece)
+                        user.add_captured(captured_piece)
 
+                self._hash ^= old_key ^ self.square_key(move) ^ self.count_key(user)
+                self.update_terms(move)
                 if self.check_win(player) == False:
-                    return 'successfully moved'
+                    result = FocusResult.MOVED if self._quiet else 'successfully moved'
+                    return self.record_move((None, move, 1), result, player)
                 else:
                     self._turn = 1
-                    return player + " wins"
+                    result = FocusResult.WIN if self._quiet else player + " wins"
+                    return self.record_move((None, move, 1), result, player)
+
+    def set_recorder(self, recorder):
+        """
+        Sets a recorder that move_piece and reserved_move append every successful move to, such as a
+        FocusRecord.RecordWriter. Moves made with make_move for search are not recorded.
+        :param recorder: An object with a record(game, move, player) method, or None to stop recording
+        """
+        self._recorder = recorder
+
+    def record_move(self, move, result, player):
+        """
+        Passes a move that was just applied to the recorder, if there is one
+        :param move: The move tuple, (start, move, num_pieces) or (None, move, 1) for a reserve placement
+        :param result: The result of the move, returned unchanged
+        :param player: Name of the player who made the move
+        :return: result
+        """
+        if self._recorder is not None:
+            self._recorder.record(self, move, player)
+        return result
+
+    def legal_moves(self, player):
+        """
+        Generates every legal move for a player without printing anything. Stack moves are yielded as
+        (start, move, num_pieces) and reserve placements as (None, move, 1). The moves are shared tuples from
+        MOVE_TABLE and RESERVE_MOVES, and only the squares touched since the last call are looked at again.
+        Turn order is not checked, so moves can be listed for either player.
+        :param player: Name of the player whose moves are generated
+        :return: A generator of move tuples, empty if the game is over or the player is not found
+        """
+        if self._turn == 1:
+            return
+        for user in self._players:
+            if user.get_name() == player:
+                break
+        else:
+            return
+
+        cache = self._move_cache
+        dirty = self._dirty_squares
+        while dirty:
+            row, column = dirty.pop()
+            stack = self._board[row][column]
+            if stack == None or stack == []:
+                cache[row][column] = None
+            else:
+                pieces = stack.get_stack_list()
+                cache[row][column] = (pieces[0], MOVE_TABLE[row][column][len(pieces)])
+
+        color = user.get_color()
+        for cache_row in cache:
+            for entry in cache_row:
+                if entry is not None and entry[0] == color:
+                    yield from entry[1]
+        if user.get_reserves():
+            yield from RESERVE_MOVES
+
+    def make_move(self, move, player=None):
+        """
+        Makes a move from legal_moves in place for search, without validating or printing, and records what is
+        needed to take it back with unmake_move. Trimmed pieces past the fifth are captured or reserved, and the
+        turn is changed or the game is ended, as move_piece and reserved_move do.
+        :param move: A move tuple, (start, move, num_pieces) or (None, move, 1) for a reserve placement
+        :param player: Name of the player making the move, defaults to the player whose turn it is
+        :return: False if there is no player to move, otherwise 'successfully moved' or <player name> wins
+        """
+        if player is None:
+            player = self._turn
+        for user in self._players:
+            if user.get_name() == player:
+                break
+        else:
+            return False
+
+        start, end, num_pieces = move
+        board = self._board
+        color = user.get_color()
+        old_key = self.square_key(end) ^ self.count_key(user)
+        if start is not None:
+            old_key ^= self.square_key(start)
+        if start is None:                                                       #piece comes from the reserve
+            pieces = [color]
+            user.sub_reserve()
+        else:
+            source = board[start[0]][start[1]]
+            pieces = source.get_stack_list()[:num_pieces]
+            if num_pieces == source.get_size():
+                board[start[0]][start[1]] = None
+            else:
+                for piece in pieces:
+                    source.sub_top_piece()
+            self._dirty_squares.add(start)
+
+        dest = board[end[0]][end[1]]
+        if dest == None or dest == []:
+            dest = Stack(pieces[-1])
+            board[end[0]][end[1]] = dest
+            pieces = pieces[:-1]
+        i = len(pieces) - 1
+        while i >= 0:
+            dest.add_piece_to_top(pieces[i])
+            i -= 1
+        self._dirty_squares.add(end)
+
+        trimmed = []
+        while dest.get_size() > 5:                                              #capture or reserve pieces
+            piece = dest.get_bottom_piece()
+            dest.sub_bottom_piece()
+            trimmed.append(piece)
+            if piece == color:
+                user.add_reserve(piece)
+            else:
+                user.add_captured(piece)
+
+        new_key = self.square_key(end) ^ self.count_key(user)
+        if start is not None:
+            new_key ^= self.square_key(start)
+            self.update_terms(start)
+        self._hash ^= old_key ^ new_key
+        self.update_terms(end)
+
+        self._undo.append((move, user, trimmed, self._turn))
+        if len(user.get_captured()) >= 6:
+            self._turn = 1
+            return player + " wins"
+        self.change_turn(player)
+        return 'successfully moved'
+
+    def unmake_move(self):
+        """
+        Takes back the last move made with make_move, restoring the stacks, the trimmed pieces, the player's
+        reserve and captured pieces and the turn.
+        :return: The move that was taken back, or False if there is no move to take back
+        """
+        if self._undo == []:
+            return False
+        move, user, trimmed, turn = self._undo.pop()
+        start, end, num_pieces = move
+        board = self._board
+        color = user.get_color()
+        old_key = self.square_key(end) ^ self.count_key(user)
+        if start is not None:
+            old_key ^= self.square_key(start)
+
+        dest = board[end[0]][end[1]]
+        i = len(trimmed) - 1
+        while i >= 0:                                                           #put trimmed pieces back
+            dest.add_bottom_piece(trimmed[i])
+            if trimmed[i] == color:
+                user.sub_reserve()
+            else:
+                user.sub_captured()
+            i -= 1
+
+        pieces = dest.get_stack_list()[:num_pieces]
+        if num_pieces == dest.get_size():
+            board[end[0]][end[1]] = None
+        else:
+            for piece in pieces:
+                dest.sub_top_piece()
+        self._dirty_squares.add(end)
+
+        if start is None:
+            user.add_reserve(color)
+        else:
+            source = board[start[0]][start[1]]
+            if source == None or source == []:
+                source = Stack(pieces[-1])
+                board[start[0]][start[1]] = source
+                pieces = pieces[:-1]
+            i = len(pieces) - 1
+            while i >= 0:
+                source.add_piece_to_top(pieces[i])
+                i -= 1
+            self._dirty_squares.add(start)
+
+        new_key = self.square_key(end) ^ self.count_key(user)
+        if start is not None:
+            new_key ^= self.square_key(start)
+            self.update_terms(start)
+        self._hash ^= old_key ^ new_key
+        self.update_terms(end)
+
+        self._turn = turn
+        return move
+
+    def square_key(self, location):
+        """
+        Returns the Zobrist key of the stack at a location, the XOR of one key per piece for its height in the stack
+        and its color.
+        :param location: Tuple coordinates of the square
+        :return: A 64 bit integer, 0 for an empty square
+        """
+        stack = self._board[location[0]][location[1]]
+        if stack == None or stack == []:
+            return 0
+        keys = ZOBRIST_PIECES[location[0] * 6 + location[1]]
+        key = 0
+        height = 0
+        pieces = stack.get_stack_list()
+        i = len(pieces) - 1
+        while i >= 0:                                                           #bottom piece is height 0
+            key ^= keys[height][self._color_index[pieces[i]]]
+            height += 1
+            i -= 1
+        return key
+
+    def count_key(self, user):
+        """
+        Returns the Zobrist key of a player's reserve and captured counts
+        :param user: A Player object of this game
+        :return: A 64 bit integer
+        """
+        index = 0 if user is self._players[0] else 1
+        return ZOBRIST_RESERVES[index][len(user.get_reserves())] ^ ZOBRIST_CAPTURED[index][len(user.get_captured())]
+
+    def compute_hash(self):
+        """
+        Computes the Zobrist hash of the stacks and both players' reserve and captured counts from scratch
+        :return: A 64 bit integer, without the side to move
+        """
+        key = self.count_key(self._players[0]) ^ self.count_key(self._players[1])
+        for row in range(6):
+            for column in range(6):
+                key ^= self.square_key((row, column))
+        return key
+
+    def get_hash(self):
+        """
+        Returns the 64 bit Zobrist hash of the position: the stacks, both players' reserve and captured counts, and
+        the side to move. The board part is kept up to date by every method that moves pieces.
+        :return: The hash of the position as an integer
+        """
+        if self._turn == None:
+            return self._hash
+        elif self._turn == 1:
+            return self._hash ^ ZOBRIST_GAME_OVER
+        elif self._turn == self._players[0].get_name():
+            return self._hash ^ ZOBRIST_TURN[0]
+        else:
+            return self._hash ^ ZOBRIST_TURN[1]
+
+    def square_terms(self, location):
+        """
+        Returns the evaluation terms of the stack at a location, each counted for the first player less the second
+        player: whether it controls the stack, the pieces it controls, the enemy pieces buried under its top piece,
+        and the stack moves it has from the square.
+        :param location: Tuple coordinates of the square
+        :return: A tuple of four integers, NO_TERMS for an empty square
+        """
+        stack = self._board[location[0]][location[1]]
+        if stack == None or stack == []:
+            return NO_TERMS
+        pieces = stack.get_stack_list()
+        top = pieces[0]
+        height = len(pieces)
+        terms = (1, height, height - pieces.count(top), MOBILITY[location[0]][location[1]][height])
+        if self._color_index[top]:
+            return (-1, -height, -terms[2], -terms[3])
+        return terms
+
+    def update_terms(self, location):
+        """
+        Replaces the evaluation terms of a square in the totals after its stack changed
+        :param location: Tuple coordinates of the square
+        """
+        index = location[0] * 6 + location[1]
+        old = self._square_terms[index]
+        new = self.square_terms(location)
+        terms = self._terms
+        terms[0] += new[0] - old[0]
+        terms[1] += new[1] - old[1]
+        terms[2] += new[2] - old[2]
+        terms[3] += new[3] - old[3]
+        self._square_terms[index] = new
+
+    def reset_terms(self):
+        """
+        Computes the evaluation terms of every square and their totals from scratch
+        """
+        self._square_terms = [self.square_terms((row, column)) for row in range(6) for column in range(6)]
+        self._terms = [sum(terms[i] for terms in self._square_terms) for i in range(4)]
+
+    def load_terms(self, board):
+        """
+        Sets the evaluation terms of every square and their totals from packed stack bytes, after the board was
+        replaced
+        :param board: At least 36 packed bytes, one per square row by row, such as a position from to_bytes
+        """
+        square_terms = [PACKED_TERMS[i][board[i]] for i in range(36)]
+        terms = [0, 0, 0, 0]
+        for square in square_terms:
+            if square is not NO_TERMS:
+                terms[0] += square[0]
+                terms[1] += square[1]
+                terms[2] += square[2]
+                terms[3] += square[3]
+        self._square_terms = square_terms
+        self._terms = terms
+
+    def get_terms(self):
+        """
+        Returns the terms a position is evaluated by, each counted for the first player less the second player:
+        controlled stacks, pieces in controlled stacks, enemy pieces buried in controlled stacks, stack moves,
+        pieces in reserve and captured pieces. The board terms are kept up to date by every method that moves
+        pieces and the counts are list lengths, so this costs the same in any position.
+        :return: A tuple of six integers
+        """
+        first, second = self._players
+        terms = self._terms
+        return (terms[0], terms[1], terms[2], terms[3], len(first.get_reserves()) - len(second.get_reserves()),
+                len(first.get_captured()) - len(second.get_captured()))
+
+    def snapshot(self):
+        """
+        Captures the position as an immutable FocusPosition, looking up each stack's packed byte by its pieces
+        :return: A FocusPosition
+        """
+        packed = self._packed
+        board = bytearray(36)
+        i = 0
+        for row in self._board:
+            for stack in row:
+                if stack:
+                    pieces = tuple(stack.get_stack_list())
+                    value = packed.get(pieces)
+                    if value is None:
+                        colors = 0
+                        for piece in reversed(pieces):
+                            colors = (colors << 1) | self._color_index[piece]
+                        value = packed[pieces] = pack_stack(len(pieces), colors)
+                    board[i] = value
+                i += 1
+        first, second = self._players
+        if self._turn == None:
+            turn = 0
+        elif self._turn == 1:
+            turn = 3
+        else:
+            turn = 1 if self._turn == first.get_name() else 2
+        return FocusPosition(bytes(board), (len(first.get_reserves()), len(second.get_reserves())),
+                             (len(first.get_captured()), len(second.get_captured())), turn, self._hash)
+
+    def restore(self, position):
+        """
+        Replaces the position with one from snapshot of a game between the same players. Each square gets a copy of
+        a Stack kept for its packed byte. The undo stack is emptied.
+        :param position: A FocusPosition
+        """
+        stacks = self._stacks
+        board = position.board
+        i = 0
+        for row in self._board:
+            for column in range(6):
+                value = board[i]
+                if value == 0:
+                    row[column] = None
+                else:
+                    stack = stacks.get(value)
+                    if stack is None:
+                        height, bits = unpack_stack(value)
+                        colors = (self._players[0].get_color(), self._players[1].get_color())
+                        stack = stacks[value] = Stack(colors[(bits >> (height - 1)) & 1])
+                        stack._pieces = [colors[(bits >> j) & 1] for j in range(height)]
+                        stack._size = height
+                    row[column] = stack.copy()
+                i += 1
+        for index in range(2):
+            user = self._players[index]
+            user._reserves = [user.get_color()] * position.reserves[index]
+            user._captured = [self._players[1 - index].get_color()] * position.captured[index]
+        self._turn = (None, self._players[0].get_name(), self._players[1].get_name(), 1)[position.turn]
+        self._dirty_squares = {(row, column) for row in range(6) for column in range(6)}
+        self._undo = []
+        self._hash = position.key
+        self.load_terms(board)
+
+    def clone(self):
+        """
+        Makes an independent copy of the game in the same position, copying each stack's piece list once. The copy
+        has no undo history and no recorder.
+        :return: A new FocusGame
+        """
+        game = FocusGame.__new__(FocusGame)
+        game._quiet = self._quiet
+        game._verbose = self._verbose
+        game._players = []
+        for user in self._players:
+            copy = Player(user.get_name(), user.get_color())
+            copy._reserves = user.get_reserves()[:]
+            copy._captured = user.get_captured()[:]
+            game._players.append(copy)
+        game._turn = self._turn
+        game._board = [[stack.copy() if stack else None for stack in row] for row in self._board]
+        game._move_cache = [row[:] for row in self._move_cache]                 #entries are immutable tuples
+        game._dirty_squares = set(self._dirty_squares)
+        game._undo = []
+        game._color_index = self._color_index
+        game._hash = self._hash
+        game._square_terms = self._square_terms[:]                              #entries are immutable tuples
+        game._terms = self._terms[:]
+        game._recorder = None
+        game._packed = self._packed
+        game._stacks = self._stacks
+        return game
+
+    def to_bytes(self):
+        """
+        Serializes the position into 41 bytes: one packed byte per square as in FocusBoard (row by row), both
+        players' reserve counts, both players' captured counts, and the turn (0 before the first move, 1 or 2 for
+        the first or second player, 3 once the game is over). Player names and colors are not included.
+        :return: The position as bytes
+        """
+        data = bytearray(41)
+        i = 0
+        for row in self._board:
+            for stack in row:
+                if stack != None and stack != []:
+                    colors = 0
+                    for piece in reversed(stack.get_stack_list()):
+                        colors = (colors << 1) | self._color_index[piece]
+                    data[i] = pack_stack(stack.get_size(), colors)
+                i += 1
+        data[36] = len(self._players[0].get_reserves())
+        data[37] = len(self._players[1].get_reserves())
+        data[38] = len(self._players[0].get_captured())
+        data[39] = len(self._players[1].get_captured())
+        if self._turn == None:
+            data[40] = 0
+        elif self._turn == 1:
+            data[40] = 3
+        elif self._turn == self._players[0].get_name():
+            data[40] = 1
+        else:
+            data[40] = 2
+        return bytes(data)
+
+    def load_bytes(self, data):
+        """
+        Replaces the position with one serialized by to_bytes from a game between the same players. The undo stack
+        is emptied.
+        :param data: The position as returned by to_bytes
+        """
+        colors = (self._players[0].get_color(), self._players[1].get_color())
+        i = 0
+        for row in range(6):
+            for column in range(6):
+                height, bits = unpack_stack(data[i])
+                if height == 0:
+                    self._board[row][column] = None
+                else:
+                    stack = Stack(colors[(bits >> (height - 1)) & 1])
+                    j = height - 2
+                    while j >= 0:
+                        stack.add_piece_to_top(colors[(bits >> j) & 1])
+                        j -= 1
+                    self._board[row][column] = stack
+                self._dirty_squares.add((row, column))
+                i += 1
+        for index in range(2):
+            user = self._players[index]
+            user._reserves = [colors[index]] * data[36 + index]
+            user._captured = [colors[1 - index]] * data[38 + index]
+        self._turn = (None, self._players[0].get_name(), self._players[1].get_name(), 1)[data[40]]
+        self._undo = []
+        self._hash = self.compute_hash()
+        self.load_terms(data)
 
     def print_board(self):
         """
@@ -406,15 +1043,13 @@ class FocusGame:
         """
         if self._turn == None:
             self._turn = player
-            return True
+            return self.report(FocusResult.OK)
         elif self._turn == 1:
-            print("Game is over")
-            return False
+            return self.report(FocusResult.GAME_OVER)
         elif self._turn != player:
-            print("not your turn")
-            return False
+            return self.report(FocusResult.NOT_YOUR_TURN)
         else:
-            return True
+            return self.report(FocusResult.OK)
 
     def check_move(self, player, start, move, num_pieces):
         """
@@ -427,32 +1062,32 @@ class FocusGame:
         :param num_pieces: The number of pieces the user would like to move
         :return: False if move is invalid, along with a printed message, True if the move is valid.
         """
-        #check player owns the stack self.check_coords(start, move) == False:
-        if self.check_coords(start, move) == False:
-            return False
+        #check player owns the stack
+        result = self.check_coords(start, move)
+        if result is not True and result is not PASSED:
+            return result
+        user = self.find_player(player)
+        if user == None:
+            return self.report(FocusResult.PLAYER_NOT_FOUND)
         elif self._board[start[0]][start[1]] == None or self._board[start[0]][start[1]] == []:
-            print("invalid location(not your piece)")
-            return False
-        elif self.get_player(player).get_color() != self._board[start[0]][start[1]].get_stack_list()[0]:
-            print("invalid location(not your piece)")
-            return False
+            return self.report(FocusResult.NOT_YOUR_PIECE)
+        elif user.get_color() != self._board[start[0]][start[1]].get_stack_list()[0]:
+            return self.report(FocusResult.NOT_YOUR_PIECE)
         # check number of pieces
         elif num_pieces > self._board[start[0]][start[1]].get_size() or num_pieces < 1:
-            print("invalid number of pieces")
-            return False
+            return self.report(FocusResult.INVALID_NUMBER)
         else:
             #check the move
             if (start[0] + num_pieces) == move[0] and start[1] == move[1]:
-                return True
+                return self.report(FocusResult.OK)
             elif (start[0] - num_pieces) == move[0] and start[1] == move[1] :
-                return True
+                return self.report(FocusResult.OK)
             elif (start[1] + num_pieces) == move[1] and start[0] == move[0]:
-                return True
+                return self.report(FocusResult.OK)
             elif (start[1] - num_pieces) == move[1] and start[0] == move[0]:
-                return True
+                return self.report(FocusResult.OK)
             else:
-                print("invalid location(move not possible)")
-                return False
+                return self.report(FocusResult.MOVE_NOT_POSSIBLE)
 
     def check_reserved_move(self, player, move):
         """
@@ -463,19 +1098,20 @@ class FocusGame:
         :param move: A tuple of coordinates between 0 and 5 where the player is trying to place a piece
         :return: False if the move is invalid, True if it is valid
         """
-        if self.get_player(player).get_reserves() == []:
-            print("No pieces in reserve")
-            return False
-        elif self.check_turn(player) == False:
-            return False
+        user = self.find_player(player)
+        if user == None:
+            return self.report(FocusResult.PLAYER_NOT_FOUND)
+        elif user.get_reserves() == []:
+            return self.report(FocusResult.NO_RESERVES)
+        result = self.check_turn(player)
+        if result is not True and result is not PASSED:
+            return result
         elif move[0] < 0 or move[0] > 5:
-            print("Move coordinates invalid")
-            return False
+            return self.report(FocusResult.INVALID_MOVE_COORDINATES)
         elif move[1] < 0 or move[1] > 5:
-            print("Move coordinates invalid")
-            return False
+            return self.report(FocusResult.INVALID_MOVE_COORDINATES)
         else:
-            return True
+            return self.report(FocusResult.OK)
 
     def check_coords(self, start, destination):
         """
@@ -485,33 +1121,71 @@ class FocusGame:
         :return: False if the move is invalid, True if the move is valid
         """
         if start[0] < 0 or start[0] > 5:
-            print("Source coordinates invalid")
-            return False
+            return self.report(FocusResult.INVALID_SOURCE)
         elif start[1] < 0 or start[1] > 5:
-            print("Source coordinates invalid")
-            return False
+            return self.report(FocusResult.INVALID_SOURCE)
         elif destination[0] < 0 or destination[0] > 5:
-            print("Destination coordinates invalid")
-            return False
+            return self.report(FocusResult.INVALID_DESTINATION)
         elif destination[1] < 0 or destination[1] >5:
-            print("Destination coordinates invalid")
-            return False
+            return self.report(FocusResult.INVALID_DESTINATION)
         else:
+            return self.report(FocusResult.OK)
+
+    def report(self, result):
+        """
+        Turns a FocusResult from one of the check methods into the method's return value. In quiet mode the code is
+        returned and an error is logged at debug level; otherwise an error is printed and False returned, and OK
+        becomes True.
+        :param result: A FocusResult
+        :return: The result code in quiet mode, otherwise True or False
+        """
+        if self._quiet:
+            if result is not PASSED and self._verbose:
+                logger.debug("%s", result.value)
+            return result
+        elif result is PASSED:
             return True
+        else:
+            print(result.value)
+            return False
 
+    def debug(self, message, *args):
+        """
+        Prints a diagnostic message, or in quiet mode logs it at debug level. The message is only formatted with
+        the arguments when it is printed or the logger is enabled for debug messages.
+        :param message: The message, a %-style format string
+        :param args: Arguments for the format string
+        """
+        if not self._verbose:
+            return
+        if self._quiet:
+            logger.debug(message, *args)
+        else:
+            print(message % args)
 
-    def get_player(self, player):
+    def find_player(self, player):
         """
-        Returns player object from list of players, takes a player name as a parameter
+        Returns player object from list of players without any message if it is not found
         :param player: Name of the player to be found
         :return: A Player object with the same name as the parameter, or None if the player is not found
         """
         for user in self._players:
             if user.get_name() == player:
                 return user
-        print("Player not found")
         return None
 
+
+    def get_player(self, player):
+        """
+        Returns player object from list of players, takes a player name as a parameter
+        :param player: Name of the player to be found
+        :return: A Player object with the same name as the parameter, or None if the player is not found
+        """
+        user = self.find_player(player)
+        if user == None:
+            self.debug("Player not found")
+        return user
+
     def change_turn(self, player):
         """
         Switches the turn to the other player.
@@ -528,265 +1202,3 @@ class FocusGame:
         :return: the player whose turn it is as a string
         """
         return self._turn
-
-
-class FocusDisplay:
-
-    def __init__(self):
-        """
-
-        """
-        # initialize
-        pygame.init()
-
-        # define colors
-        BLACK = (0, 0, 0)
-        GRAY = (127, 127, 127)
-        WHITE = (255, 255, 255)
-        RED = (255, 0, 0)
-        GREEN = (0, 255, 0)
-        BLUE = (0, 0, 255)
-
-        self.create_board(BLACK, WHITE, BLUE, RED, GREEN)
-
-    def run_game(self, screen, RED, GREEN):
-        #Run unitl user quits
-        BLACK = (0,0,0)
-        WHITE = (255,255,255)
-        BLUE = (0,0,255)
-        running = True
-        move = (None, None)
-        pieces = 1
-
-        while running:
-
-            #update board:
-            self.fill_pieces(screen, RED, GREEN, game)
-            pygame.display.flip()
-
-            #Did the user click close?
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    running = False
-                elif event.type == MOUSEBUTTONDOWN:
-                    print(event)
-                #MOUSEBUTTONUP represents the user selecting a space
-                elif event.type == MOUSEBUTTONUP:
-                    if move == (None, None):
-                        print(event)
-                        mpos_x, mpos_y = event.pos
-                        move = self.translate_click(mpos_x, mpos_y)
-                        print(move)
-                        print("start")
-                    else:
-                        print(event)
-                        mpos_x, mpos_y = event.pos
-                        end = self.translate_click(mpos_x, mpos_y)
-                        turn = game.get_turn()
-                        print(turn)
-                        if turn == None:
-                            turn = "PlayerA"
-                            game.move_piece(turn, move, end, pieces)
-                            move = (None, None)
-                            self.create_board(BLACK, WHITE, BLUE, RED, GREEN)
-                            self.fill_pieces(screen, RED, GREEN, game)
-                            pygame.display.flip()
-                        else:
-                            game.move_piece(turn, move, end, pieces)
-                            move = (None, None)
-                            self.create_board(BLACK, WHITE, BLUE, RED, GREEN)
-                            self.fill_pieces(screen, RED, GREEN, game)
-                            pygame.display.flip()
-
-        pygame.quit()
-
-    def draw_grid_vert(self, start_pos, end_pos, width, screen, color):
-        """
-        Draws the vertical lines of the game board separating spaces
-        :param start_pos:
-        :param end_pos:
-        :param width:
-        :param height:
-        :return:
-        """
-
-        pygame.draw.line(screen, color, start_pos, end_pos, width)
-        i = 0
-        temp_start = start_pos[0]
-        temp_end = end_pos[0]
-
-        while i <= 6:
-            pygame.draw.line(screen, color, (temp_start,start_pos[1]), (temp_end, end_pos[1]), width)
-            temp_start += 75
-            temp_end += 75
-            i += 1
-
-        return
-
-
-    def draw_grid_horizontal(self, start_pos, end_pos, width, screen, color):
-        """
-        Draws a horizontal set of lines
-        :param start_pos:
-        :param end_pos:
-        :param width:
-        :param screen:
-        :param color:
-        :return:
-        """
-        pygame.draw.line(screen, color, start_pos, end_pos, width)
-        i = 0
-        temp_start = start_pos[1]
-        temp_end = end_pos[1]
-
-        while i <= 6:
-            pygame.draw.line(screen, color, (start_pos[0],temp_start), (end_pos[0], temp_end), width)
-            temp_start += 75
-            temp_end += 75
-            i += 1
-
-        return
-
-    def create_board(self, BLACK, WHITE, BLUE, RED, GREEN):
-        """
-
-        :return:
-        """
-
-        # make a window
-        screen = pygame.display.set_mode((950, 500))
-        screen.fill(WHITE)
-
-        #window caption
-        pygame.display.set_caption("Focus the game!")
-
-        #make the board
-        pygame.draw.rect(screen, BLACK, (50, 20, 450, 450))
-
-        #draw vertical lines
-        self.draw_grid_vert((50, 20), (50, 470), 2, screen, BLUE)
-
-        #draw horizontal lines
-        self.draw_grid_horizontal((50, 20), (500, 20), 2, screen, BLUE)
-
-        #display
-        pygame.display.flip()
-        self.run_game(screen, RED, GREEN)
-
-    def fill_pieces(self, screen, RED, GREEN, game):
-        """
-
-        :param screen:
-        :param RED:
-        :param GREEN:
-        :param game:
-        :return:
-        """
-        left_coord = 80
-        top_coord = 84
-
-        for row in game._board:
-            for stack in row:
-                if stack == None:
-                    j = 0
-                    while j < 6:
-                        pygame.draw.rect(screen, (0,0,0), (left_coord, top_coord, 20, 10))
-                        top_coord -= 11
-                        j += 1
-                    top_coord += j * 11
-
-                else:
-                    temp_stack = stack.get_stack_list()
-                    temp_stack.reverse()
-                    counter = len(stack.get_stack_list())
-                    i = 0
-                    while i < counter:
-                        if temp_stack[i] == "R":
-                            pygame.draw.rect(screen, RED, (left_coord, top_coord, 20, 10))
-                            top_coord -= 11
-                            i+=1
-                        else:
-                            pygame.draw.rect(screen, GREEN, (left_coord, top_coord, 20, 10))
-                            top_coord -= 11
-                            i+=1
-                    temp_stack.reverse()
-                    top_coord += i*11
-                left_coord += 75
-
-            #reset to left side
-            left_coord = 80
-            top_coord += 75
-
-
-    def translate_click(self, mpos_x, mpos_y):
-        """
-        Determines the column and row of the board selected by the user with a MOUSEBUTTONUP event
-        :param mpos_x: X-axis position of the mouse at the time of the event
-        :param mpos_y: Y-axis position of the mouse at the time of the event
-        :return: A tuple of coordinates on the board, able to be understood by the game
-        """
-
-        row = None
-        column = None
-
-        if mpos_x < 50 or mpos_x > 500:
-            print("Please select a valid square")
-            return False
-        else:
-            if mpos_x >= 50 and mpos_x <= 125:
-                column = 0
-                row = self.translate_click_y(mpos_y)
-                return (row, column)
-            elif mpos_x > 125 and mpos_x <= 200:
-                column = 1
-                row = self.translate_click_y(mpos_y)
-                return (row, column)
-            elif mpos_x > 200 and mpos_x <= 275:
-                column = 2
-                row = self.translate_click_y(mpos_y)
-                return (row, column)
-            elif mpos_x > 275 and mpos_x <= 350:
-                column = 3
-                row = self.translate_click_y(mpos_y)
-                return (row, column)
-            elif mpos_x > 350 and mpos_x <= 425:
-                column = 4
-                row = self.translate_click_y(mpos_y)
-                return (row, column)
-            elif mpos_x > 425 and mpos_x <= 500:
-                column = 5
-                row = self.translate_click_y(mpos_y)
-                return (row, column)
-
-    def translate_click_y(self, mpos_y):
-        """
-        Determines the row of the board selected by the user with a MOUSEBUTTONUP
-        :param mpos_y: Position of the mouse at the time of the MOUSEBUTTONUP event
-        :return:integer representing with row the user selected
-        """
-
-        if mpos_y < 20 or mpos_y > 470:
-            return False
-        else:
-            if mpos_y >= 20 and mpos_y < 95:
-                return 0
-            elif mpos_y >= 95 and mpos_y < 170:
-                return 1
-            elif mpos_y >= 170 and mpos_y < 245:
-                return 2
-            elif mpos_y >= 245 and mpos_y < 320:
-                return 3
-            elif mpos_y >= 320 and mpos_y < 395:
-                return 4
-            elif mpos_y >= 395 and mpos_y <= 470:
-                return 5
-
-if __name__ == '__main__':
-    p1 = ('PlayerA', 'R')
-    p2 = ('PlayerB', 'G')
-    game = FocusGame(p1, p2)
-    game_screen = FocusDisplay()
-
-
-
-
@@ -0,0 +1,314 @@
+# Description: A Monte Carlo Tree Search (UCT) player for the Focus/Domination game. The tree is searched on a
+# PackedFocusGame copy of the position, and playouts make random legal moves on a copy of the packed board, so the
+# printing move_piece path is never used. A search runs for a number of playouts, a time budget, or both, stopping
+# at whichever runs out first. The subtree
+# under the chosen move is kept and reused on the next turn if the game reached one of its positions, and the
+# search can be spread over worker processes that each grow their own tree from the root (root parallelism).
+
+import math
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from FocusBoard import PackedFocusGame
+
+
+EXPLORATION = 1.4           # UCT exploration constant
+MAX_PLAYOUT = 200           # plies a playout may run before it is scored as a draw or by captured pieces
+CHECK_EVERY = 16            # playouts between checks of the time budget
+
+
+class Node:
+    """
+    Represents a node of the search tree: the position reached by making a move from the parent node. Holds the
+    index of the player who made the move, the moves not yet expanded, the expanded children, and the total reward
+    and visit count, the reward being from the point of view of the player who made the move.
+    """
+    __slots__ = ('move', 'parent', 'mover', 'untried', 'children', 'wins', 'visits')
+
+    def __init__(self, move, parent, mover, untried):
+        """
+        Initializes a node with no visits
+        :param move: The move that reaches this node, None for the root
+        :param parent: The parent Node, None for the root
+        :param mover: Index (0 or 1) of the player who made the move
+        :param untried: List of legal moves from this position not yet expanded
+        """
+        self.move = move
+        self.parent = parent
+        self.mover = mover
+        self.untried = untried
+        self.children = []
+        self.wins = 0.0
+        self.visits = 0
+
+    def select_child(self):
+        """
+        Returns the child with the highest UCT score
+        :return: A child Node
+        """
+        log_visits = math.log(self.visits)
+        best = None
+        best_score = -1.0
+        for child in self.children:
+            score = child.wins / child.visits + EXPLORATION * math.sqrt(log_visits / child.visits)
+            if score > best_score:
+                best_score = score
+                best = child
+        return best
+
+
+def player_tuples(game):
+    """
+    Returns the (name, color) tuples a game was created with
+    :param game: A FocusGame or PackedFocusGame
+    :return: A tuple of the two players' (name, color) tuples
+    """
+    if isinstance(game, PackedFocusGame):
+        return tuple(zip(game._names, game._colors))
+    return tuple((user.get_name(), user.get_color()) for user in game._players)
+
+
+def winner(state):
+    """
+    Returns the winner of a finished packed game
+    :param state: A PackedFocusGame whose game is over
+    :return: Index of the player who captured 6 or more pieces
+    """
+    return 0 if state._captured[0] >= 6 else 1
+
+
+def playout(state, rng):
+    """
+    Plays random legal moves on a packed game until someone wins, a player has no move, or MAX_PLAYOUT plies pass.
+    An unfinished playout goes to the player with more captured pieces.
+    :param state: A PackedFocusGame, changed in place
+    :param rng: A random.Random
+    :return: Index of the winning player, or None for a draw
+    """
+    plies = 0
+    while plies < MAX_PLAYOUT:
+        turn = state._turn
+        if turn == 1:
+            return winner(state)
+        moves = list(state.legal_moves(turn))
+        if moves == []:                                         #a player with no move loses
+            return 1 - state._index[turn]
+        state.make_move(moves[rng.randrange(len(moves))], turn)
+        plies += 1
+    if state._turn == 1:
+        return winner(state)
+    captured = state._captured
+    if captured[0] == captured[1]:
+        return None
+    return 0 if captured[0] > captured[1] else 1
+
+
+def grow_tree(root, root_state, rng, playouts, deadline):
+    """
+    Runs MCTS iterations on a tree: select with UCT, expand one move, play out at random and back up the result
+    :param root: The root Node, grown in place
+    :param root_state: PackedFocusGame in the root position, left unchanged
+    :param rng: A random.Random
+    :param playouts: The number of playouts to run, or None to run until the deadline
+    :param deadline: A time.perf_counter() value to stop at, or None to run the number of playouts
+    :return: The number of playouts run
+    """
+    count = 0
+    while playouts is None or count < playouts:
+        if deadline is not None and count % CHECK_EVERY == 0 and time.perf_counter() > deadline:
+            break
+        state = root_state.copy()
+        node = root
+        while node.untried == [] and node.children:                            #select
+            node = node.select_child()
+            state.make_move(node.move)
+
+        if node.untried and state._turn != 1:                                   #expand
+            untried = node.untried
+            i = rng.randrange(len(untried))
+            move = untried[i]
+            untried[i] = untried[-1]
+            untried.pop()
+            mover = state._index[state._turn]
+            state.make_move(move)
+            child = Node(move, node, mover, [] if state._turn == 1 else list(state.legal_moves(state._turn)))
+            node.children.append(child)
+            node = child
+
+        result = playout(state, rng)                                            #simulate
+        while node is not None:                                                 #back up
+            node.visits += 1
+            if result is None:
+                node.wins += 0.5
+            elif result == node.mover:
+                node.wins += 1.0
+            node = node.parent
+        count += 1
+    return count
+
+
+def root_state_for(game, player):
+    """
+    Makes the packed root state of a search
+    :param game: A FocusGame or PackedFocusGame
+    :param player: Name of the player to move
+    :return: A PackedFocusGame in the game's position with player to move
+    """
+    players = player_tuples(game)
+    state = PackedFocusGame(players[0], players[1])
+    state.load_bytes(game.to_bytes())
+    if state._turn != 1:
+        state._turn = player
+    return state
+
+
+def mcts_worker(players, position, player, playouts, time_ms, seed):
+    """
+    Grows one tree in a worker process for root parallelism
+    :param players: The two (name, color) tuples the game was created with
+    :param position: The position as bytes, from to_bytes
+    :param player: Name of the player to move
+    :param playouts: The number of playouts to run, or None to run until the time budget
+    :param time_ms: Time budget in milliseconds, or None to run the number of playouts
+    :param seed: Seed for this worker's random number generator
+    :return: A tuple of (root children as (move, visits, wins) tuples, playouts run)
+    """
+    state = PackedFocusGame(players[0], players[1])
+    state.load_bytes(position)
+    state._turn = player
+    root = Node(None, None, 1 - state._index[player], list(state.legal_moves(player)))
+    deadline = time.perf_counter() + time_ms / 1000.0 if time_ms is not None else None
+    count = grow_tree(root, state, random.Random(seed), playouts, deadline)
+    return [(child.move, child.visits, child.wins) for child in root.children], count
+
+
+class MCTSPlayer:
+    """
+    Represents an MCTS player. Keeps the subtree under its last chosen move for reuse on its next turn, and
+    records statistics about the last search.
+    """
+
+    def __init__(self, playouts=1000, time_ms=None, workers=1, seed=None):
+        """
+        Initializes the player
+        :param playouts: Default number of playouts per move, used when no time budget is given
+        :param time_ms: Default time budget per move in milliseconds, overrides playouts when set
+        :param workers: Number of processes growing trees at the root. With more than one, trees are not reused
+        :param seed: Seed for the random number generator
+        """
+        self._playouts = playouts
+        self._time_ms = time_ms
+        self._workers = workers
+        self._rng = random.Random(seed)
+        self._pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+        self._root = None
+        self._root_state = None
+        self._stats = {}
+
+    def get_stats(self):
+        """
+        Returns statistics about the last search
+        :return: A dictionary with the playouts run, seconds taken, playouts per second, visits of the chosen
+        move and whether the tree was reused
+        """
+        return self._stats
+
+    def find_root(self, state):
+        """
+        Looks for the position to search in the kept tree: the kept root itself, or a position one move below it
+        :param state: PackedFocusGame in the position to search
+        :return: The matching Node, or None if the position is not in the kept tree
+        """
+        if self._root is None:
+            return None
+        key = state.to_bytes()
+        if self._root_state.to_bytes() == key:
+            return self._root
+        for child in self._root.children:
+            after = self._root_state.copy()
+            after.make_move(child.move)
+            if after.to_bytes() == key:
+                return child
+        return None
+
+    def best_move(self, game, player, playouts=None, time_ms=None):
+        """
+        Searches for the best move for a player, the most visited move at the root. The game is not changed.
+        :param game: A FocusGame or PackedFocusGame
+        :param player: Name of the player to move
+        :param playouts: Number of playouts to run, defaults to the player's setting
+        :param time_ms: Time budget in milliseconds, defaults to the player's setting. Given with playouts, the
+        search stops at whichever runs out first
+        :return: The chosen move tuple, or None if the player has no move
+        """
+        began = time.perf_counter()
+        if playouts is None and time_ms is None:
+            playouts, time_ms = self._playouts, self._time_ms
+            if time_ms is not None:
+                playouts = None                                                 #the default budget overrides
+        state = root_state_for(game, player)
+
+        if self._pool is not None:
+            best, visits, count = self.parallel_search(game, state, player, playouts, time_ms)
+            reused = False
+        else:
+            root = self.find_root(state)
+            reused = root is not None
+            if root is None:
+                root = Node(None, None, 1 - state._index[player], list(state.legal_moves(player)))
+            root.parent = None
+            deadline = began + time_ms / 1000.0 if time_ms is not None else None
+            count = grow_tree(root, state, self._rng, playouts, deadline)
+            chosen = max(root.children, key=lambda child: child.visits) if root.children else None
+            best = chosen.move if chosen is not None else None
+            visits = chosen.visits if chosen is not None else 0
+            self._root = chosen                                                 #keep the subtree for next turn
+            if chosen is not None:
+                chosen.parent = None
+                self._root_state = state
+                state.make_move(best)
+
+        seconds = time.perf_counter() - began
+        self._stats = {
+            'playouts': count,
+            'seconds': seconds,
+            'playouts_per_sec': count / seconds if seconds > 0 else 0.0,
+            'visits': visits,
+            'reused': reused,
+        }
+        return best
+
+    def parallel_search(self, game, state, player, playouts, time_ms):
+        """
+        Grows one tree per worker from the root and adds up the visits of each root move
+        :param game: The game being searched
+        :param state: PackedFocusGame in the root position
+        :param player: Name of the player to move
+        :param playouts: Total playouts to share between the workers, or None to run until the time budget
+        :param time_ms: Time budget in milliseconds, or None to run the playouts
+        :return: A tuple of (best move, its total visits, total playouts)
+        """
+        share = None if playouts is None else -(-playouts // self._workers)
+        position = state.to_bytes()
+        players = player_tuples(game)
+        futures = [self._pool.submit(mcts_worker, players, position, player, share, time_ms,
+                                     self._rng.getrandbits(32)) for i in range(self._workers)]
+        visits = {}
+        count = 0
+        for future in futures:
+            children, played = future.result()
+            count += played
+            for move, child_visits, wins in children:
+                visits[move] = visits.get(move, 0) + child_visits
+        if visits == {}:
+            return None, 0, count
+        best = max(visits, key=visits.get)
+        return best, visits[best], count
+
+    def close(self):
+        """
+        Shuts down the worker pool, if there is one
+        """
+        if self._pool is not None:
+            self._pool.shutdown()
@@ -0,0 +1,173 @@
+# Description: Perft (performance test) for the Focus/Domination move generator. perft counts the positions
+# reached after every sequence of legal moves of a given length, from the fill_board start position and from a set
+# of stored midgame positions, and checks the counts against recorded reference values. Any change to Stack,
+# legal_moves, make_move or the capture loop that changes a count is a rules bug; the nodes/sec it reports track
+# the speed of the same code. A finished game stops a sequence early and still counts as one position. The
+# 'checked' engine plays every move through move_piece or reserved_move on a clone instead, so the rule checks
+# (check_move, check_reserved_move) and process_move's capture loop are held to the same counts.
+#     python FocusPerft.py --depth 3
+
+import argparse
+import time
+
+from FocusBoard import PackedFocusGame
+from FocusGame import FocusGame, FocusResult
+
+
+PLAYERS = (('PlayerA', 'R'), ('PlayerB', 'G'))
+
+# name: (position from FocusGame.to_bytes as hex, or None for the start position, {depth: positions})
+# Midgame positions come from seeded random games: 'ply20', 'ply40' and 'ply60' from seed 2020, and 'reserves'
+# (both players holding reserve pieces and the second player three captures) from seed 5 at ply 299.
+POSITIONS = {
+    'start': (None, {1: 60, 2: 3452, 3: 204448}),
+    'ply20': ('010109090a01090900010909000b0000010012000101120901002300000009003c0109120000000001',
+              {1: 55, 2: 2773, 3: 151893}),
+    'ply40': ('010109000a00330001003300000100000109000901000923091312010109000001001a2b0000000001',
+              {1: 70, 2: 2551, 3: 170847}),
+    'ply60': ('000009001300330000001a0203120001004d09000100001a0001120209000900000900000002000001',
+              {1: 60, 2: 4398, 3: 259312}),
+    'reserves': ('010009000334000001000009000002f500010000010000003b00000000000000001a1a340101000302',
+                 {1: 60, 2: 5315, 3: 228723}),
+}
+
+
+def load_position(name, quiet=False):
+    """
+    Builds a FocusGame in one of the stored positions. The start position has PlayerA to move.
+    :param name: A key of POSITIONS
+    :param quiet: True for a quiet FocusGame, whose move methods return FocusResult codes
+    :return: A FocusGame
+    """
+    game = FocusGame(PLAYERS[0], PLAYERS[1], quiet)
+    position = POSITIONS[name][0]
+    if position is None:
+        game._turn = PLAYERS[0][0]
+    else:
+        game.load_bytes(bytes.fromhex(position))
+    return game
+
+
+def perft(game, depth):
+    """
+    Counts the positions reached from a FocusGame after every sequence of depth legal moves, using make_move and
+    unmake_move. The game is left as it was found.
+    :param game: A FocusGame with a player to move
+    :param depth: The number of moves in each sequence
+    :return: The number of positions
+    """
+    player = game.get_turn()
+    if depth == 0 or player == 1:
+        return 1
+    if depth == 1:
+        count = 0
+        for move in game.legal_moves(player):
+            count += 1
+        return count if count else 1
+    count = 0
+    for move in list(game.legal_moves(player)):
+        game.make_move(move, player)
+        count += perft(game, depth - 1)
+        game.unmake_move()
+    return count if count else 1
+
+
+def perft_checked(game, depth):
+    """
+    Counts the same positions as perft, but plays each generated move on a clone with move_piece or
+    reserved_move, which check it with check_move or check_reserved_move and apply it with the capture loop of
+    process_move. Moves the checks reject are not counted, so they show up as a wrong count.
+    :param game: A quiet FocusGame with a player to move
+    :param depth: The number of moves in each sequence
+    :return: The number of positions
+    """
+    player = game.get_turn()
+    if depth == 0 or player == 1:
+        return 1
+    count = 0
+    for start, move, num_pieces in list(game.legal_moves(player)):
+        child = game.clone()
+        if start is None:
+            result = child.reserved_move(player, move)
+        else:
+            result = child.move_piece(player, start, move, num_pieces)
+        if result is FocusResult.MOVED or result is FocusResult.WIN:
+            count += perft_checked(child, depth - 1)
+    return count if count else 1
+
+
+def perft_packed(state, depth):
+    """
+    Counts the same positions as perft on a PackedFocusGame, copying the state for each move
+    :param state: A PackedFocusGame with a player to move
+    :param depth: The number of moves in each sequence
+    :return: The number of positions
+    """
+    player = state._turn
+    if depth == 0 or player == 1:
+        return 1
+    if depth == 1:
+        count = 0
+        for move in state.legal_moves(player):
+            count += 1
+        return count if count else 1
+    count = 0
+    for move in state.legal_moves(player):
+        child = state.copy()
+        child.make_move(move, player)
+        count += perft_packed(child, depth - 1)
+    return count if count else 1
+
+
+def run_suite(depth=2, packed=True, checked=True):
+    """
+    Runs perft on every stored position up to a depth, checking the counts against the reference values and
+    printing nodes/sec
+    :param depth: The deepest perft to run, up to the deepest reference value
+    :param packed: True to also run and check perft on PackedFocusGame
+    :param checked: True to also run and check perft_checked, through move_piece and reserved_move
+    :return: A dictionary of results, with 'passed' False if any count differs from its reference value
+    """
+    passed = True
+    totals = {'object': [0, 0.0], 'checked': [0, 0.0], 'packed': [0, 0.0]}
+    for name in POSITIONS:
+        references = POSITIONS[name][1]
+        for level in range(1, depth + 1):
+            engines = [('object', load_position(name), perft)]
+            if checked:
+                engines.append(('checked', load_position(name, True), perft_checked))
+            if packed:
+                state = PackedFocusGame(PLAYERS[0], PLAYERS[1])
+                state.load_bytes(load_position(name).to_bytes())
+                state._turn = PLAYERS[0][0] if state._turn is None else state._turn
+                engines.append(('packed', state, perft_packed))
+            for engine, game, count_positions in engines:
+                began = time.perf_counter()
+                count = count_positions(game, level)
+                seconds = time.perf_counter() - began
+                totals[engine][0] += count
+                totals[engine][1] += seconds
+                expected = references.get(level)
+                status = "ok" if expected is None or count == expected else "FAIL expected %d" % expected
+                if status != "ok":
+                    passed = False
+                print("%-9s %-7s depth %d: %9d positions %10.0f nodes/sec  %s"
+                      % (name, engine, level, count, count / seconds if seconds > 0 else 0.0, status))
+    results = {'passed': passed}
+    for engine in totals:
+        count, seconds = totals[engine]
+        if seconds > 0:
+            results[engine + '_nodes_per_sec'] = count / seconds
+            print("%-7s total: %d positions, %.0f nodes/sec" % (engine, count, count / seconds))
+    print("passed" if passed else "FAILED")
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Check and time the Focus move generator with perft.")
+    parser.add_argument('--depth', type=int, default=2, help="deepest perft to run")
+    parser.add_argument('--object-only', action='store_true', help="skip the PackedFocusGame engine")
+    parser.add_argument('--unchecked', action='store_true', help="skip playing the moves through move_piece")
+    args = parser.parse_args()
+    if not run_suite(args.depth, not args.object_only, not args.unchecked)['passed']:
+        raise SystemExit(1)
@@ -0,0 +1,303 @@
+# Description: Opt-in profiling of the Focus/Domination engine and window. A Profiler, while enabled, replaces the
+# FocusGame methods in GAME_METHODS, and the FocusDisplay methods in DISPLAY_METHODS when asked to, with wrappers that
+# count calls and add up the time spent in them, including the methods they call. Moves passed to record_move and
+# make_move are also counted by the number of pieces moved, and every frame FocusDisplay draws, with update_squares
+# or render, is timed into a histogram. Disabling puts the original methods back on the classes, so a program that
+# never enables a Profiler, or has disabled it, runs the engine's own methods with no cost at all. pygame is only
+# imported when the display is profiled. The counts are read with snapshot and written with dump as JSON.
+#     python FocusProfile.py --games 20 --render --json profile.json --cprofile profile.prof
+#     python FocusProfile.py --play --json profile.json
+# plays random games, or opens the window, with a Profiler enabled, optionally inside cProfile as well.
+
+import argparse
+import cProfile
+import json
+import os
+import random
+import time
+
+from FocusGame import FocusGame
+
+
+GAME_METHODS = (
+    'move_piece', 'process_move', 'reserved_move', 'check_turn', 'check_move', 'check_reserved_move',
+    'check_coords', 'check_win', 'get_player', 'find_player', 'change_turn', 'record_move', 'legal_moves',
+    'make_move', 'unmake_move', 'update_terms', 'snapshot', 'restore', 'clone', 'to_bytes', 'load_bytes',
+)
+DISPLAY_METHODS = (
+    'fill_pieces', 'draw_square', 'get_sprite', 'update_squares', 'render', 'board_image', 'translate_click',
+)
+MOVE_METHODS = ('record_move', 'make_move')         # methods whose first argument is a move tuple
+FRAME_METHODS = ('update_squares', 'render')        # methods that draw one frame
+FRAME_BUCKETS = (1, 2, 4, 8, 16, 33, 66)            # upper edges of the frame time bins in milliseconds
+
+
+def frame_labels():
+    """
+    :return: The names of the frame time bins, one more than FRAME_BUCKETS for the frames past the last edge
+    """
+    labels = []
+    low = 0
+    for high in FRAME_BUCKETS:
+        labels.append("%d-%dms" % (low, high))
+        low = high
+    labels.append(">%dms" % low)
+    return labels
+
+
+class Profiler:
+    """
+    Represents a set of method counters and histograms, and the wrappers that fill them while it is enabled. Only
+    one Profiler should be enabled at a time, as each wraps the methods already on the classes.
+    """
+
+    def __init__(self, display=False):
+        """
+        Initializes empty counters
+        :param display: True to profile FocusDisplay as well as FocusGame
+        """
+        self._display = display
+        self._installed = []                                #(class, method name, original function)
+        self._calls = {}
+        self._seconds = {}
+        self._moves = {}
+        self._frames = [0] * (len(FRAME_BUCKETS) + 1)
+        self._frame_seconds = 0.0
+        self._enabled_at = None
+        self._enabled_seconds = 0.0
+
+    def __enter__(self):
+        self.enable()
+        return self
+
+    def __exit__(self, *exc):
+        self.disable()
+
+    def is_enabled(self):
+        """
+        :return: True while the wrappers are installed
+        """
+        return bool(self._installed)
+
+    def enable(self):
+        """
+        Installs the wrappers on FocusGame, and on FocusDisplay if the display is profiled
+        """
+        if self._installed:
+            return
+        targets = [(FocusGame, GAME_METHODS)]
+        if self._display:
+            from FocusDisplay import FocusDisplay
+            targets.append((FocusDisplay, DISPLAY_METHODS))
+        for cls, names in targets:
+            for name in names:
+                original = cls.__dict__[name]
+                key = cls.__name__ + '.' + name
+                self._calls.setdefault(key, 0)
+                self._seconds.setdefault(key, 0.0)
+                setattr(cls, name, self.wrap(key, name, original))
+                self._installed.append((cls, name, original))
+        self._enabled_at = time.perf_counter()
+
+    def disable(self):
+        """
+        Puts the original methods back, leaving the counters as they are
+        """
+        for cls, name, original in reversed(self._installed):
+            setattr(cls, name, original)
+        self._installed = []
+        if self._enabled_at is not None:
+            self._enabled_seconds += time.perf_counter() - self._enabled_at
+            self._enabled_at = None
+
+    def reset(self):
+        """
+        Zeroes the counters and histograms
+        """
+        for key in self._calls:
+            self._calls[key] = 0
+            self._seconds[key] = 0.0
+        self._moves.clear()
+        self._frames[:] = [0] * (len(FRAME_BUCKETS) + 1)
+        self._frame_seconds = 0.0
+        self._enabled_seconds = 0.0
+        if self._enabled_at is not None:
+            self._enabled_at = time.perf_counter()
+
+    def wrap(self, key, name, function):
+        """
+        Makes the wrapper installed in place of a method
+        :param key: Name the method is counted under, such as 'FocusGame.move_piece'
+        :param name: Name of the method
+        :param function: The original function
+        :return: A function that calls the original and counts it
+        """
+        calls = self._calls
+        seconds = self._seconds
+        clock = time.perf_counter
+
+        if name in MOVE_METHODS:
+            moves = self._moves
+
+            def wrapper(game, move, *args, **kwargs):
+                pieces = 'reserve' if move[0] is None else move[2]
+                moves[pieces] = moves.get(pieces, 0) + 1
+                began = clock()
+                try:
+                    return function(game, move, *args, **kwargs)
+                finally:
+                    seconds[key] += clock() - began
+                    calls[key] += 1
+        elif name in FRAME_METHODS:
+            frames = self._frames
+
+            def wrapper(*args, **kwargs):
+                began = clock()
+                try:
+                    return function(*args, **kwargs)
+                finally:
+                    elapsed = clock() - began
+                    seconds[key] += elapsed
+                    calls[key] += 1
+                    self._frame_seconds += elapsed
+                    i = 0
+                    while i < len(FRAME_BUCKETS) and 1000 * elapsed > FRAME_BUCKETS[i]:
+                        i += 1
+                    frames[i] += 1
+        else:
+            def wrapper(*args, **kwargs):
+                began = clock()
+                try:
+                    return function(*args, **kwargs)
+                finally:
+                    seconds[key] += clock() - began
+                    calls[key] += 1
+
+        wrapper.__name__ = function.__name__
+        wrapper.__doc__ = function.__doc__
+        wrapper.__wrapped__ = function
+        return wrapper
+
+    def snapshot(self):
+        """
+        Returns a copy of the counters
+        :return: A dictionary with the seconds spent enabled; 'methods', each called method's calls, cumulative
+        seconds and mean microseconds, most time first; 'moves', moves by pieces moved with reserve placements
+        under 'reserve'; and 'frames', the frames drawn, their mean milliseconds and a count per FRAME_BUCKETS bin
+        """
+        enabled = self._enabled_seconds
+        if self._enabled_at is not None:
+            enabled += time.perf_counter() - self._enabled_at
+        methods = {}
+        for key in sorted(self._calls, key=lambda key: -self._seconds[key]):
+            calls = self._calls[key]
+            if calls:
+                methods[key] = {
+                    'calls': calls,
+                    'seconds': self._seconds[key],
+                    'mean_us': 1e6 * self._seconds[key] / calls,
+                }
+        frames = sum(self._frames)
+        moves = sorted((str(pieces), count) for pieces, count in self._moves.items())
+        return {
+            'enabled_seconds': enabled,
+            'methods': methods,
+            'moves': dict(moves),
+            'frames': {
+                'count': frames,
+                'mean_ms': 1000 * self._frame_seconds / frames if frames else 0.0,
+                'histogram': dict(zip(frame_labels(), self._frames)),
+            },
+        }
+
+    def dump(self, path):
+        """
+        Writes a snapshot as JSON, replacing the file in one rename
+        :param path: Path of the JSON file
+        """
+        temporary = path + '.tmp'
+        with open(temporary, 'w') as stream:
+            json.dump(self.snapshot(), stream, indent=1)
+        os.replace(temporary, path)
+
+
+def play_games(games, seed=0, render=False):
+    """
+    Plays random games through move_piece and reserved_move, as a workload to profile
+    :param games: The number of games
+    :param seed: Seed for the random moves
+    :param render: True to draw every position offscreen with FocusDisplay.render
+    :return: The number of moves played
+    """
+    rng = random.Random(seed)
+    display = None
+    if render:
+        os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+        from FocusDisplay import FocusDisplay
+        display = FocusDisplay(run=False)
+    played = 0
+    for number in range(games):
+        game = FocusGame(('PlayerA', 'R'), ('PlayerB', 'G'), quiet=True)
+        player = 'PlayerA'
+        while player != 1:
+            moves = list(game.legal_moves(player))
+            if not moves:
+                break
+            start, end, num_pieces = rng.choice(moves)
+            if start is None:
+                game.reserved_move(player, end)
+            else:
+                game.move_piece(player, start, end, num_pieces)
+            played += 1
+            if display is not None:
+                display.render(game)
+            player = game.get_turn()
+    return played
+
+
+def print_snapshot(snapshot, limit=15):
+    """
+    Prints the busiest methods and the histograms of a snapshot
+    :param snapshot: A dictionary from Profiler.snapshot
+    :param limit: Most methods to print
+    """
+    print("%-34s %10s %10s %10s" % ("method", "calls", "seconds", "mean us"))
+    for key, counts in list(snapshot['methods'].items())[:limit]:
+        print("%-34s %10d %10.3f %10.2f" % (key, counts['calls'], counts['seconds'], counts['mean_us']))
+    print("moves by pieces moved: %s" % snapshot['moves'])
+    frames = snapshot['frames']
+    if frames['count']:
+        print("%d frames, %.2f ms mean: %s" % (frames['count'], frames['mean_ms'], frames['histogram']))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Profile FocusGame and FocusDisplay over random games or a window")
+    parser.add_argument('--games', type=int, default=20, help="random games to play")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--render', action='store_true', help="draw every position offscreen and profile the display")
+    parser.add_argument('--play', action='store_true', help="open the window and profile a game played by hand")
+    parser.add_argument('--json', default=None, help="path to write the snapshot to")
+    parser.add_argument('--cprofile', default=None, help="path to write cProfile stats for the run to")
+    args = parser.parse_args()
+    profiler = Profiler(display=args.render or args.play)
+    cprofile = cProfile.Profile() if args.cprofile else None
+    with profiler:
+        if cprofile is not None:
+            cprofile.enable()
+        if args.play:
+            from FocusDisplay import FocusDisplay
+            FocusDisplay(FocusGame(('PlayerA', 'R'), ('PlayerB', 'G')))
+        else:
+            play_games(args.games, args.seed, args.render)
+        if cprofile is not None:
+            cprofile.disable()
+    if cprofile is not None:
+        cprofile.dump_stats(args.cprofile)
+    snapshot = profiler.snapshot()
+    print_snapshot(snapshot)
+    if args.json:
+        profiler.dump(args.json)
+
+
+if __name__ == '__main__':
+    main()
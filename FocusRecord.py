@@ -0,0 +1,363 @@
+# Description: A compact binary record format for Focus/Domination games. A record is a header, the moves, and an
+# end block, all little-endian:
+#     header    b'FGR1', snapshot interval (2 bytes), then for each player a 1 byte name length, the UTF-8 name,
+#               a 1 byte color length and the UTF-8 color, then the 41 byte starting position (FocusGame.to_bytes)
+#               with its turn byte naming the player who made the first move, even when the game had no turn yet
+#     moves     each move is 2 bytes, FocusTable.encode_move of the move tuple. After every interval-th move a
+#               snapshot block follows: the SNAPSHOT marker and the 41 byte position after that move.
+#     end       the END marker and the 41 byte final position
+# Every block has a fixed size, so the offset of move k and of each snapshot is computed from the header alone and
+# seek() replays at most interval - 1 moves. Records can be concatenated into one file and read back one at a time
+# with iter_records, which reads the file in chunks. RecordWriter is attached to a FocusGame with set_recorder and
+# appends each move as move_piece or reserved_move applies it. Either player may open a game, so the writer holds
+# the header back until the first move tells it who moved first.
+
+import struct
+
+from FocusGame import FocusGame
+from FocusTable import encode_move, decode_move
+
+
+MAGIC = b'FGR1'
+SNAPSHOT = 0xFFFF           # marker of a snapshot block
+END = 0xFFFE                # marker of the end block
+POSITION_SIZE = 41          # bytes in a position from FocusGame.to_bytes
+BLOCK_SIZE = 2 + POSITION_SIZE
+SNAPSHOT_INTERVAL = 128     # moves between snapshots, each 43 bytes, traded against the moves seek replays
+CHUNK_SIZE = 1 << 20        # bytes iter_records reads at a time
+
+MOVES = [decode_move(code) for code in range(6661)]                    # decoded move of every move code
+
+
+def encode_header(players, start, interval=SNAPSHOT_INTERVAL):
+    """
+    Builds the header of a record
+    :param players: The two (name, color) tuples
+    :param start: The starting position as bytes, from FocusGame.to_bytes
+    :param interval: Moves between snapshots
+    :return: The header as bytes
+    """
+    data = bytearray(MAGIC)
+    data += struct.pack('<H', interval)
+    for name, color in players:
+        for text in (name, color):
+            encoded = text.encode('utf-8')
+            data.append(len(encoded))
+            data += encoded
+    data += start
+    return bytes(data)
+
+
+def decode_header(data, offset=0):
+    """
+    Reads the header of a record
+    :param data: A bytes-like object holding the record
+    :param offset: Offset of the record in data
+    :return: A tuple of (players as two (name, color) tuples, interval, starting position, offset of the first
+    move), or None if data ends before the header does
+    :raise ValueError: If there is no record at offset
+    """
+    if len(data) < offset + 6:
+        return None
+    if bytes(data[offset:offset + 4]) != MAGIC:
+        raise ValueError("not a game record at offset %d" % offset)
+    interval = data[offset + 4] | data[offset + 5] << 8
+    i = offset + 6
+    texts = []
+    for j in range(4):
+        if len(data) <= i:
+            return None
+        length = data[i]
+        texts.append(bytes(data[i + 1:i + 1 + length]).decode('utf-8'))
+        i += 1 + length
+    if len(data) < i + POSITION_SIZE:
+        return None
+    players = ((texts[0], texts[1]), (texts[2], texts[3]))
+    return players, interval, bytes(data[i:i + POSITION_SIZE]), i + POSITION_SIZE
+
+
+def record_end(data, offset):
+    """
+    Finds where a record ends by stepping over its moves and snapshots
+    :param data: A bytes-like object holding the record
+    :param offset: Offset of the record in data
+    :return: Offset just past the record's end block, or None if data ends before the record does
+    """
+    header = decode_header(data, offset)
+    if header is None:
+        return None
+    i = header[3]
+    size = len(data)
+    while i + 2 <= size:
+        code = data[i] | data[i + 1] << 8
+        if code == END:
+            return i + BLOCK_SIZE if i + BLOCK_SIZE <= size else None
+        i += BLOCK_SIZE if code == SNAPSHOT else 2
+    return None
+
+
+class RecordWriter:
+    """
+    Represents a record being written to a binary stream. The header is written with the first move, once the
+    player who made it is known, each move when record is called, and the end block when the game is won or the
+    writer is closed.
+    """
+
+    def __init__(self, stream, game, interval=SNAPSHOT_INTERVAL):
+        """
+        Starts a new record for a game in its current position
+        :param stream: A binary file object opened for writing or appending
+        :param game: The FocusGame being recorded
+        :param interval: Moves between snapshots
+        """
+        self._stream = stream
+        self._interval = interval
+        self._moves = 0
+        self._closed = False
+        self._players = tuple((user.get_name(), user.get_color()) for user in game._players)
+        self._start = bytearray(game.to_bytes())
+        self._header = False
+
+    def write_header(self, player=None):
+        """
+        Writes the header, once. A start position with no turn is given the turn of the player who moved first.
+        :param player: Name of the player who made the first move, or None if no move was made
+        """
+        if self._header:
+            return
+        if self._start[40] == 0 and player is not None:
+            self._start[40] = 1 if player == self._players[0][0] else 2
+        self._stream.write(encode_header(self._players, bytes(self._start), self._interval))
+        self._header = True
+
+    def get_moves(self):
+        """
+        :return: The number of moves recorded
+        """
+        return self._moves
+
+    def record(self, game, move, player):
+        """
+        Appends a move that has just been applied to a game, followed by a snapshot every interval moves and by
+        the end block if the move won the game
+        :param game: The FocusGame the move was applied to
+        :param move: The move tuple, (start, move, num_pieces) or (None, move, 1) for a reserve placement
+        :param player: Name of the player who made the move
+        """
+        if self._closed:
+            return
+        self.write_header(player)
+        self._stream.write(struct.pack('<H', encode_move(move)))
+        self._moves += 1
+        if game.get_turn() == 1:
+            self.close(game)
+        elif self._moves % self._interval == 0:
+            self._stream.write(struct.pack('<H', SNAPSHOT) + game.to_bytes())
+
+    def close(self, game):
+        """
+        Writes the end block with the final position, once. The stream is left open.
+        :param game: The FocusGame being recorded
+        """
+        if not self._closed:
+            self.write_header()
+            self._stream.write(struct.pack('<H', END) + game.to_bytes())
+            self._closed = True
+
+
+class RecordReader:
+    """
+    Represents one record held in memory, in a bytes-like object that may hold other records around it. Reads
+    the header when made; moves are decoded as they are asked for.
+    """
+
+    def __init__(self, data, offset=0, end=None):
+        """
+        Reads the header of the record at an offset
+        :param data: A bytes-like object, such as bytes, a memoryview or an mmap
+        :param offset: Offset of the record in data
+        :param end: Offset just past the record if it is already known, such as from an archive index
+        """
+        header = decode_header(data, offset)
+        if header is None:
+            raise ValueError("record header at offset %d is cut off" % offset)
+        self._data = data
+        self._offset = offset
+        self._end = end
+        self._players, self._interval, self._start, self._first = header
+
+    def get_players(self):
+        """
+        :return: The two (name, color) tuples
+        """
+        return self._players
+
+    def get_interval(self):
+        """
+        :return: The number of moves between snapshots
+        """
+        return self._interval
+
+    def get_start(self):
+        """
+        :return: The starting position as bytes
+        """
+        return self._start
+
+    def get_first_mover(self):
+        """
+        :return: Name of the player who made the first move, from the starting position's turn, or None if the
+        record names none, as when no move was made
+        """
+        turn = self._start[40]
+        return self._players[turn - 1][0] if turn in (1, 2) else None
+
+    def check_first_mover(self):
+        """
+        :raise ValueError: If the record has moves but does not name the player who made the first one
+        """
+        if self.get_first_mover() is None and self._start[40] != 3 and next(self.moves(), None) is not None:
+            raise ValueError("record does not name its first mover")
+
+    def move_offset(self, number):
+        """
+        :param number: Index of a move, from 0
+        :return: Offset in the data of the move's code
+        """
+        return self._first + 2 * number + BLOCK_SIZE * (number // self._interval)
+
+    def moves(self):
+        """
+        Generates the moves of the record in order, without replaying them
+        :return: A generator of move tuples
+        """
+        data = self._data
+        i = self._first
+        size = len(data)
+        while i + 2 <= size:
+            code = data[i] | data[i + 1] << 8
+            if code == END:
+                return
+            if code == SNAPSHOT:
+                i += BLOCK_SIZE
+            else:
+                yield MOVES[code]
+                i += 2
+
+    def new_game(self, position=None):
+        """
+        Makes a quiet FocusGame between the record's players
+        :param position: A position as bytes, defaults to the starting position
+        :return: The FocusGame
+        """
+        game = FocusGame(self._players[0], self._players[1], quiet=True)
+        game.load_bytes(self._start if position is None else position)
+        return game
+
+    def replay(self):
+        """
+        Replays the record move by move on one FocusGame, made with make_move so no move is checked again
+        :return: A generator of (move, game) after each move, always the same FocusGame object
+        """
+        self.check_first_mover()
+        game = self.new_game()
+        for move in self.moves():
+            game.make_move(move, game.get_turn())
+            yield move, game
+
+    def seek(self, number):
+        """
+        Builds the position after a number of moves from the nearest snapshot before it
+        :param number: The number of moves to play, no more than the record holds
+        :return: A FocusGame in that position
+        :raise IndexError: If the record has fewer moves
+        """
+        snapshot = number // self._interval
+        if snapshot == 0:
+            if number > 0:
+                self.check_first_mover()
+            game = self.new_game()
+        else:
+            i = self.move_offset(snapshot * self._interval) - POSITION_SIZE
+            if self._data[i - 2] | self._data[i - 1] << 8 not in (SNAPSHOT, END):  #a win writes the end block
+                raise IndexError("record has fewer than %d moves" % number)
+            game = self.new_game(bytes(self._data[i:i + POSITION_SIZE]))
+        data = self._data
+        for k in range(snapshot * self._interval, number):
+            i = self.move_offset(k)
+            code = data[i] | data[i + 1] << 8 if i + 2 <= len(data) else END
+            if code == END:
+                raise IndexError("record has fewer than %d moves" % number)
+            game.make_move(MOVES[code], game.get_turn())
+        return game
+
+    def final_position(self):
+        """
+        :return: The final position as bytes from the end block, or None if the record has no end block
+        """
+        end = self.get_end()
+        if end is None:
+            return None
+        return bytes(self._data[end - POSITION_SIZE:end])
+
+    def get_result(self):
+        """
+        Finds the game's result for the first player from the final position. A game that was not won ends in a
+        loss for the side to move if it has no legal move, and is otherwise a draw. The first player is the first of
+        the record's players, whichever of them opened the game.
+        :return: 2 if the first player won, 1 for a draw, 0 if it lost, or None if the record is cut off or no
+        move was made
+        """
+        final = self.final_position()
+        if final is None or final[40] == 0:
+            return None
+        if final[40] == 3:
+            return 2 if final[38] >= 6 else 0
+        first = self._players[0][0]
+        game = self.new_game(final)
+        player = game.get_turn()
+        for move in game.legal_moves(player):
+            return 1
+        return 0 if player == first else 2
+
+    def get_end(self):
+        """
+        :return: Offset just past the record in the data, or None if the record is cut off
+        """
+        if self._end is None:
+            self._end = record_end(self._data, self._offset)
+        return self._end
+
+    def move_data(self):
+        """
+        Returns the move codes and snapshot blocks of the record, without the header and end block. The slice
+        shares memory with the data when the data is a memoryview.
+        :return: A slice of the data, or None if the record is cut off
+        """
+        end = self.get_end()
+        if end is None:
+            return None
+        return self._data[self._first:end - BLOCK_SIZE]
+
+
+def iter_records(stream, chunk_size=CHUNK_SIZE):
+    """
+    Reads the records of a binary stream one after another, reading the stream in chunks so files larger than
+    memory can be scanned. A record cut off at the end of the stream is skipped.
+    :param stream: A binary file object positioned at the start of a record
+    :param chunk_size: Bytes to read at a time
+    :return: A generator of RecordReader objects, each holding its own copy of the record
+    """
+    buffer = b''
+    offset = 0
+    while True:
+        end = record_end(buffer, offset) if offset < len(buffer) else None
+        if end is None:
+            chunk = stream.read(chunk_size)
+            if not chunk:
+                return
+            buffer = buffer[offset:] + chunk
+            offset = 0
+            continue
+        yield RecordReader(buffer[offset:end])
+        offset = end
@@ -0,0 +1,508 @@
+# Description: An asyncio game server that hosts many Focus/Domination games in one process, and a load test
+# client for it. Clients connect over TCP and send one JSON object per line; the server answers each with one JSON
+# line, echoing any "id" field of the request. Games are quiet FocusGame instances keyed by a session id:
+#     {"cmd": "new", "players": [["PlayerA", "R"], ["PlayerB", "G"]], "ai": "alphabeta:2"}
+#     {"cmd": "move_piece", "session": id, "player": name, "start": [row, column], "move": [row, column],
+#      "num_pieces": n}
+#     {"cmd": "reserved_move", "session": id, "player": name, "move": [row, column]}
+#     {"cmd": "legal_moves", "session": id, "player": name}
+#     {"cmd": "state", "session": id}
+#     {"cmd": "ai_move", "session": id}
+#     {"cmd": "close", "session": id}
+# Move replies carry the result message and only the squares the move changed, as [row, column, pieces] with the
+# bottom piece first, plus reserve and captured counts and the player to move. A session created with an "ai"
+# agent (see FocusTournament.make_agent) answers for its second player; the search runs in a process pool so the
+# event loop keeps serving other sessions, and the AI's move is included in the same reply. Players and agent specs
+# are checked when the session is made, and the agent's depth or playouts is capped and its search given a time
+# budget, so no request can hold a worker for long. If the AI's search fails, the player's move still stands, the
+# reply carries an "ai_error", and "ai_move" retries the search. Any other failure is logged to the "FocusServer"
+# logger and answered with an error reply. With an opening book
+# (FocusBook) the server plays the AI's move from the book when it has one, without going to the pool.
+#     python FocusServer.py serve --port 8765 --book opening.fgb
+#     python FocusServer.py load --spawn --sessions 1000 --moves 20
+
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import random
+import secrets
+import signal
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from FocusBook import OpeningBook
+from FocusGame import FocusGame, FocusResult
+from FocusTournament import make_agent, parse_agent
+
+
+PLAYERS = (('PlayerA', 'R'), ('PlayerB', 'G'))
+HOST = '127.0.0.1'
+PORT = 8765
+BACKLOG = 2048              # pending connections, enough for a load test opening every session at once
+LIMIT = 1 << 16             # longest request line in bytes
+AI_TIME_MS = 2000           # time budget of an AI search
+MAX_AI_DEPTH = 6            # deepest alpha-beta search a session may ask for
+MAX_AI_PLAYOUTS = 5000      # most MCTS playouts a session may ask for
+
+_agents = {}                # agents already built in an AI worker process, by spec
+
+logger = logging.getLogger("FocusServer")
+
+
+def parse_players(players):
+    """
+    Checks the players of a new session
+    :param players: The requested players, two [name, color] pairs
+    :return: The players as two (name, color) tuples
+    :raise ValueError: If there are not two players with non-empty string names and colors, or they share a name
+    or a color
+    """
+    players = tuple(tuple(player) if isinstance(player, (list, tuple)) else () for player in players)
+    if len(players) != 2 or any(len(player) != 2 or not all(isinstance(text, str) and text for text in player)
+                                for player in players):
+        raise ValueError("players must be two [name, color] pairs of strings")
+    if players[0][0] == players[1][0] or players[0][1] == players[1][1]:
+        raise ValueError("players must have different names and colors")
+    return players
+
+
+def parse_ai(spec):
+    """
+    Checks the agent spec of a new session and caps its strength
+    :param spec: Agent spec for FocusTournament.make_agent
+    :return: The spec, with its depth at most MAX_AI_DEPTH or its playouts at most MAX_AI_PLAYOUTS
+    :raise ValueError: If the spec is not valid
+    """
+    kind, strength = parse_agent(spec)
+    if kind == 'alphabeta':
+        return "alphabeta:%d" % min(strength, MAX_AI_DEPTH)
+    if kind == 'mcts':
+        return "mcts:%d" % min(strength, MAX_AI_PLAYOUTS)
+    return kind
+
+
+def ai_move(spec, players, position, player, seed):
+    """
+    Chooses a move for an AI player in a worker process. Agents are built once per process and reused.
+    :param spec: Agent spec for FocusTournament.make_agent
+    :param players: The two (name, color) tuples of the game
+    :param position: The position as bytes, from FocusGame.to_bytes
+    :param player: Name of the player to move
+    :param seed: Seed for agents that use random numbers, used when the agent is first built
+    :return: The chosen move tuple, or None if the player has no move
+    """
+    if spec not in _agents:
+        _agents[spec] = make_agent(spec, seed, AI_TIME_MS)
+    game = FocusGame(players[0], players[1], quiet=True)
+    game.load_bytes(position)
+    game._turn = player
+    return _agents[spec].choose(game, player)
+
+
+class Session:
+    """
+    Represents one hosted game: the quiet FocusGame, the player tuples, the AI agent spec and name if the session
+    has one, the winner once the game is over, and a lock so requests for the session from different connections
+    are handled one at a time.
+    """
+
+    def __init__(self, players, ai=None):
+        """
+        Initializes a session with a new game, the first player to move
+        :param players: The two (name, color) tuples, checked by parse_players
+        :param ai: Agent spec playing the second player, checked by parse_ai, or None
+        """
+        self.players = players
+        self.game = FocusGame(players[0], players[1], quiet=True)
+        self.game._turn = players[0][0]
+        self.ai = ai
+        self.ai_name = players[1][0] if ai else None
+        self.winner = None
+        self.lock = asyncio.Lock()
+
+    def apply(self, player, start, move, num_pieces, touched):
+        """
+        Applies a move to the game
+        :param player: Name of the player moving
+        :param start: (row, column) to move from, or None for a reserve placement
+        :param move: (row, column) to move to
+        :param num_pieces: Number of pieces to move
+        :param touched: List the squares a successful move changes are appended to
+        :return: The FocusResult of the move
+        """
+        if start is None:
+            result = self.game.reserved_move(player, move)
+        else:
+            result = self.game.move_piece(player, start, move, num_pieces)
+        if result:
+            touched.extend((move,) if start is None else (start, move))
+        if result is FocusResult.WIN:
+            self.winner = player
+        return result
+
+    def describe(self, squares=None):
+        """
+        Describes the position, or only some of its squares
+        :param squares: The (row, column) squares to include, or None to include every non-empty square
+        :return: A dictionary with the squares, reserve and captured counts, player to move and winner
+        """
+        game = self.game
+        if squares is None:
+            squares = [(row, column) for row in range(6) for column in range(6) if game._board[row][column]]
+        changes = []
+        for location in dict.fromkeys(squares):
+            stack = game._board[location[0]][location[1]]
+            changes.append([location[0], location[1], stack.get_stack_list()[::-1] if stack else []])
+        turn = game.get_turn()
+        return {
+            'changes': changes,
+            'reserves': {user.get_name(): len(user.get_reserves()) for user in game._players},
+            'captured': {user.get_name(): len(user.get_captured()) for user in game._players},
+            'turn': turn if isinstance(turn, str) else None,
+            'winner': self.winner,
+        }
+
+
+class FocusServer:
+    """
+    Represents the game server: the hosted sessions by id, the opening book if there is one, and the process pool
+    for AI turns, created on the first AI turn that is not answered from the book.
+    """
+
+    def __init__(self, ai_workers=None, book=None):
+        """
+        Initializes a server with no sessions
+        :param ai_workers: Number of processes searching AI moves, defaults to the number of CPUs
+        :param book: Path of an opening book probed before each AI search, or None
+        """
+        self._sessions = {}
+        self._ai_workers = ai_workers
+        self._pool = None
+        self._book = OpeningBook(book) if book else None
+        self._stats = {'connections': 0, 'requests': 0, 'ai_moves': 0, 'book_moves': 0}
+
+    def get_stats(self):
+        """
+        Returns counts of the connections, requests, AI moves and AI moves from the book handled, and the number
+        of open sessions
+        :return: A dictionary of the counts
+        """
+        return dict(self._stats, sessions=len(self._sessions))
+
+    async def handle_client(self, reader, writer):
+        """
+        Serves one connection, answering its requests in order until it closes
+        :param reader: The connection's asyncio.StreamReader
+        :param writer: The connection's asyncio.StreamWriter
+        """
+        self._stats['connections'] += 1
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                    reply = await self.dispatch(request)
+                    if 'id' in request:
+                        reply['id'] = request['id']
+                except (ValueError, KeyError, TypeError, IndexError) as error:
+                    reply = {'ok': False, 'error': "bad request: %s" % error}
+                except Exception as error:
+                    logger.exception("request %r failed", line)
+                    reply = {'ok': False, 'error': "server error: %s: %s" % (type(error).__name__, error)}
+                writer.write(json.dumps(reply).encode() + b"\n")
+                await writer.drain()
+        except (ConnectionError, asyncio.LimitOverrunError, asyncio.IncompleteReadError):
+            pass
+        except asyncio.CancelledError:                                          #server shutting down
+            pass
+        finally:
+            writer.close()
+
+    async def dispatch(self, request):
+        """
+        Handles one request
+        :param request: The decoded request dictionary
+        :return: The reply dictionary
+        """
+        self._stats['requests'] += 1
+        command = request['cmd']
+        if command == 'new':
+            players = parse_players(request.get('players', PLAYERS))
+            ai = request.get('ai')
+            session = Session(players, parse_ai(ai) if ai is not None else None)
+            reply = dict(session.describe(), ok=True)
+            reply['session'] = session_id = secrets.token_hex(8)
+            self._sessions[session_id] = session
+            return reply
+
+        session = self._sessions.get(request.get('session'))
+        if session is None:
+            return {'ok': False, 'error': "unknown session"}
+        if command == 'close':
+            del self._sessions[request['session']]
+            return {'ok': True}
+        if command == 'state':
+            return dict(session.describe(), ok=True)
+        if command == 'legal_moves':
+            moves = list(session.game.legal_moves(request['player']))
+            return {'ok': True, 'moves': [[start, move, num_pieces] for start, move, num_pieces in moves]}
+        if command not in ('move_piece', 'reserved_move', 'ai_move'):
+            return {'ok': False, 'error': "unknown command %r" % command}
+
+        async with session.lock:
+            touched = []
+            if command == 'ai_move':
+                if not session.ai or session.game.get_turn() != session.ai_name:
+                    return {'ok': False, 'error': "the AI is not to move"}
+                reply = {'ok': True}
+            else:
+                if command == 'move_piece':
+                    result = session.apply(request['player'], tuple(request['start']), tuple(request['move']),
+                                           int(request['num_pieces']), touched)
+                else:
+                    result = session.apply(request['player'], None, tuple(request['move']), 1, touched)
+                reply = {'ok': bool(result), 'result': result.value}
+            if reply['ok'] and session.ai and session.game.get_turn() == session.ai_name:
+                try:
+                    reply['ai_move'] = await self.play_ai(session, touched)
+                except Exception as error:                                      #the AI stays to move
+                    logger.exception("AI search failed for %s", session.ai)
+                    reply['ai_error'] = "%s: %s" % (type(error).__name__, error)
+                    if command == 'ai_move':
+                        reply['ok'] = False
+            reply.update(session.describe(touched))
+        return reply
+
+    async def play_ai(self, session, touched):
+        """
+        Plays the AI's move for a session from the opening book, or searches it in the process pool without
+        blocking the event loop
+        :param session: The Session whose AI player is to move
+        :param touched: List the squares the AI's move changes are appended to
+        :return: The AI's move as [start, move, num_pieces], or None if it has no move, which loses the game
+        :raise Exception: Whatever the search raised, the AI still being to move. A broken pool is replaced.
+        """
+        move = self._book.choose(session.game, session.ai_name) if self._book is not None else None
+        if move is not None:
+            self._stats['book_moves'] += 1
+        else:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self._ai_workers)
+            loop = asyncio.get_running_loop()
+            try:
+                move = await loop.run_in_executor(self._pool, ai_move, session.ai, session.players,
+                                                  session.game.to_bytes(), session.ai_name, random.getrandbits(32))
+            except BrokenProcessPool:
+                self._pool.shutdown(wait=False)
+                self._pool = None                                               #the next AI turn makes a new pool
+                raise
+        self._stats['ai_moves'] += 1
+        if move is None:
+            session.winner = session.players[0][0]
+            session.game._turn = 1
+            return None
+        session.apply(session.ai_name, move[0], move[1], move[2], touched)
+        return list(move)
+
+    async def serve(self, host=HOST, port=PORT, ready=None):
+        """
+        Accepts connections until cancelled
+        :param host: Address to listen on
+        :param port: Port to listen on, 0 for any free port
+        :param ready: Optional asyncio.Future set to the bound port once the server is listening
+        """
+        server = await asyncio.start_server(self.handle_client, host, port, backlog=BACKLOG, limit=LIMIT)
+        if ready is not None:
+            ready.set_result(server.sockets[0].getsockname()[1])
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            if self._pool is not None:
+                self._pool.shutdown(cancel_futures=True)
+            if self._book is not None:
+                self._book.close()
+
+
+def run_server(host=HOST, port=PORT, ai_workers=None, book=None):
+    """
+    Runs a server in the current process until interrupted or sent SIGTERM
+    :param host: Address to listen on
+    :param port: Port to listen on
+    :param ai_workers: Number of processes searching AI moves
+    :param book: Path of an opening book, or None
+    """
+    async def main():
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+        try:
+            await FocusServer(ai_workers, book).serve(host, port)
+        except asyncio.CancelledError:
+            pass
+
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
+
+
+async def request(reader, writer, message):
+    """
+    Sends one request and waits for its reply
+    :param reader: The connection's asyncio.StreamReader
+    :param writer: The connection's asyncio.StreamWriter
+    :param message: The request dictionary
+    :return: The reply dictionary
+    """
+    writer.write(json.dumps(message).encode() + b"\n")
+    await writer.drain()
+    line = await reader.readline()
+    if not line:
+        raise ConnectionError("server closed the connection")
+    return json.loads(line)
+
+
+async def play_session(host, port, moves, latencies, rng, ai=None, think_ms=0):
+    """
+    Plays random legal moves in one new session over its own connection, timing each move request
+    :param host: Server address
+    :param port: Server port
+    :param moves: The most moves to play
+    :param latencies: List the move latencies in seconds are appended to
+    :param rng: A random.Random used to pick moves
+    :param ai: Agent spec for the session's second player, or None to play both sides
+    :param think_ms: Average pause between moves in milliseconds, spread evenly from 0 to twice this
+    :return: The number of moves played
+    """
+    reader, writer = await asyncio.open_connection(host, port, limit=LIMIT)
+    try:
+        reply = await request(reader, writer, {'cmd': 'new', 'ai': ai})
+        session = reply['session']
+        turn = reply['turn']
+        played = 0
+        while played < moves and turn is not None:
+            legal = (await request(reader, writer, {'cmd': 'legal_moves', 'session': session, 'player': turn}))
+            if legal['moves'] == []:
+                break
+            if think_ms:
+                await asyncio.sleep(rng.uniform(0, 2 * think_ms) / 1000.0)
+            start, move, num_pieces = rng.choice(legal['moves'])
+            message = {'cmd': 'move_piece', 'session': session, 'player': turn, 'start': start, 'move': move,
+                       'num_pieces': num_pieces}
+            if start is None:
+                message = {'cmd': 'reserved_move', 'session': session, 'player': turn, 'move': move}
+            began = time.perf_counter()
+            reply = await request(reader, writer, message)
+            latencies.append(time.perf_counter() - began)
+            if not reply['ok']:
+                raise AssertionError("server refused legal move %r: %s" % (message, reply['result']))
+            played += 1
+            turn = reply['turn']
+        await request(reader, writer, {'cmd': 'close', 'session': session})
+        return played
+    finally:
+        writer.close()
+        await writer.wait_closed()
+
+
+def percentile(values, fraction):
+    """
+    :param values: A sorted, non-empty list of numbers
+    :param fraction: The percentile as a fraction, e.g. 0.99
+    :return: The value at that percentile, by nearest rank
+    """
+    return values[min(len(values) - 1, max(0, int(round(fraction * len(values))) - 1))]
+
+
+async def load_test(host=HOST, port=PORT, sessions=1000, moves=20, ai=None, think_ms=0, seed=0):
+    """
+    Plays many sessions at once against a running server and reports move latency percentiles
+    :param host: Server address
+    :param port: Server port
+    :param sessions: Number of concurrent sessions, each with its own connection
+    :param moves: The most moves played in each session
+    :param ai: Agent spec for each session's second player, or None to play both sides
+    :param think_ms: Average pause between a session's moves in milliseconds, 0 to send moves back to back
+    :param seed: Seed for the move choices
+    :return: A dictionary of the measured results
+    """
+    latencies = []
+    rng = random.Random(seed)
+    began = time.perf_counter()
+    played = await asyncio.gather(*[play_session(host, port, moves, latencies, random.Random(rng.getrandbits(32)),
+                                                 ai, think_ms) for i in range(sessions)])
+    seconds = time.perf_counter() - began
+    latencies.sort()
+    results = {
+        'sessions': sessions,
+        'moves': sum(played),
+        'seconds': seconds,
+        'moves_per_sec': sum(played) / seconds,
+        'p50_ms': 1000 * percentile(latencies, 0.50),
+        'p99_ms': 1000 * percentile(latencies, 0.99),
+        'max_ms': 1000 * latencies[-1],
+    }
+    print("%d sessions, %d moves in %.2f s, %.0f moves/sec" % (sessions, results['moves'], seconds,
+                                                               results['moves_per_sec']))
+    print("move latency p50 %.2f ms, p99 %.2f ms, max %.2f ms" % (results['p50_ms'], results['p99_ms'],
+                                                                   results['max_ms']))
+    return results
+
+
+def spawn_server(host=HOST, port=PORT, ai_workers=None, timeout=10.0, book=None):
+    """
+    Starts a server in a child process and waits until it accepts connections
+    :param host: Address to listen on
+    :param port: Port to listen on
+    :param ai_workers: Number of processes searching AI moves
+    :param timeout: Seconds to wait for the server
+    :param book: Path of an opening book, or None
+    :return: The multiprocessing.Process running the server
+    """
+    process = multiprocessing.Process(target=run_server, args=(host, port, ai_workers, book))
+    process.start()
+    deadline = time.perf_counter() + timeout
+
+    async def wait():
+        while True:
+            try:
+                reader, writer = await asyncio.open_connection(host, port)
+                writer.close()
+                return
+            except OSError:
+                if time.perf_counter() > deadline:
+                    raise
+                await asyncio.sleep(0.05)
+
+    asyncio.run(wait())
+    return process
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Host Focus games over TCP, or load test a server.")
+    parser.add_argument('mode', choices=('serve', 'load'))
+    parser.add_argument('--host', default=HOST)
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--ai-workers', type=int, default=None, help="processes searching AI moves")
+    parser.add_argument('--book', default=None, help="opening book the AI plays from before searching")
+    parser.add_argument('--spawn', action='store_true', help="load: start a server in a child process first")
+    parser.add_argument('--sessions', type=int, default=1000, help="load: concurrent sessions")
+    parser.add_argument('--moves', type=int, default=20, help="load: moves per session")
+    parser.add_argument('--ai', default=None, help="load: agent spec playing each session's second player")
+    parser.add_argument('--think-ms', type=float, default=0, help="load: average pause between moves")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    if args.mode == 'serve':
+        run_server(args.host, args.port, args.ai_workers, args.book)
+    else:
+        server = spawn_server(args.host, args.port, args.ai_workers, book=args.book) if args.spawn else None
+        try:
+            asyncio.run(load_test(args.host, args.port, args.sessions, args.moves, args.ai, args.think_ms, args.seed))
+        finally:
+            if server is not None:
+                server.terminate()
+                server.join()
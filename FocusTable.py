@@ -0,0 +1,273 @@
+# Description: A fixed size transposition table for searches over FocusGame positions, keyed by
+# FocusGame.get_hash(). Each bucket has two slots: a depth-preferred slot that keeps the deepest result seen for the
+# bucket, and an always-replace slot that takes every result the depth-preferred slot turns away. Hit, miss, store
+# and eviction counters are kept so the table can be sized for a memory budget. SharedTranspositionTable keeps the
+# same layout in a multiprocessing shared memory block for parallel searches.
+
+from multiprocessing import shared_memory
+
+EXACT = 0           # score is the exact value of the position
+LOWER = 1           # score is a lower bound, the search failed high
+UPPER = 2           # score is an upper bound, the search failed low
+
+
+class TranspositionTable:
+    """
+    Represents a transposition table with a fixed number of two slot buckets. Entries are tuples of
+    (key, depth, score, flag, move). Has methods to probe and store entries, clear the table, and report its
+    counters.
+    """
+
+    def __init__(self, buckets=1 << 16):
+        """
+        Initializes an empty table. The number of buckets is rounded up to a power of two so a bucket can be found
+        by masking the key.
+        :param buckets: The number of buckets, each holding up to two entries
+        """
+        size = 1
+        while size < buckets:
+            size <<= 1
+        self._mask = size - 1
+        self._slots = [None] * (size * 2)     # slot 2n is depth-preferred, slot 2n + 1 is always-replace
+        self._hits = 0
+        self._misses = 0
+        self._stores = 0
+        self._evictions = 0
+
+    def probe(self, key):
+        """
+        Looks up a position in the table
+        :param key: The Zobrist hash of the position
+        :return: The entry tuple (key, depth, score, flag, move), or None if the position is not stored
+        """
+        index = (key & self._mask) << 1
+        entry = self._slots[index]
+        if entry is not None and entry[0] == key:
+            self._hits += 1
+            return entry
+        entry = self._slots[index + 1]
+        if entry is not None and entry[0] == key:
+            self._hits += 1
+            return entry
+        self._misses += 1
+        return None
+
+    def store(self, key, depth, score, flag, move):
+        """
+        Stores a search result. The result goes in the depth-preferred slot if the slot is empty, holds the same
+        position, or holds a shallower search; otherwise it replaces the always-replace slot.
+        :param key: The Zobrist hash of the position
+        :param depth: The depth the position was searched to
+        :param score: The score found for the position
+        :param flag: EXACT, LOWER or UPPER
+        :param move: The best move found, or None
+        """
+        index = (key & self._mask) << 1
+        slots = self._slots
+        entry = slots[index]
+        if entry is None or entry[0] == key or depth >= entry[1]:
+            if entry is not None and entry[0] != key:
+                self._evictions += 1
+        else:
+            index += 1
+            entry = slots[index]
+            if entry is not None and entry[0] != key:
+                self._evictions += 1
+        slots[index] = (key, depth, score, flag, move)
+        self._stores += 1
+
+    def clear(self):
+        """
+        Empties the table and resets its counters
+        """
+        self._slots = [None] * len(self._slots)
+        self._hits = 0
+        self._misses = 0
+        self._stores = 0
+        self._evictions = 0
+
+    def get_size(self):
+        """
+        Returns the number of entries the table can hold
+        :return: Twice the number of buckets
+        """
+        return len(self._slots)
+
+    def get_stats(self):
+        """
+        Returns the table's counters
+        :return: A dictionary of hits, misses, stores, evictions, filled slots and total slots
+        """
+        return {
+            'hits': self._hits,
+            'misses': self._misses,
+            'stores': self._stores,
+            'evictions': self._evictions,
+            'filled': len(self._slots) - self._slots.count(None),
+            'slots': len(self._slots),
+        }
+
+
+def encode_move(move):
+    """
+    Encodes a move tuple as a small integer so it can be stored in a fixed width table entry
+    :param move: (start, move, num_pieces), (None, move, 1) for a reserve placement, or None
+    :return: An integer from 0 to 6660, 0 for None
+    """
+    if move is None:
+        return 0
+    start = 36 if move[0] is None else move[0][0] * 6 + move[0][1]
+    return 1 + ((start * 36 + move[1][0] * 6 + move[1][1]) * 5) + move[2] - 1
+
+
+def decode_move(code):
+    """
+    Decodes a move encoded by encode_move
+    :param code: The encoded move
+    :return: The move tuple, or None for 0
+    """
+    if code == 0:
+        return None
+    code -= 1
+    num_pieces = code % 5 + 1
+    code //= 5
+    end = code % 36
+    start = code // 36
+    if start == 36:
+        return (None, (end // 6, end % 6), num_pieces)
+    return ((start // 6, start % 6), (end // 6, end % 6), num_pieces)
+
+
+class SharedTranspositionTable:
+    """
+    Represents a transposition table kept in shared memory, so searches in several processes can share results.
+    Has the same methods as TranspositionTable and the same bucket layout and replacement policy. Each slot is two
+    64 bit words: the entry's data word, and the key XORed with the data word. A slot torn by two processes writing
+    it at once no longer matches its key and is treated as empty, so no locking is needed. Counters are kept per
+    process.
+    """
+
+    def __init__(self, buckets=1 << 16, name=None):
+        """
+        Creates a new table in shared memory, or attaches to an existing one
+        :param buckets: The number of buckets, rounded up to a power of two. Must match the table attached to
+        :param name: Name of an existing table's shared memory block, or None to create a new table
+        """
+        size = 1
+        while size < buckets:
+            size <<= 1
+        self._mask = size - 1
+        self._owner = name is None
+        if self._owner:
+            self._memory = shared_memory.SharedMemory(create=True, size=size * 32)
+            self._memory.buf[:] = bytes(size * 32)
+        else:
+            self._memory = shared_memory.SharedMemory(name=name)
+        self._words = self._memory.buf.cast('Q')       # slot n is words 2n (key ^ data) and 2n + 1 (data)
+        self._hits = 0
+        self._misses = 0
+        self._stores = 0
+        self._evictions = 0
+
+    def get_name(self):
+        """
+        Returns the name of the shared memory block, which other processes pass to attach to the table
+        :return: The shared memory name
+        """
+        return self._memory.name
+
+    def read_slot(self, slot):
+        """
+        Reads one slot of the table
+        :param slot: Index of the slot, twice the bucket plus 0 or 1
+        :return: The entry tuple (key, depth, score, flag, move), or None if the slot is empty or torn
+        """
+        check = self._words[slot * 2]
+        data = self._words[slot * 2 + 1]
+        if data == 0:
+            return None
+        return (check ^ data, (data >> 32) & 0xff, (data & 0xffffffff) - (1 << 31), (data >> 40) & 0xff,
+                decode_move(data >> 48))
+
+    def probe(self, key):
+        """
+        Looks up a position in the table
+        :param key: The Zobrist hash of the position
+        :return: The entry tuple (key, depth, score, flag, move), or None if the position is not stored
+        """
+        slot = (key & self._mask) << 1
+        entry = self.read_slot(slot)
+        if entry is not None and entry[0] == key:
+            self._hits += 1
+            return entry
+        entry = self.read_slot(slot + 1)
+        if entry is not None and entry[0] == key:
+            self._hits += 1
+            return entry
+        self._misses += 1
+        return None
+
+    def store(self, key, depth, score, flag, move):
+        """
+        Stores a search result with the same replacement policy as TranspositionTable.store
+        :param key: The Zobrist hash of the position
+        :param depth: The depth the position was searched to, 0 - 255
+        :param score: The score found for the position
+        :param flag: EXACT, LOWER or UPPER
+        :param move: The best move found, or None
+        """
+        slot = (key & self._mask) << 1
+        entry = self.read_slot(slot)
+        if entry is None or entry[0] == key or depth >= entry[1]:
+            if entry is not None and entry[0] != key:
+                self._evictions += 1
+        else:
+            slot += 1
+            entry = self.read_slot(slot)
+            if entry is not None and entry[0] != key:
+                self._evictions += 1
+        data = (score + (1 << 31)) | (depth << 32) | (flag << 40) | (encode_move(move) << 48)
+        self._words[slot * 2] = key ^ data
+        self._words[slot * 2 + 1] = data
+        self._stores += 1
+
+    def clear(self):
+        """
+        Empties the table and resets this process's counters
+        """
+        self._memory.buf[:] = bytes(len(self._memory.buf))
+        self._hits = 0
+        self._misses = 0
+        self._stores = 0
+        self._evictions = 0
+
+    def get_size(self):
+        """
+        Returns the number of entries the table can hold
+        :return: Twice the number of buckets
+        """
+        return (self._mask + 1) * 2
+
+    def get_stats(self):
+        """
+        Returns this process's counters for the table
+        :return: A dictionary of hits, misses, stores, evictions, filled slots and total slots
+        """
+        filled = self.get_size() - self._words[1::2].tolist().count(0)
+        return {
+            'hits': self._hits,
+            'misses': self._misses,
+            'stores': self._stores,
+            'evictions': self._evictions,
+            'filled': filled,
+            'slots': self.get_size(),
+        }
+
+    def close(self):
+        """
+        Detaches from the shared memory, and frees it if this table created it
+        """
+        self._words.release()
+        self._memory.close()
+        if self._owner:
+            self._memory.unlink()
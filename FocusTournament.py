@@ -0,0 +1,342 @@
+# Description: Headless self-play tournaments for the Focus/Domination game. Plays round-robin games between
+# configurable agents across a process pool without opening a pygame window, appends each result to a JSON lines
+# file as soon as the game finishes, and prints win rates, Elo estimates, average game length and games/sec. The games
+# themselves can be recorded into a FocusArchive archive, such as for FocusTune.
+#     python FocusTournament.py random greedy alphabeta:2 mcts:200 --games 100 --output results.jsonl
+# Agents are given as random, greedy, alphabeta:<depth> or mcts:<playouts>.
+
+import argparse
+import io
+import itertools
+import json
+import math
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from FocusAI import AlphaBetaPlayer, evaluate
+from FocusArchive import ArchiveWriter
+from FocusGame import FocusGame
+from FocusMCTS import MCTSPlayer
+from FocusRecord import RecordWriter
+
+
+PLAYERS = (('PlayerA', 'R'), ('PlayerB', 'G'))
+MAX_PLIES = 400             # a game still going after this many plies is a draw
+
+
+class RandomAgent:
+    """
+    Plays a random legal move
+    """
+
+    def __init__(self, seed):
+        """
+        :param seed: Seed for the random number generator
+        """
+        self._rng = random.Random(seed)
+
+    def choose(self, game, player):
+        """
+        :param game: A FocusGame
+        :param player: Name of the player to move
+        :return: A random legal move, or None if there is none
+        """
+        moves = list(game.legal_moves(player))
+        return self._rng.choice(moves) if moves else None
+
+
+class GreedyAgent:
+    """
+    Plays the move with the best evaluation one ply ahead, breaking ties at random
+    """
+
+    def __init__(self, seed):
+        """
+        :param seed: Seed for the random number generator used to break ties
+        """
+        self._rng = random.Random(seed)
+
+    def choose(self, game, player):
+        """
+        :param game: A FocusGame
+        :param player: Name of the player to move
+        :return: The best scoring legal move, or None if there is none
+        """
+        best = []
+        best_score = None
+        for move in list(game.legal_moves(player)):
+            result = game.make_move(move, player)
+            score = math.inf if result == player + " wins" else evaluate(game, player)
+            game.unmake_move()
+            if best_score is None or score > best_score:
+                best_score = score
+                best = [move]
+            elif score == best_score:
+                best.append(move)
+        return self._rng.choice(best) if best else None
+
+
+class AlphaBetaAgent:
+    """
+    Plays the move found by a fixed depth alpha-beta search
+    """
+
+    def __init__(self, depth, time_ms=None):
+        """
+        :param depth: The depth to search to
+        :param time_ms: Time budget for each move in milliseconds, or None to always finish the depth
+        """
+        self._player = AlphaBetaPlayer(max_depth=depth)
+        self._time_ms = time_ms if time_ms is not None else 10 ** 9
+
+    def choose(self, game, player):
+        """
+        :param game: A FocusGame
+        :param player: Name of the player to move
+        :return: The best move found, or None if there is none
+        """
+        return self._player.best_move(game, player, time_ms=self._time_ms)
+
+
+class MCTSAgent:
+    """
+    Plays the move found by an MCTS search with a fixed number of playouts
+    """
+
+    def __init__(self, playouts, seed, time_ms=None):
+        """
+        :param playouts: Playouts per move
+        :param seed: Seed for the random number generator
+        :param time_ms: Time budget for each move in milliseconds, stopping the search before its playouts are
+        done, or None to always run them all
+        """
+        self._player = MCTSPlayer(playouts=playouts, seed=seed)
+        self._playouts = playouts
+        self._time_ms = time_ms
+
+    def choose(self, game, player):
+        """
+        :param game: A FocusGame
+        :param player: Name of the player to move
+        :return: The most visited move, or None if there is none
+        """
+        return self._player.best_move(game, player, self._playouts, self._time_ms)
+
+
+def parse_agent(spec):
+    """
+    Reads an agent description
+    :param spec: random, greedy, alphabeta:<depth> or mcts:<playouts>
+    :return: A tuple of (kind, depth or playouts), the second None for random and greedy
+    :raise ValueError: If the description is not one of these, or its depth or playouts is not a positive integer
+    """
+    if not isinstance(spec, str):
+        raise ValueError("unknown agent %r" % (spec,))
+    kind, _, value = spec.partition(':')
+    if kind in ('random', 'greedy') and not value:
+        return kind, None
+    if kind in ('alphabeta', 'mcts'):
+        strength = int(value) if value else 2 if kind == 'alphabeta' else 200
+        if strength < 1:
+            raise ValueError("agent %r needs a positive depth or playouts" % spec)
+        return kind, strength
+    raise ValueError("unknown agent %r" % spec)
+
+
+def make_agent(spec, seed, time_ms=None):
+    """
+    Builds an agent from its description
+    :param spec: random, greedy, alphabeta:<depth> or mcts:<playouts>
+    :param seed: Seed for agents that use random numbers
+    :param time_ms: Time budget for each alpha-beta or MCTS move in milliseconds, or None to always finish the
+    depth or playouts
+    :return: An agent with a choose(game, player) method
+    :raise ValueError: If the description is not valid
+    """
+    kind, strength = parse_agent(spec)
+    if kind == 'random':
+        return RandomAgent(seed)
+    elif kind == 'greedy':
+        return GreedyAgent(seed)
+    elif kind == 'alphabeta':
+        return AlphaBetaAgent(strength, time_ms)
+    return MCTSAgent(strength, seed, time_ms)
+
+
+def play_game(number, first, second, seed, max_plies=MAX_PLIES, record=False):
+    """
+    Plays one game between two agents, the first agent moving first as PlayerA
+    :param number: The number of the game in the tournament
+    :param first: Spec of the agent moving first
+    :param second: Spec of the agent moving second
+    :param seed: Seed for the agents
+    :param max_plies: Plies after which the game is a draw
+    :param record: True to also return the game as a FocusRecord record
+    :return: A dictionary with the game number, agents, winning agent (None for a draw), plies and seconds, and
+    the record as bytes under 'record' if asked for
+    """
+    began = time.perf_counter()
+    game = FocusGame(PLAYERS[0], PLAYERS[1])
+    stream = io.BytesIO() if record else None
+    writer = RecordWriter(stream, game) if record else None
+    agents = {PLAYERS[0][0]: (first, make_agent(first, seed)), PLAYERS[1][0]: (second, make_agent(second, seed + 1))}
+    player = PLAYERS[0][0]
+    winner = None
+    plies = 0
+    while plies < max_plies:
+        spec, agent = agents[player]
+        move = agent.choose(game, player)
+        if move is None:                                                        #no move left, the player loses
+            winner = agents[PLAYERS[1][0] if player == PLAYERS[0][0] else PLAYERS[0][0]][0]
+            break
+        result = game.make_move(move, player)
+        if writer is not None:
+            writer.record(game, move, player)
+        plies += 1
+        if result == player + " wins":
+            winner = spec
+            break
+        player = game.get_turn()
+    summary = {
+        'game': number,
+        'first': first,
+        'second': second,
+        'winner': winner,
+        'plies': plies,
+        'seconds': time.perf_counter() - began,
+    }
+    if writer is not None:
+        writer.close(game)
+        summary['record'] = stream.getvalue()
+    return summary
+
+
+def elo_ratings(results, agents, iterations=200):
+    """
+    Fits Bradley-Terry strengths to the results with minorization-maximization and converts them to Elo, with
+    the ratings centered on 0. Draws count as half a win for each agent, and every agent gets one virtual draw
+    against each other agent so unbeaten or winless agents keep a finite rating.
+    :param results: The game result dictionaries
+    :param agents: The agent specs
+    :param iterations: The number of update passes
+    :return: A dictionary of Elo rating by agent spec
+    """
+    wins = {agent: 0.0 for agent in agents}
+    games = {}
+    for a, b in itertools.combinations(agents, 2):
+        games[(a, b)] = games[(b, a)] = 1.0
+        wins[a] += 0.5
+        wins[b] += 0.5
+    for result in results:
+        a, b = result['first'], result['second']
+        if a == b:
+            continue
+        games[(a, b)] += 1
+        games[(b, a)] += 1
+        if result['winner'] is None:
+            wins[a] += 0.5
+            wins[b] += 0.5
+        else:
+            wins[result['winner']] += 1
+    strength = {agent: 1.0 for agent in agents}
+    for i in range(iterations):
+        for agent in agents:
+            total = sum(games[(agent, other)] / (strength[agent] + strength[other])
+                        for other in agents if other != agent)
+            if total > 0:
+                strength[agent] = wins[agent] / total
+        mean = sum(math.log(value) for value in strength.values()) / len(strength)
+        strength = {agent: value / math.exp(mean) for agent, value in strength.items()}
+    return {agent: 400 * math.log10(value) for agent, value in strength.items()}
+
+
+def summarize(results, agents, seconds):
+    """
+    Prints win rates, Elo estimates, average game length and games/sec for a tournament
+    :param results: The game result dictionaries
+    :param agents: The agent specs
+    :param seconds: Wall clock seconds the tournament took
+    :return: A dictionary of the summary figures
+    """
+    played = {agent: 0 for agent in agents}
+    won = {agent: 0.0 for agent in agents}
+    for result in results:
+        for agent in (result['first'], result['second']):
+            played[agent] += 1
+            if result['winner'] is None:
+                won[agent] += 0.5
+        if result['winner'] is not None:
+            won[result['winner']] += 1
+    ratings = elo_ratings(results, agents)
+    summary = {
+        'games': len(results),
+        'games_per_sec': len(results) / seconds if seconds > 0 else 0.0,
+        'average_plies': sum(result['plies'] for result in results) / len(results) if results else 0.0,
+        'draws': sum(1 for result in results if result['winner'] is None),
+        'agents': {agent: {'games': played[agent],
+                           'win_rate': won[agent] / played[agent] if played[agent] else 0.0,
+                           'elo': ratings[agent]} for agent in agents},
+    }
+    print("%-16s %8s %9s %8s" % ("agent", "games", "win rate", "elo"))
+    for agent in sorted(agents, key=lambda agent: -ratings[agent]):
+        stats = summary['agents'][agent]
+        print("%-16s %8d %8.1f%% %8.0f" % (agent, stats['games'], 100 * stats['win_rate'], stats['elo']))
+    print("%d games, %d draws, %.1f plies per game, %.2f games/sec"
+          % (summary['games'], summary['draws'], summary['average_plies'], summary['games_per_sec']))
+    return summary
+
+
+def run_tournament(agents, games_per_pair, output=None, workers=None, seed=0, max_plies=MAX_PLIES, archive=None):
+    """
+    Plays games_per_pair games between every pair of agents, each agent moving first in half of them, spread over
+    a process pool. Results are appended to the output file and games to the archive as they finish.
+    :param agents: The agent specs
+    :param games_per_pair: Games played between each pair of agents
+    :param output: Path of a JSON lines file to append results to, or None
+    :param workers: Number of worker processes, defaults to the number of CPUs
+    :param seed: Base seed, game n uses seed + 2n for its agents
+    :param max_plies: Plies after which a game is a draw
+    :param archive: Path of a FocusArchive archive to append the games to, or None
+    :return: A tuple of (list of result dictionaries, summary dictionary)
+    """
+    schedule = []
+    for a, b in itertools.combinations(agents, 2):
+        for i in range(games_per_pair):
+            schedule.append((a, b) if i % 2 == 0 else (b, a))
+    began = time.perf_counter()
+    results = []
+    log = open(output, 'a') if output else None
+    games = ArchiveWriter(archive) if archive else None
+    try:
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1) as pool:
+            futures = [pool.submit(play_game, number, first, second, seed + 2 * number, max_plies, games is not None)
+                       for number, (first, second) in enumerate(schedule)]
+            for future in as_completed(futures):
+                result = future.result()
+                if games is not None:
+                    games.add(result.pop('record'))
+                results.append(result)
+                if log is not None:
+                    log.write(json.dumps(result) + "\n")
+                    log.flush()
+    finally:
+        if log is not None:
+            log.close()
+        if games is not None:
+            games.close()
+    return results, summarize(results, agents, time.perf_counter() - began)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Play a headless self-play tournament of Focus.")
+    parser.add_argument('agents', nargs='+', help="random, greedy, alphabeta:<depth> or mcts:<playouts>")
+    parser.add_argument('--games', type=int, default=10, help="games between each pair of agents")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes, defaults to the CPU count")
+    parser.add_argument('--output', default=None, help="JSON lines file to append results to")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--max-plies', type=int, default=MAX_PLIES, help="plies after which a game is drawn")
+    parser.add_argument('--archive', default=None, help="FocusArchive archive to append the games to")
+    args = parser.parse_args()
+    run_tournament(args.agents, args.games, args.output, args.workers, args.seed, args.max_plies, args.archive)
@@ -0,0 +1,307 @@
+# Description: Texel-style tuning of the Focus/Domination evaluation weights. Every position of every game in one or
+# more FocusArchive archives is labeled with the game's result for the first player (1 won, 0.5 drawn, 0 lost) and
+# its FocusGame.get_terms are taken as features. A logistic model, sigmoid(SCALE * weights . terms), is fitted to
+# the labels by minimizing the mean squared error with full-batch gradient steps (Adam).
+#     extract   Replays the archived games across a process pool. Each worker writes its share of the positions
+#               to a part file of int16 rows, the six terms then the label in halves (0, 1 or 2), so the dataset
+#               lives on disk and is never held in memory at once.
+#     tune      Memory maps the part files and splits them into chunks of rows. Every pass sends the chunks to a
+#               process pool, which returns the loss and gradient of each; the weights are stepped and written to
+#               a JSON checkpoint after each pass, and an interrupted run resumes from it.
+#     python FocusTune.py extract games.fga --out features --workers 4
+#     python FocusTune.py tune features --checkpoint weights.json --passes 200
+
+import argparse
+import glob
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from FocusAI import TERM_WEIGHTS
+from FocusArchive import GameArchive
+
+
+FEATURES = 6                # terms from FocusGame.get_terms
+ROW_SIZE = FEATURES + 1     # the terms, then the label in halves
+SCALE = 0.01                # evaluation to log-odds, so CAPTURE_WEIGHT is one unit
+OPENING_PLIES = 4           # plies at the start of each game left out, they are the same in most games
+BATCH_ROWS = 1 << 16        # rows an extracting worker writes at a time
+CHUNK_ROWS = 1 << 20        # rows in each gradient task
+GAMES_PER_JOB = 256         # games each extraction task replays
+LEARNING_RATE = 0.5
+BETA1 = 0.9
+BETA2 = 0.999
+EPSILON = 1e-8
+
+
+def extract_games(path, first, last, out, skip=OPENING_PLIES):
+    """
+    Writes the labeled features of every position in a range of an archive's games to a part file, in a worker
+    :param path: Path of the archive
+    :param first: Number of the first game
+    :param last: Number of the game after the last one
+    :param out: Path of the part file, replaced if it exists
+    :param skip: Plies at the start of each game to leave out
+    :return: The number of rows written
+    """
+    rows = 0
+    batch = []
+    with GameArchive(path) as archive, open(out, 'wb') as stream:
+        for number in range(first, last):
+            record = archive.get_record(number)
+            label = record.get_result()
+            if label is not None:
+                ply = 0
+                for move, game in record.replay():
+                    ply += 1
+                    if ply > skip:
+                        batch.append(game.get_terms() + (label,))
+                if len(batch) >= BATCH_ROWS:
+                    np.array(batch, dtype='<i2').tofile(stream)
+                    rows += len(batch)
+                    batch = []
+            del record
+        if batch:
+            np.array(batch, dtype='<i2').tofile(stream)
+            rows += len(batch)
+    return rows
+
+
+def extract(paths, directory, workers=None, games_per_job=GAMES_PER_JOB):
+    """
+    Extracts the labeled features of the games of one or more archives into part files, across a process pool
+    :param paths: Paths of the archives
+    :param directory: Directory for the part files, created if needed
+    :param workers: Worker processes, defaults to the number of CPUs
+    :param games_per_job: Games each task replays
+    :return: A tuple of (list of part file paths, number of rows)
+    """
+    os.makedirs(directory, exist_ok=True)
+    jobs = []
+    for path in paths:
+        with GameArchive(path) as archive:
+            games = len(archive)
+        for first in range(0, games, games_per_job):
+            out = os.path.join(directory, "part-%05d.ftr" % len(jobs))
+            jobs.append((path, first, min(first + games_per_job, games), out))
+    outs = [job[3] for job in jobs]
+    if (workers or os.cpu_count()) == 1:
+        counts = [extract_games(*job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(workers) as pool:
+            counts = list(pool.map(extract_games, *zip(*jobs))) if jobs else []
+    return outs, sum(counts)
+
+
+def load_rows(path):
+    """
+    Memory maps a part file
+    :param path: Path of the part file
+    :return: A read-only (rows, ROW_SIZE) int16 array backed by the file
+    """
+    if os.path.getsize(path) == 0:
+        return np.zeros((0, ROW_SIZE), dtype='<i2')
+    return np.memmap(path, dtype='<i2', mode='r').reshape(-1, ROW_SIZE)
+
+
+def chunk_jobs(paths, chunk_rows=CHUNK_ROWS):
+    """
+    Splits part files into chunks of rows
+    :param paths: Paths of the part files
+    :param chunk_rows: Most rows in a chunk
+    :return: A list of (path, first row, row after the last)
+    """
+    jobs = []
+    for path in paths:
+        rows = os.path.getsize(path) // (2 * ROW_SIZE)
+        for first in range(0, rows, chunk_rows):
+            jobs.append((path, first, min(first + chunk_rows, rows)))
+    return jobs
+
+
+def chunk_gradient(job, weights, scale=SCALE):
+    """
+    Computes the squared error and its gradient over a chunk of rows, in a worker
+    :param job: (path, first row, row after the last) of the chunk
+    :param weights: The weights, in the order of FocusGame.get_terms
+    :param scale: Evaluation to log-odds factor
+    :return: A tuple of (summed squared error, summed gradient array, rows)
+    """
+    path, first, last = job
+    rows = np.asarray(load_rows(path)[first:last], dtype=np.float64)
+    terms = rows[:, :FEATURES]
+    labels = rows[:, FEATURES] / 2
+    predicted = 1 / (1 + np.exp(-scale * (terms @ np.asarray(weights, dtype=np.float64))))
+    error = predicted - labels
+    gradient = (2 * scale * error * predicted * (1 - predicted)) @ terms
+    return float(error @ error), gradient, len(rows)
+
+
+class WeightTuner:
+    """
+    Represents a tuning run over a set of part files, with its weights, Adam moments and pass count. The state is
+    written to a JSON checkpoint after every pass and read back when a tuner is made with the same checkpoint.
+    """
+
+    def __init__(self, paths, checkpoint=None, weights=TERM_WEIGHTS, workers=None, chunk_rows=CHUNK_ROWS,
+                 learning_rate=LEARNING_RATE):
+        """
+        Sets up a run, resuming it from the checkpoint if the file exists
+        :param paths: Paths of the part files
+        :param checkpoint: Path of the JSON checkpoint, or None to keep no checkpoint
+        :param weights: Starting weights, in the order of FocusGame.get_terms
+        :param workers: Worker processes, defaults to the number of CPUs
+        :param chunk_rows: Most rows in each gradient task
+        :param learning_rate: Adam step size, in weight units
+        """
+        self._jobs = chunk_jobs(paths, chunk_rows)
+        self._checkpoint = checkpoint
+        self._workers = workers or os.cpu_count()
+        self._learning_rate = learning_rate
+        self._weights = np.array(weights, dtype=np.float64)
+        self._moments = np.zeros((2, FEATURES))
+        self._passes = 0
+        self._loss = None
+        self._rows = 0
+        self._seconds = 0.0
+        self._timed_passes = 0
+        if checkpoint is not None and os.path.exists(checkpoint):
+            with open(checkpoint) as stream:
+                state = json.load(stream)
+            self._weights = np.array(state['weights'], dtype=np.float64)
+            self._moments = np.array(state['moments'], dtype=np.float64)
+            self._passes = state['passes']
+            self._loss = state['loss']
+
+    def get_weights(self):
+        """
+        :return: The weights rounded to integers, for FocusAI.evaluate
+        """
+        return tuple(int(round(weight)) for weight in self._weights)
+
+    def get_stats(self):
+        """
+        :return: A dictionary with the passes made, the mean squared error before the last step, the rows in
+        the dataset, and rows scored per second over this run's passes
+        """
+        return {
+            'passes': self._passes,
+            'loss': self._loss,
+            'rows': self._rows,
+            'rows_per_sec': self._rows * self._timed_passes / self._seconds if self._seconds else 0.0,
+        }
+
+    def gradient(self, pool):
+        """
+        Sums the squared error and gradient of every chunk at the current weights
+        :param pool: A ProcessPoolExecutor, or None to work in this process
+        :return: A tuple of (mean squared error, mean gradient array)
+        """
+        weights = self._weights.tolist()
+        if pool is None:
+            parts = [chunk_gradient(job, weights) for job in self._jobs]
+        else:
+            parts = list(pool.map(chunk_gradient, self._jobs, [weights] * len(self._jobs)))
+        rows = sum(part[2] for part in parts)
+        if rows == 0:
+            raise ValueError("no positions to tune on")
+        self._rows = rows
+        return sum(part[0] for part in parts) / rows, sum(part[1] for part in parts) / rows
+
+    def step(self, pool=None):
+        """
+        Makes one pass over the data and one Adam step, then writes the checkpoint
+        :param pool: A ProcessPoolExecutor, or None to work in this process
+        :return: The mean squared error before the step
+        """
+        began = time.perf_counter()
+        loss, gradient = self.gradient(pool)
+        self._passes += 1
+        self._moments[0] = BETA1 * self._moments[0] + (1 - BETA1) * gradient
+        self._moments[1] = BETA2 * self._moments[1] + (1 - BETA2) * gradient * gradient
+        mean = self._moments[0] / (1 - BETA1 ** self._passes)
+        variance = self._moments[1] / (1 - BETA2 ** self._passes)
+        self._weights -= self._learning_rate * mean / (np.sqrt(variance) + EPSILON)
+        self._loss = loss
+        self._seconds += time.perf_counter() - began
+        self._timed_passes += 1
+        self.save()
+        return loss
+
+    def run(self, passes):
+        """
+        Makes a number of passes, over a process pool unless there is one worker
+        :param passes: The number of passes
+        :return: The mean squared error before the last step
+        """
+        if self._workers == 1:
+            for i in range(passes):
+                self.step()
+        else:
+            with ProcessPoolExecutor(self._workers) as pool:
+                for i in range(passes):
+                    self.step(pool)
+        return self._loss
+
+    def save(self):
+        """
+        Writes the state to the checkpoint, replacing it in one rename so an interrupted write leaves the last one
+        """
+        if self._checkpoint is None:
+            return
+        state = {
+            'weights': self._weights.tolist(),
+            'moments': self._moments.tolist(),
+            'passes': self._passes,
+            'loss': self._loss,
+            'rounded': list(self.get_weights()),
+        }
+        temporary = self._checkpoint + '.tmp'
+        with open(temporary, 'w') as stream:
+            json.dump(state, stream, indent=1)
+        os.replace(temporary, self._checkpoint)
+
+
+def load_weights(checkpoint):
+    """
+    Reads tuned weights for FocusAI.evaluate
+    :param checkpoint: Path of a WeightTuner checkpoint
+    :return: The weights rounded to integers, in the order of FocusGame.get_terms
+    """
+    with open(checkpoint) as stream:
+        return tuple(int(round(weight)) for weight in json.load(stream)['weights'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tune the evaluation weights on archived games")
+    commands = parser.add_subparsers(dest='command', required=True)
+    command = commands.add_parser('extract', help="write the labeled features of archived games to part files")
+    command.add_argument('archives', nargs='+')
+    command.add_argument('--out', required=True, help="directory for the part files")
+    command.add_argument('--workers', type=int, default=None)
+    command = commands.add_parser('tune', help="fit the weights to the part files in a directory")
+    command.add_argument('directory')
+    command.add_argument('--checkpoint', default='weights.json')
+    command.add_argument('--passes', type=int, default=200)
+    command.add_argument('--workers', type=int, default=None)
+    command.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS)
+    args = parser.parse_args()
+    began = time.perf_counter()
+    if args.command == 'extract':
+        outs, rows = extract(args.archives, args.out, args.workers)
+        seconds = time.perf_counter() - began
+        print("%d positions in %d part files, %.0f positions/sec" % (rows, len(outs), rows / max(seconds, 1e-9)))
+    else:
+        paths = sorted(glob.glob(os.path.join(args.directory, '*.ftr')))
+        tuner = WeightTuner(paths, args.checkpoint, workers=args.workers, chunk_rows=args.chunk_rows)
+        tuner.run(args.passes)
+        stats = tuner.get_stats()
+        print("pass %d, loss %.5f, weights %s, %.0f rows/sec"
+              % (stats['passes'], stats['loss'], tuner.get_weights(), stats['rows_per_sec']))
+
+
+if __name__ == '__main__':
+    main()